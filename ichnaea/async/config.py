@@ -13,6 +13,7 @@ from ichnaea.config import read_config
 from ichnaea import internaljson
 from ichnaea.db import configure_db
 from ichnaea.geoip import configure_geoip
+from ichnaea.http import configure_http_session
 from ichnaea.log import (
     configure_raven,
     configure_stats,
@@ -124,7 +125,7 @@ def configure_export(redis_client, app_config):
 
 
 def init_worker(celery_app, app_config,
-                _db_rw=None, _db_ro=None, _geoip_db=None,
+                _db_rw=None, _db_ro=None, _geoip_db=None, _http_session=None,
                 _raven_client=None, _redis_client=None, _stats_client=None):
     """
     Configure the passed in celery app, usually stored in
@@ -162,6 +163,8 @@ def init_worker(celery_app, app_config,
         app_config.get('geoip', 'db_path'), raven_client=raven_client,
         _client=_geoip_db)
 
+    celery_app.http_session = configure_http_session(_session=_http_session)
+
     # configure data / export queues
     celery_app.all_queues = all_queues = set([q.name for q in CELERY_QUEUES])
 
@@ -185,6 +188,9 @@ def shutdown_worker(celery_app):
     celery_app.db_rw.engine.pool.dispose()
     del celery_app.db_rw
 
+    celery_app.http_session.close()
+    del celery_app.http_session
+
     del celery_app.raven_client
 
     celery_app.redis_client.connection_pool.disconnect()
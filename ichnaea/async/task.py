@@ -93,6 +93,11 @@ class BaseTask(Task):
         """Exposes a :class:`~ichnaea.geoip.GeoIPWrapper`."""
         return self.app.geoip_db
 
+    @property
+    def http_session(self):
+        """Exposes a :class:`requests.Session`."""
+        return self.app.http_session
+
     @property
     def raven_client(self):
         """Exposes a :class:`~raven.Client`."""
@@ -8,7 +8,7 @@ from ichnaea.geocalc import (
     centroid,
     circle_radius,
 )
-from ichnaea.geocode import GEOCODER
+from ichnaea.geocode import REGION_CACHE
 from ichnaea.models import (
     decode_cellarea,
     CellArea,
@@ -61,7 +61,7 @@ class CellAreaUpdater(DataTask):
             if len(max_regions) > 1:
                 # Try to break the tie based on the center of the area,
                 # but keep the randomly chosen region if this fails.
-                area_region = GEOCODER.region_for_cell(
+                area_region = REGION_CACHE.region_for_cell(
                     ctr_lat, ctr_lon, mcc)
                 if area_region is not None:
                     region = area_region
@@ -1,15 +1,21 @@
 from collections import namedtuple
-from contextlib import closing
+from multiprocessing.pool import ThreadPool
+import time
 import uuid
 
-import boto
 import requests
 import simplejson
 from six.moves.urllib.parse import urlparse
 
 from ichnaea.data.base import DataTask
+from ichnaea.s3 import S3Bucket
 from ichnaea import util
 
+BACKUP_HEADERS = {
+    'Content-Encoding': 'gzip',
+    'Content-Type': 'application/json',
+}
+
 MetadataGroup = namedtuple('MetadataGroup', 'api_key email ip nickname')
 
 
@@ -38,12 +44,9 @@ class ExportScheduler(DataTask):
 
     def schedule_multiple(self, export_queue, export_task):
         triggered = 0
-        queue_prefix = export_queue.queue_prefix
-        for queue_key in self.redis_client.scan_iter(match=queue_prefix + '*',
-                                                     count=100):
-            if export_queue.enough_data(queue_key):
-                export_task.delay(export_queue.name, queue_key=queue_key)
-                triggered += 1
+        for queue_key in export_queue.ready_queue_keys():
+            export_task.delay(export_queue.name, queue_key=queue_key)
+            triggered += 1
         return triggered
 
 
@@ -87,26 +90,29 @@ class ReportExporter(DataTask):
 
     def __call__(self, export_task, upload_task):
         export_queue = self.export_queue
-        if not export_queue.enough_data(self.queue_key):  # pragma: no cover
+        size, age = export_queue.size_age(self.queue_key)
+        # export partial batches, once the queue hasn't seen new data
+        # for a while
+        expired = age >= export_queue.queue_max_age
+        if not size or (size < self.batch and not expired):
+            return  # pragma: no cover
+
+        batch = self.batch
+        if batch and export_queue.concurrency > 1:
+            # dequeue multiple full batches, to upload them concurrently
+            batch *= max(min(size // batch, export_queue.concurrency), 1)
+
+        items = export_queue.dequeue(self.queue_key, batch=batch)
+        if not items:  # pragma: no cover
             return
 
-        items = export_queue.dequeue(self.queue_key, batch=self.batch)
-        if items and len(items) < self.batch:  # pragma: no cover
+        if len(items) < self.batch and not expired:  # pragma: no cover
             # race condition, something emptied the queue in between
             # our llen call and fetching the items, put them back
             export_queue.enqueue(items, self.queue_key)
             return
 
-        if self.metadata:  # pragma: no cover
-            reports = items
-        else:
-            # split out metadata
-            reports = {'items': [item['report'] for item in items]}
-
-        upload_task.delay(
-            self.export_queue_name,
-            simplejson.dumps(reports),
-            queue_key=self.queue_key)
+        self.upload(items, upload_task)
 
         # check the queue at the end, if there's still enough to do
         # schedule another job, but give it a second before it runs
@@ -117,6 +123,52 @@ class ReportExporter(DataTask):
                 countdown=1,
                 expires=300)
 
+    def _payloads(self, items):
+        if self.metadata:  # pragma: no cover
+            template = '[%s]'
+        else:
+            # split out metadata
+            template = '{"items": [%s]}'
+            items = [item['report'] for item in items]
+
+        # split the items into payloads of up to batch reports and
+        # batch_bytes of encoded reports, but at least one report each
+        batch = self.batch or len(items)
+        batch_bytes = self.export_queue.batch_bytes
+        parts = []
+        size = 0
+        for item in items:
+            part = simplejson.dumps(item)
+            if parts and (len(parts) >= batch or (
+                    batch_bytes and size + len(part) > batch_bytes)):
+                yield template % ', '.join(parts)
+                parts = []
+                size = 0
+            parts.append(part)
+            size += len(part) + 2
+        if parts:
+            yield template % ', '.join(parts)
+
+    def upload(self, items, upload_task):
+        # compress each payload once and keep it in Redis, only
+        # passing a reference to it to the upload task
+        export_queue = self.export_queue
+        with self.redis_client.pipeline() as pipe:
+            upload_keys = []
+            for payload in self._payloads(items):
+                upload_keys.append(export_queue.store_upload(
+                    util.encode_gzip(
+                        payload, compresslevel=export_queue.compresslevel),
+                    pipe))
+            pipe.execute()
+
+        concurrency = export_queue.concurrency
+        for i in range(0, len(upload_keys), concurrency):
+            upload_task.delay(
+                self.export_queue_name, None,
+                queue_key=self.queue_key,
+                upload_keys=upload_keys[i:i + concurrency])
+
 
 class ReportUploader(DataTask):
 
@@ -131,37 +183,82 @@ class ReportUploader(DataTask):
         if not self.queue_key:  # pragma: no cover
             self.queue_key = self.export_queue.queue_key()
 
-    def __call__(self, data):
+    def __call__(self, data, upload_keys=None):
+        if upload_keys is None:
+            # BBB uncompressed data passed in by older versions
+            self._send(util.encode_gzip(
+                data, compresslevel=self.export_queue.compresslevel))
+            return
+
+        concurrency = min(self.export_queue.concurrency, len(upload_keys))
+        if concurrency > 1:
+            pool = ThreadPool(concurrency)
+            try:
+                pool.map(self._upload, upload_keys)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for upload_key in upload_keys:
+                self._upload(upload_key)
+
+    def _upload(self, upload_key):
+        data = self.export_queue.load_upload(upload_key)
+        if data is None:  # pragma: no cover
+            # expired or already uploaded by an earlier try
+            return
+        self._send(data)
+        self.export_queue.delete_upload(upload_key)
+
+    def _send(self, data):
         self.send(self.url, data)
         self.stats_client.incr(
             self.stats_prefix + 'batch', tags=self.stats_tags)
 
     def send(self, url, data):
+        """Send the gzip compressed data to the url."""
         raise NotImplementedError()
 
 
 class GeosubmitUploader(ReportUploader):
 
-    def send(self, url, data):
-        headers = {
-            'Content-Encoding': 'gzip',
-            'Content-Type': 'application/json',
-            'User-Agent': 'ichnaea',
-        }
+    retry_backoff = 1.0  #: Delay before retrying a failed request once.
+
+    def _post(self, url, data, headers):
         with self.stats_client.timed(self.stats_prefix + 'upload',
                                      tags=self.stats_tags):
-            response = requests.post(
+            response = self.task.http_session.post(
                 url,
-                data=util.encode_gzip(data, compresslevel=5),
+                data=data,
                 headers=headers,
                 timeout=60.0,
             )
-
-        # log upload_status and trigger exception for bad responses
-        # this causes the task to be re-tried
         self.stats_client.incr(
             self.stats_prefix + 'upload',
             tags=self.stats_tags + ['status:%s' % response.status_code])
+        return response
+
+    def send(self, url, data):
+        headers = {
+            'Content-Encoding': 'gzip',
+            'Content-Type': 'application/json',
+            'User-Agent': 'ichnaea',
+        }
+        # retry connection and server errors once right away, any
+        # further backoff is left to the task retries
+        try:
+            response = self._post(url, data, headers)
+            retry = (response.status_code >= 500 or
+                     response.status_code == 429)
+        except requests.exceptions.RequestException:
+            retry = True
+
+        if retry:
+            time.sleep(self.retry_backoff)
+            response = self._post(url, data, headers)
+
+        # trigger exception for bad responses
+        # this causes the task to be re-tried
         response.raise_for_status()
 
 
@@ -194,14 +291,8 @@ class S3Uploader(ReportUploader):
         try:
             with self.stats_client.timed(self.stats_prefix + 'upload',
                                          tags=self.stats_tags):
-                conn = boto.connect_s3()
-                bucket = conn.get_bucket(self.bucket)
-                with closing(boto.s3.key.Key(bucket)) as key:
-                    key.key = key_name
-                    key.content_encoding = 'gzip'
-                    key.content_type = 'application/json'
-                    key.set_contents_from_string(
-                        util.encode_gzip(data, compresslevel=7))
+                S3Bucket(self.bucket).upload_string(
+                    key_name, data, headers=BACKUP_HEADERS)
 
             self.stats_client.incr(
                 self.stats_prefix + 'upload',
@@ -6,8 +6,12 @@ import simplejson
 
 from ichnaea.data.export import (
     MetadataGroup,
+    ReportExporter,
     ReportUploader,
 )
+from ichnaea.data.report import ReportQueue
+from ichnaea.models import ApiKey
+from ichnaea import util
 
 
 class InternalTransform(object):
@@ -57,30 +61,38 @@ class InternalTransform(object):
         ('signalStrength', 'signal'),
     ]
 
-    def conditional_set(self, item, target, value):
-        if value is not None:
-            item[target] = value
+    def __init__(self):
+        # precompile the field maps into source to target rename tables
+        self.position_rename = self._rename_table(self.position_map)
+        self.cell_rename = self._rename_table(self.cell_map)
+        self.wifi_rename = self._rename_table(self.wifi_map)
 
-    def _map_dict(self, item_source, field_map):
-        value = {}
+    @staticmethod
+    def _rename_table(field_map):
+        table = {}
         for spec in field_map:
             if isinstance(spec, tuple):
-                source, target = spec
+                table[spec[0]] = spec[1]
             else:
-                source = spec
-                target = spec
-            self.conditional_set(value, target,
-                                 item_source.get(source))
+                table[spec] = spec
+        return table
+
+    def _map_dict(self, item_source, rename):
+        value = {}
+        for source, source_value in item_source.items():
+            target = rename.get(source)
+            if target is not None and source_value is not None:
+                value[target] = source_value
         return value
 
-    def _parse_dict(self, item, report, key_map, field_map):
+    def _parse_dict(self, item, report, key_map, rename):
         value = {}
         if key_map[0] is None:  # pragma: no cover
             item_source = item
         else:
             item_source = item.get(key_map[0])
         if item_source:
-            value = self._map_dict(item_source, field_map)
+            value = self._map_dict(item_source, rename)
         if value:
             if key_map[1] is None:
                 report.update(value)
@@ -88,52 +100,41 @@ class InternalTransform(object):
                 report[key_map[1]] = value
         return value
 
-    def _parse_list(self, item, report, key_map, field_map):
+    def _parse_list(self, item, report, key_map, rename):
         values = []
+        map_dict = self._map_dict
         for value_item in item.get(key_map[0], ()):
-            value = self._map_dict(value_item, field_map)
+            value = map_dict(value_item, rename)
             if value:
                 values.append(value)
         if values:
             report[key_map[1]] = values
         return values
 
-    def _parse_cells(self, item, report, key_map, field_map):
-        cells = []
-        for cell_item in item.get(key_map[0], ()):
-            cell = self._map_dict(cell_item, field_map)
-            if cell:
-                cells.append(cell)
-        if cells:
-            report[key_map[1]] = cells
-        return cells
-
     def __call__(self, item):
         report = {}
-        self._parse_dict(item, report, self.position_id, self.position_map)
+        self._parse_dict(item, report, self.position_id, self.position_rename)
 
         timestamp = item.get('timestamp')
         if timestamp:
             report['timestamp'] = timestamp
 
-        cells = self._parse_cells(item, report, self.cell_id, self.cell_map)
-        wifis = self._parse_list(item, report, self.wifi_id, self.wifi_map)
+        cells = self._parse_list(item, report, self.cell_id, self.cell_rename)
+        wifis = self._parse_list(item, report, self.wifi_id, self.wifi_rename)
 
         if cells or wifis:
             return report
         return {}
 
 
-class InternalUploader(ReportUploader):
+class InternalIngest(object):
+    """
+    Mixin transforming export queue items and passing them
+    straight into the report processing of the same process.
+    """
 
     transform = InternalTransform()
 
-    @staticmethod
-    def _task():
-        # avoiding import cycle problems, sigh!
-        from ichnaea.data.tasks import insert_reports
-        return insert_reports
-
     def _format_report(self, item):
         report = self.transform(item)
 
@@ -144,19 +145,49 @@ class InternalUploader(ReportUploader):
 
         return report
 
-    def send(self, url, data):
+    def ingest(self, items):
         groups = defaultdict(list)
-        for item in simplejson.loads(data):
+        for item in items:
             group = MetadataGroup(**item['metadata'])
             report = self._format_report(item['report'])
             if report:
                 groups[group].append(report)
 
-        for group, reports in groups.items():
-            self._task().apply_async(
-                kwargs={
-                    'api_key': group.api_key,
-                    'nickname': group.nickname,
-                    'reports': reports,
-                },
-                expires=21600)
+        if not groups:
+            return
+
+        with self.task.redis_pipeline() as pipe:
+            with self.task.db_session() as session:
+                for group, reports in groups.items():
+                    api_key = (group.api_key and
+                               session.query(ApiKey).get(group.api_key))
+                    ReportQueue(
+                        self.task, session, pipe,
+                        api_key=api_key,
+                        nickname=group.nickname,
+                    )(reports)
+
+
+class InternalExporter(InternalIngest, ReportExporter):
+    """
+    Export batches of the internal queue by processing them directly,
+    without sending them through the upload and insert tasks.
+    """
+
+    def upload(self, items, upload_task):
+        try:
+            self.ingest(items)
+        except Exception:
+            # the items were already dequeued, put them back so a
+            # retry of the export task can process them again
+            self.export_queue.enqueue(items, self.queue_key)
+            raise
+        self.stats_client.incr(
+            'data.export.batch', tags=['key:%s' % self.export_queue_name])
+
+
+class InternalUploader(InternalIngest, ReportUploader):
+    # BBB for upload_reports tasks queued by older versions
+
+    def send(self, url, data):
+        self.ingest(simplejson.loads(util.decode_gzip(data)))
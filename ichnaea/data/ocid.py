@@ -3,25 +3,102 @@ from contextlib import closing
 import csv
 from datetime import datetime, timedelta
 from functools import partial
+import gzip
 import os
+import shutil
+import threading
 
-import boto
+import billiard
+import numpy
+from pymysql.cursors import SSCursor
 import requests
+import six
+from six.moves import queue
 from sqlalchemy.sql import text
 
+from ichnaea.db import (
+    configure_db,
+    db_worker_session,
+)
 from ichnaea import geocalc
+from ichnaea.geocode import GEOCODER
 from ichnaea.models import (
+    constants,
     encode_cellarea,
+    encode_cellid,
+    CellChangeLog,
     CellOCID,
     CellShard,
     Radio,
     StatCounter,
     StatKey,
 )
+from ichnaea.s3 import S3Bucket
 from ichnaea import util
 
-
-def write_stations_to_csv(session, path, start_time=None, end_time=None):
+EXPORT_HEADERS = {
+    'Content-Type': 'text/csv',
+}
+
+
+class BackgroundWriter(object):
+    """
+    Write data to a file object in a background thread.
+
+    Compressing the data releases the GIL, so the compression can
+    overlap with fetching the next rows from the database.
+    """
+
+    def __init__(self, fd, queue_size=8):
+        self.fd = fd
+        self.error = None
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.queue.put(None)
+        self.thread.join()
+        if exc_type is None and self.error is not None:
+            raise self.error
+
+    def _run(self):
+        while True:
+            data = self.queue.get()
+            if data is None:
+                break
+            if self.error is None:
+                try:
+                    self.fd.write(data)
+                except Exception as exc:  # pragma: no cover
+                    # Keep consuming the queue, so the writer isn't blocked.
+                    self.error = exc
+
+    def write(self, data):
+        if self.error is not None:  # pragma: no cover
+            raise self.error
+        self.queue.put(data)
+
+
+def write_stations_to_csv(session, path, start_time=None, end_time=None,
+                          cellids=None, compresslevel=5,
+                          page_size=100000, batch=10000, fileobj=None):
+    """
+    Write all complete cells into a gzipped CSV file at `path`,
+    or into the binary file object `fileobj` if one is passed in.
+
+    Each cell table is read in pages ordered by the `cellid` primary key,
+    continuing after the last cellid of the previous page. The rows of
+    each page are streamed from the database via a server side cursor
+    in batches of `batch` rows.
+
+    If a list of `cellids` is passed in, only those cells are looked
+    up by their primary key, in chunks of `batch` cellids.
+    """
     where = 'radio != 1 AND lat IS NOT NULL AND lon IS NOT NULL'
     if None not in (start_time, end_time):
         where = where + ' AND modified >= "%s" AND modified < "%s"'
@@ -37,6 +114,7 @@ def write_stations_to_csv(session, path, start_time=None, end_time=None):
 
     tables = [shard.__tablename__ for shard in CellShard.shards().values()]
     stmt = '''SELECT
+    `cellid`,
     CONCAT_WS(",",
         CASE radio
             WHEN 0 THEN "GSM"
@@ -59,30 +137,62 @@ def write_stations_to_csv(session, path, start_time=None, end_time=None):
         ""
     ) AS `cell_value`
 FROM %s
-WHERE %s
-ORDER BY `radio`, `mcc`, `mnc`, `lac`, `cid`
-LIMIT :l
-OFFSET :o
+WHERE %s AND %s
+ORDER BY `cellid`
+%s
 '''
 
-    limit = 10000
-    offset = 0
-    with util.gzip_open(path, 'w', compresslevel=5) as gzip_wrapper:
-        with gzip_wrapper as gzip_file:
-            gzip_file.write(header_row)
-            for table in tables:
-                table_stmt = text(stmt % (table, where))
-                while True:
-                    rows = session.execute(
-                        table_stmt.bindparams(o=offset, l=limit)).fetchall()
-                    if rows:
-                        buf = '\r\n'.join([row.cell_value for row in rows])
-                        if buf:
-                            buf += '\r\n'
-                        gzip_file.write(buf)
-                        offset += limit
-                    else:
-                        break
+    table_cellids = defaultdict(list)
+    if cellids is not None:
+        for cellid in cellids:
+            shard = CellShard.shard_model(cellid)
+            if shard is not None:
+                table_cellids[shard.__tablename__].append(cellid)
+
+    # Use the raw connection, to get an unbuffered server side cursor.
+    cursor = session.connection().connection.cursor(SSCursor)
+
+    def write_rows(writer, table_stmt, params):
+        # Returns the number of written rows and the last cellid.
+        cursor.execute(table_stmt, params)
+        count = 0
+        cellid = None
+        while True:
+            rows = cursor.fetchmany(batch)
+            if not rows:
+                break
+            count += len(rows)
+            cellid = rows[-1][0]
+            writer.write('\r\n'.join([row[1] for row in rows]) + '\r\n')
+        return (count, cellid)
+
+    try:
+        with util.gzip_open(path, 'w', compresslevel=compresslevel,
+                            fileobj=fileobj) as gzip_wrapper:
+            with gzip_wrapper as gzip_file:
+                with BackgroundWriter(gzip_file) as writer:
+                    writer.write(header_row)
+                    for table in tables:
+                        if cellids is not None:
+                            table_stmt = stmt % (
+                                table, where, '`cellid` IN %(cellids)s', '')
+                            values = sorted(table_cellids[table])
+                            for i in range(0, len(values), batch):
+                                write_rows(writer, table_stmt, {
+                                    'cellids': values[i:i + batch]})
+                            continue
+
+                        table_stmt = stmt % (
+                            table, where, '`cellid` > %(cellid)s',
+                            'LIMIT %(limit)s')
+                        cellid = b''
+                        while True:
+                            count, cellid = write_rows(writer, table_stmt, {
+                                'cellid': cellid, 'limit': page_size})
+                            if count < page_size:
+                                break
+    finally:
+        cursor.close()
 
 
 class CellExport(object):
@@ -103,12 +213,15 @@ class CellExport(object):
         now = util.utcnow()
         start_time = None
         end_time = None
+        cellids = None
 
         if hourly:
             end_time = now.replace(minute=0, second=0)
             file_time = end_time
             file_type = 'diff'
             start_time = end_time - timedelta(hours=1)
+            # only look up the cells changed during the last hour
+            cellids = CellChangeLog(start_time).get(self.task.redis_client)
         else:
             file_time = now.replace(hour=0, minute=0, second=0)
             file_type = 'full'
@@ -116,25 +229,94 @@ class CellExport(object):
         filename = 'MLS-%s-cell-export-' % file_type
         filename = filename + file_time.strftime('%Y-%m-%dT%H0000.csv.gz')
 
-        with util.selfdestruct_tempdir() as temp_dir:
-            path = os.path.join(temp_dir, filename)
+        # stream the export file into S3 while it is being written
+        upload = S3Bucket(bucket).open_upload(
+            'export/' + filename, headers=EXPORT_HEADERS,
+            reduced_redundancy=True)
+        with upload:
             with self.task.db_session(commit=False) as session:
                 write_stations_to_csv(
-                    session, path,
-                    start_time=start_time, end_time=end_time)
-            self.write_stations_to_s3(path, bucket)
+                    session, filename, fileobj=upload,
+                    start_time=start_time, end_time=end_time,
+                    cellids=cellids, compresslevel=int(
+                        self.settings.get('export_compresslevel', 5)))
+
+
+def chunk_ranges(filename, chunks):
+    """
+    Split the uncompressed file into about `chunks` byte ranges,
+    each starting and ending at a line boundary.
+
+    Returns a list of two-tuples of start and end offsets.
+    """
+    size = os.path.getsize(filename)
+    chunk_size = max(size // max(chunks, 1), 1)
+    ranges = []
+    start = 0
+    with open(filename, 'rb') as fd:
+        while start < size:
+            fd.seek(min(start + chunk_size, size))
+            fd.readline()
+            end = fd.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def read_chunk(filename, start, end):
+    """
+    Yield the lines of the uncompressed file between the start and
+    end byte offsets.
+    """
+    with open(filename, 'rb') as fd:
+        fd.seek(start)
+        position = start
+        while position < end:
+            line = fd.readline()
+            if not line:  # pragma: no cover
+                break
+            position += len(line)
+            if six.PY2:  # pragma: no cover
+                yield line
+            else:
+                yield line.decode('utf-8')
+
+
+def import_chunk_rows(session, cell_type, filename, start, end):
+    """
+    Import the rows in the given byte range of the uncompressed CSV file
+    using the given database session.
+    """
+    importer = ImportBase(None, cell_type=cell_type)
+    inserted_rows, areaids, changes = importer.import_rows(
+        session, csv.reader(read_chunk(filename, start, end)))
+    return (inserted_rows, list(areaids), changes)
+
+
+def import_chunk(db_url, cell_type, filename, start, end):
+    # this is executed in a worker process, using its own engine
+    db = configure_db(db_url)
+    try:
+        with db_worker_session(db) as session:
+            return import_chunk_rows(
+                session, cell_type, filename, start, end)
+    finally:
+        db.engine.pool.dispose()
 
-    def write_stations_to_s3(self, path, bucketname):
-        conn = boto.connect_s3()
-        bucket = conn.get_bucket(bucketname)
-        with closing(boto.s3.key.Key(bucket)) as key:
-            key.key = 'export/' + os.path.split(path)[-1]
-            key.set_contents_from_filename(path, reduced_redundancy=True)
+
+def _parse_column(values, dtype):
+    # Parse a sequence of strings into an array of the given dtype,
+    # also returning a mask of the missing / empty values.
+    values = numpy.array(values)
+    missing = values == ''
+    values[missing] = '0'
+    return (values.astype(dtype), missing)
 
 
 class ImportBase(object):
 
     batch_size = 10000
+    bulk_batch_size = 100000
     import_spec = [
         ('mcc', 1, None, int),
         ('mnc', 2, None, int),
@@ -151,20 +333,44 @@ class ImportBase(object):
         # skip averageSignal
     ]
 
+    on_duplicate = (
+        '`modified` = values(`modified`)'
+        ', `lat` = values(`lat`)'
+        ', `lon` = values(`lon`)'
+        ', `psc` = values(`psc`)'
+        ', `max_lat` = values(`max_lat`)'
+        ', `min_lat` = values(`min_lat`)'
+        ', `max_lon` = values(`max_lon`)'
+        ', `min_lon` = values(`min_lon`)'
+        ', `radius` = values(`radius`)'
+        ', `samples` = values(`samples`)'
+    )
+
+    # columns of the bulk import staging files
+    bulk_columns = (
+        'radio', 'mcc', 'mnc', 'lac', 'cid', 'psc',
+        'lat', 'lon', 'max_lat', 'min_lat', 'max_lon', 'min_lon',
+        'radius', 'samples', 'region', 'created', 'modified',
+    )
+
     def __init__(self, task, cell_type='ocid'):
         self.task = task
         self.cell_type = cell_type
         if cell_type == 'ocid':
             self.cell_model = CellOCID
-            self.area_queue = task.app.data_queues['update_cellarea_ocid']
+            self.area_queue_name = 'update_cellarea_ocid'
             self.stat_key = StatKey.unique_cell_ocid
         elif cell_type == 'cell':
             self.cell_model = CellShard
-            self.area_queue = task.app.data_queues['update_cellarea']
+            self.area_queue_name = 'update_cellarea'
             self.stat_key = StatKey.unique_cell
 
+    @property
+    def area_queue(self):
+        return self.task.app.data_queues[self.area_queue_name]
+
     @staticmethod
-    def make_import_dict(validate, import_spec, row):
+    def make_import_dict(import_spec, row):
         data = {}
 
         # parse radio field
@@ -191,38 +397,65 @@ class ImportBase(object):
             data['max_lon'], data['min_lon'] = geocalc.bbox(
                 data['lat'], data['lon'], data['radius'])
 
-        validated = validate(data)
-        if validated is None:
-            return None
-        for field in ('region', 'cellid',
-                      'radio', 'mcc', 'mnc', 'lac', 'cid'):
-            if validated[field] is None:
-                return None
+        return data
 
-        return validated
+    @staticmethod
+    def validate_import_dicts(validate, batch):
+        # Reverse geocode the entire batch in one go, so the
+        # validation doesn't have to do it one row at a time.
+        batch = [data for data in batch
+                 if data['lat'] is not None and data['lon'] is not None]
+        regions = GEOCODER.region_for_cell_many(
+            [data['lat'] for data in batch],
+            [data['lon'] for data in batch],
+            [data['mcc'] for data in batch])
+
+        result = []
+        for data, region in zip(batch, regions):
+            if region is None:
+                continue
+            data['region'] = region
+
+            validated = validate(data)
+            if validated is None:
+                continue
+            for field in ('region', 'cellid',
+                          'radio', 'mcc', 'mnc', 'lac', 'cid'):
+                if validated[field] is None:
+                    break
+            else:
+                result.append(validated)
 
-    def import_stations(self, session, pipe, filename):
-        today = util.utcnow().date()
-        shards = self.cell_model.shards()
+        return result
 
-        on_duplicate = (
-            '`modified` = values(`modified`)'
-            ', `lat` = values(`lat`)'
-            ', `lon` = values(`lon`)'
-            ', `psc` = values(`psc`)'
-            ', `max_lat` = values(`max_lat`)'
-            ', `min_lat` = values(`min_lat`)'
-            ', `max_lon` = values(`max_lon`)'
-            ', `min_lon` = values(`min_lon`)'
-            ', `radius` = values(`radius`)'
-            ', `samples` = values(`samples`)'
-        )
+    def import_rows(self, session, rows):
+        """
+        Import the CSV rows in batches.
+
+        Returns the number of newly inserted stations, a set of
+        area id tuples of all imported stations and a list of cellid,
+        modified tuples for the cell change logs.
+        """
+        shards = self.cell_model.shards()
+        areaids = set()
+        changes = []
+
+        def commit_batch(batch):
+            rows = defaultdict(list)
+            for data in self.validate_import_dicts(
+                    self.cell_model.validate, batch):
+                rows[self.cell_model.shard_id(data['radio'])].append(data)
+                areaids.add((int(data['radio']), data['mcc'],
+                            data['mnc'], data['lac']))
+                if (self.cell_type == 'cell' and
+                        CellChangeLog.retained(data['modified'])):
+                    changes.append((encode_cellid(*data['cellid']),
+                                    data['modified']))
 
-        def commit_batch(rows):
             all_inserted_rows = 0
             for shard_id, shard_rows in rows.items():
                 table_insert = shards[shard_id].__table__.insert(
-                    mysql_on_duplicate=on_duplicate)
+                    mysql_on_duplicate=self.on_duplicate)
 
                 result = session.execute(table_insert, shard_rows)
                 count = result.rowcount
@@ -232,41 +465,322 @@ class ImportBase(object):
                 changed_rows = count - len(shard_rows)
                 assert inserted_rows + changed_rows == len(shard_rows)
                 all_inserted_rows += inserted_rows
-            StatCounter(self.stat_key, today).incr(pipe, all_inserted_rows)
+            return all_inserted_rows
 
-        areaids = set()
+        parse_row = partial(self.make_import_dict, self.import_spec)
+        inserted_rows = 0
+        batch = []
+        for row in rows:
+            # skip any header row
+            if row and row[0] == 'radio':  # pragma: no cover
+                continue
+
+            data = parse_row(row)
+            if data is not None:
+                batch.append(data)
+
+            if len(batch) == self.batch_size:  # pragma: no cover
+                inserted_rows += commit_batch(batch)
+                session.flush()
+                batch = []
+
+        if batch:
+            inserted_rows += commit_batch(batch)
+
+        return (inserted_rows, areaids, changes)
+
+    def log_changes(self, pipe, changes):
+        if changes:
+            CellChangeLog.add_changes(pipe, changes)
+
+    def import_stations(self, session, pipe, filename):
+        today = util.utcnow().date()
 
         with util.gzip_open(filename, 'r') as gzip_wrapper:
             with gzip_wrapper as gzip_file:
-                cell_model = self.cell_model
-                csv_reader = csv.reader(gzip_file)
-                parse_row = partial(self.make_import_dict,
-                                    self.cell_model.validate,
-                                    self.import_spec)
-
-                rows = defaultdict(list)
-                row_count = 0
-                for row in csv_reader:
-                    # skip any header row
-                    if (csv_reader.line_num == 1 and
-                            row[0] == 'radio'):  # pragma: no cover
-                        continue
-
-                    data = parse_row(row)
-                    if data is not None:
-                        rows[cell_model.shard_id(data['radio'])].append(data)
-                        row_count += 1
-                        areaids.add((int(data['radio']), data['mcc'],
-                                    data['mnc'], data['lac']))
-
-                    if row_count == self.batch_size:  # pragma: no cover
-                        commit_batch(rows)
-                        session.flush()
-                        rows = defaultdict(list)
-                        row_count = 0
-
-                if rows:
-                    commit_batch(rows)
+                inserted_rows, areaids, changes = self.import_rows(
+                    session, csv.reader(gzip_file))
+
+        StatCounter(self.stat_key, today).incr(pipe, inserted_rows)
+        self.log_changes(pipe, changes)
+        self.area_queue.enqueue(
+            [encode_cellarea(*id_) for id_ in areaids], json=False)
+
+    def parallel_import_stations(self, pipe, filename, db_url, processes):
+        """
+        Import the stations from the gzipped CSV file using a pool of
+        worker processes.
+
+        The file is uncompressed and split into byte range chunks.
+        Each worker process imports whole chunks using its own
+        database connection.
+        """
+        today = util.utcnow().date()
+        inserted_rows = 0
+        areaids = set()
+        changes = []
+
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'import.csv')
+            with closing(gzip.open(filename, 'rb')) as gzip_file:
+                with open(path, 'wb') as fd:
+                    shutil.copyfileobj(gzip_file, fd, 2 ** 20)
+
+            pool = billiard.Pool(processes=processes)
+            try:
+                jobs = []
+                # use more chunks than processes to even out the load
+                for start, end in chunk_ranges(path, processes * 4):
+                    jobs.append(pool.apply_async(
+                        import_chunk,
+                        (db_url, self.cell_type, path, start, end)))
+
+                for job in jobs:
+                    chunk_inserted_rows, chunk_areaids, chunk_changes = \
+                        job.get()
+                    inserted_rows += chunk_inserted_rows
+                    areaids.update([tuple(id_) for id_ in chunk_areaids])
+                    changes.extend(chunk_changes)
+            finally:
+                pool.close()
+                pool.join()
+
+        StatCounter(self.stat_key, today).incr(pipe, inserted_rows)
+        self.log_changes(pipe, changes)
+        self.area_queue.enqueue(
+            [encode_cellarea(*id_) for id_ in areaids], json=False)
+
+    @staticmethod
+    def parse_bulk_rows(rows):
+        """
+        Parse and validate a chunk of CSV rows in one go.
+
+        Returns a dictionary mapping the column names to NumPy arrays,
+        only including the valid rows. The validation matches the one
+        done by the cell model schema for individual rows.
+        """
+        rows = [row for row in rows if len(row) > 12]
+        if not rows:
+            return None
+
+        radio_names = numpy.array([row[0].lower() for row in rows])
+        radio = numpy.empty(len(rows), dtype=numpy.int8)
+        radio[:] = -1
+        for name in ('gsm', 'wcdma', 'umts', 'lte'):
+            radio[radio_names == name] = int(Radio[name])
+
+        mcc, mcc_missing = _parse_column([row[1] for row in rows], numpy.int64)
+        mnc, mnc_missing = _parse_column([row[2] for row in rows], numpy.int64)
+        lac, lac_missing = _parse_column([row[3] for row in rows], numpy.int64)
+        cid, cid_missing = _parse_column([row[4] for row in rows], numpy.int64)
+        psc, psc_missing = _parse_column([row[5] for row in rows], numpy.int64)
+        lon, lon_missing = _parse_column(
+            [row[6] for row in rows], numpy.double)
+        lat, lat_missing = _parse_column(
+            [row[7] for row in rows], numpy.double)
+        radius, _ = _parse_column([row[8] for row in rows], numpy.int64)
+        samples, _ = _parse_column([row[9] for row in rows], numpy.int64)
+        created, _ = _parse_column([row[11] for row in rows], numpy.int64)
+        modified, _ = _parse_column([row[12] for row in rows], numpy.int64)
+
+        # If the cell id > 65535 then it must be a WCDMA tower
+        radio[(radio == int(Radio.gsm)) & ~cid_missing &
+              (cid > constants.MAX_CID_GSM)] = int(Radio.wcdma)
+
+        # Out of range psc values are treated as unspecified
+        psc_missing |= (psc < constants.MIN_PSC) | (psc > constants.MAX_PSC)
+
+        valid = (
+            (radio >= 0) &
+            ~mcc_missing & numpy.in1d(mcc, list(constants.ALL_VALID_MCCS)) &
+            ~mnc_missing &
+            (mnc >= constants.MIN_MNC) & (mnc <= constants.MAX_MNC) &
+            ~lac_missing &
+            (lac >= constants.MIN_LAC) & (lac <= constants.MAX_LAC) &
+            ~cid_missing &
+            (cid >= constants.MIN_CID) & (cid <= constants.MAX_CID) &
+            ~((radio == int(Radio.lte)) & ~psc_missing &
+              (psc > constants.MAX_PSC_LTE)) &
+            ~lat_missing &
+            (lat >= constants.MIN_LAT) & (lat <= constants.MAX_LAT) &
+            ~lon_missing &
+            (lon >= constants.MIN_LON) & (lon <= constants.MAX_LON) &
+            (radius >= 0) & (radius <= constants.CELL_MAX_RADIUS)
+        )
+
+        rows = numpy.flatnonzero(valid)
+        region = numpy.array(GEOCODER.region_for_cell_many(
+            lat[rows], lon[rows], mcc[rows]), dtype=object)
+        rows = rows[region != numpy.array(None)]
+        region = region[region != numpy.array(None)]
+
+        bbox = numpy.array(
+            [geocalc.bbox(lat_, lon_, radius_) for lat_, lon_, radius_ in
+             zip(lat[rows].tolist(), lon[rows].tolist(),
+                 radius[rows].tolist())],
+            dtype=numpy.double).reshape(-1, 4)
+
+        return {
+            'radio': radio[rows],
+            'mcc': mcc[rows],
+            'mnc': mnc[rows],
+            'lac': lac[rows],
+            'cid': cid[rows],
+            'psc': numpy.where(psc_missing[rows], -1, psc[rows]),
+            'lat': lat[rows],
+            'lon': lon[rows],
+            'max_lat': bbox[:, 0],
+            'min_lat': bbox[:, 1],
+            'max_lon': bbox[:, 2],
+            'min_lon': bbox[:, 3],
+            'radius': radius[rows],
+            'samples': samples[rows],
+            'region': region,
+            'created': created[rows],
+            'modified': modified[rows],
+        }
+
+    def write_bulk_file(self, path, columns, rows):
+        """
+        Write the given rows of the parsed columns into a tab separated
+        staging file, suitable for `LOAD DATA`.
+        """
+        values = []
+        for name in self.bulk_columns:
+            column = columns[name][rows].tolist()
+            if name == 'psc':
+                values.append([str(value) if value >= 0 else '\\N'
+                               for value in column])
+            elif columns[name].dtype.kind == 'f':
+                # repr keeps the full precision on Python 2
+                values.append(map(repr, column))
+            else:
+                values.append(map(str, column))
+
+        with open(path, 'w') as fd:
+            fd.write('\n'.join(map('\t'.join, zip(*values))))
+            fd.write('\n')
+
+    def bulk_import_stations(self, session, pipe, filename):
+        """
+        Import the stations from the gzipped CSV file in large batches.
+
+        Each batch is written into a staging file per shard, which
+        gets loaded into a temporary staging table via
+        `LOAD DATA LOCAL INFILE` and merged into the shard table with
+        a single `INSERT ... SELECT` statement.
+
+        The database connection needs to allow `LOCAL INFILE`.
+        """
+        today = util.utcnow().date()
+        areaids = set()
+
+        column_names = ', '.join(
+            ['`%s`' % name for name in self.bulk_columns])
+        load_stmt = (
+            'LOAD DATA LOCAL INFILE :path REPLACE INTO TABLE `{staging}` '
+            'FIELDS TERMINATED BY \'\\t\' LINES TERMINATED BY \'\\n\' '
+            '({load_columns}) '
+            'SET `created` = DATE_ADD(\'1970-01-01\', '
+            'INTERVAL @created SECOND), '
+            '`modified` = DATE_ADD(\'1970-01-01\', '
+            'INTERVAL @modified SECOND), '
+            '`block_count` = 0, '
+            '`cellid` = UNHEX(CONCAT('
+            'LPAD(HEX(`radio`), 2, \'0\'), LPAD(HEX(`mcc`), 4, \'0\'), '
+            'LPAD(HEX(`mnc`), 4, \'0\'), LPAD(HEX(`lac`), 4, \'0\'), '
+            'LPAD(HEX(`cid`), 8, \'0\')))'
+        )
+        merge_stmt = (
+            'INSERT INTO `{table}` (`cellid`, `block_count`, {columns}) '
+            'SELECT `cellid`, `block_count`, {columns} FROM `{staging}` '
+            'ON DUPLICATE KEY UPDATE {on_duplicate}'
+        )
+
+        staging_tables = {}
+        for shard_id, shard in self.cell_model.shards().items():
+            table = shard.__tablename__
+            staging_tables[shard_id] = (table, table + '_staging')
+
+        def commit_batch(temp_dir, rows):
+            columns = self.parse_bulk_rows(rows)
+            if columns is None:  # pragma: no cover
+                return
+
+            shards = defaultdict(list)
+            for radio in numpy.unique(columns['radio']):
+                shard_id = self.cell_model.shard_id(Radio(radio))
+                shards[shard_id].append(
+                    numpy.flatnonzero(columns['radio'] == radio))
+
+            all_inserted_rows = 0
+            for shard_id, shard_rows in shards.items():
+                table, staging = staging_tables[shard_id]
+                path = os.path.join(temp_dir, staging + '.tsv')
+                self.write_bulk_file(
+                    path, columns, numpy.concatenate(shard_rows))
+
+                # TRUNCATE would implicitly commit the transaction
+                session.execute(text('DELETE FROM `%s`' % staging))
+                session.execute(text(load_stmt.format(
+                    staging=staging,
+                    load_columns=column_names.replace(
+                        '`created`', '@created').replace(
+                        '`modified`', '@modified'))),
+                    {'path': path})
+                count = session.execute(text(
+                    'SELECT COUNT(*) FROM `%s`' % staging)).scalar()
+                result = session.execute(text(merge_stmt.format(
+                    table=table, staging=staging, columns=column_names,
+                    on_duplicate=self.on_duplicate)))
+                # apply trick to avoid querying for existing rows,
+                # MySQL claims 1 row for an inserted row, 2 for an updated row
+                all_inserted_rows += 2 * count - result.rowcount
+
+                areaids.update([tuple(row) for row in session.execute(text(
+                    'SELECT DISTINCT `radio`, `mcc`, `mnc`, `lac` '
+                    'FROM `%s`' % staging)).fetchall()])
+
+                if self.cell_type == 'cell':
+                    oldest = util.utcnow() - timedelta(
+                        seconds=CellChangeLog.expire)
+                    self.log_changes(pipe, [
+                        tuple(row) for row in session.execute(text(
+                            'SELECT `cellid`, `modified` FROM `%s` '
+                            'WHERE `modified` >= :oldest' % staging),
+                            {'oldest': oldest.replace(tzinfo=None)})])
+
+            StatCounter(self.stat_key, today).incr(pipe, all_inserted_rows)
+
+        try:
+            for table, staging in staging_tables.values():
+                session.execute(text(
+                    'CREATE TEMPORARY TABLE IF NOT EXISTS `%s` LIKE `%s`' % (
+                        staging, table)))
+
+            with util.selfdestruct_tempdir() as temp_dir:
+                with util.gzip_open(filename, 'r') as gzip_wrapper:
+                    with gzip_wrapper as gzip_file:
+                        csv_reader = csv.reader(gzip_file)
+
+                        rows = []
+                        for row in csv_reader:
+                            # skip any header row
+                            if (csv_reader.line_num == 1 and
+                                    row[0] == 'radio'):  # pragma: no cover
+                                continue
+
+                            rows.append(row)
+                            if len(rows) == self.bulk_batch_size:
+                                commit_batch(temp_dir, rows)
+                                rows = []
+
+                        if rows:
+                            commit_batch(temp_dir, rows)
+        finally:
+            for table, staging in staging_tables.values():
+                session.execute(text(
+                    'DROP TEMPORARY TABLE IF EXISTS `%s`' % staging))
 
         self.area_queue.enqueue(
             [encode_cellarea(*id_) for id_ in areaids], json=False)
@@ -304,9 +818,15 @@ class ImportExternal(ImportBase):
                         temp_file.write(chunk)
                         temp_file.flush()
 
+                processes = int(self.settings.get('processes', 1))
                 with self.task.redis_pipeline() as pipe:
-                    with self.task.db_session() as session:
-                        self.import_stations(session, pipe, path)
+                    if processes > 1:  # pragma: no cover
+                        db_url = self.task.app.settings['database']['rw_url']
+                        self.parallel_import_stations(
+                            pipe, path, db_url, processes)
+                    else:
+                        with self.task.db_session() as session:
+                            self.import_stations(session, pipe, path)
 
 
 class ImportLocal(ImportBase):
@@ -316,5 +836,16 @@ class ImportLocal(ImportBase):
         self.session = session
         self.pipe = pipe
 
-    def __call__(self, filename=None):
-        self.import_stations(self.session, self.pipe, filename)
+    def __call__(self, filename=None, bulk=False,
+                 processes=1, db_url=None):
+        if bulk and processes > 1:
+            raise ValueError(
+                'The bulk import does not support multiple processes.')
+
+        if bulk:
+            self.bulk_import_stations(self.session, self.pipe, filename)
+        elif processes > 1:
+            self.parallel_import_stations(
+                self.pipe, filename, db_url, processes)
+        else:
+            self.import_stations(self.session, self.pipe, filename)
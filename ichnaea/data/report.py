@@ -1,11 +1,14 @@
 from collections import defaultdict
 
+import numpy
+
 from ichnaea.data.base import DataTask
 from ichnaea.models import (
     CellObservation,
     CellReport,
     CellShard,
     DataMap,
+    DataMapDayLog,
     Report,
     Score,
     ScoreKey,
@@ -14,7 +17,8 @@ from ichnaea.models import (
     WifiReport,
     WifiShard,
 )
-from ichnaea.models.content import encode_datamap_grid
+from ichnaea.models.content import encode_datamap_grids
+from ichnaea import util
 
 
 class ReportQueue(DataTask):
@@ -57,32 +61,6 @@ class ReportQueue(DataTask):
                         count,
                         tags=tags + api_tag)
 
-    def new_stations(self, name, station_keys):
-        if len(station_keys) == 0:
-            return 0
-
-        if name == 'cell':
-            model = CellShard
-            key_id = 'cellid'
-        elif name == 'wifi':
-            model = WifiShard
-            key_id = 'mac'
-
-        # assume all stations are unknown
-        unknown_keys = set(station_keys)
-
-        shards = defaultdict(list)
-        for key in unknown_keys:
-            shards[model.shard_model(key)].append(key)
-
-        for shard, keys in shards.items():
-            key_column = getattr(shard, key_id)
-            query = (self.session.query(key_column)
-                                 .filter(key_column.in_(keys)))
-            unknown_keys -= set([getattr(r, key_id) for r in query.all()])
-
-        return len(unknown_keys)
-
     def process_reports(self, reports, userid=None):
         malformed_reports = 0
         positions = set()
@@ -91,10 +69,12 @@ class ReportQueue(DataTask):
             'cell': {'upload': 0, 'drop': 0},
             'wifi': {'upload': 0, 'drop': 0},
         }
-        new_station_count = {'cell': 0, 'wifi': 0}
 
-        for report in reports:
-            cell, wifi, malformed_obs = self.process_report(report)
+        # validate all report positions in one batch
+        valid_reports = Report.create_many(reports)
+        for report, valid_report in zip(reports, valid_reports):
+            cell, wifi, malformed_obs = self.process_report(
+                report, valid_report, userid=userid)
             if cell:
                 observations['cell'].extend(cell)
                 obs_count['cell']['upload'] += len(cell)
@@ -108,17 +88,6 @@ class ReportQueue(DataTask):
             for name in ('cell', 'wifi'):
                 obs_count[name]['drop'] += malformed_obs[name]
 
-        # group by unique station key
-        for name in ('cell', 'wifi'):
-            station_keys = set()
-            for obs in observations[name]:
-                if name == 'cell':
-                    station_keys.add(obs.cellid)
-                elif name == 'wifi':
-                    station_keys.add(obs.mac)
-            # determine scores for stations
-            new_station_count[name] += self.new_stations(name, station_keys)
-
         if observations['cell']:
             sharded_obs = defaultdict(list)
             for ob in observations['cell']:
@@ -138,18 +107,17 @@ class ReportQueue(DataTask):
                 wifi_queue.enqueue(list(values), pipe=self.pipe)
 
         self.process_datamap(positions)
-        self.process_score(userid, positions, new_station_count)
+        self.process_score(userid, positions)
         self.emit_stats(
             len(reports),
             malformed_reports,
             obs_count,
         )
 
-    def process_report(self, data):
+    def process_report(self, data, report, userid=None):
         malformed = {'cell': 0, 'wifi': 0}
         observations = {'cell': {}, 'wifi': {}}
 
-        report = Report.create(**data)
         if report is None:
             return (None, None, malformed)
 
@@ -167,7 +135,10 @@ class ReportQueue(DataTask):
                         continue
 
                     # combine general and specific report data into one
-                    item_obs = obs_cls.combine(report, item_report)
+                    # the user is credited for any new stations
+                    # by the station updaters
+                    item_obs = obs_cls.combine(
+                        report, item_report, userid=userid)
                     item_key = item_obs.unique_key
 
                     # if we have better data for the same key, ignore
@@ -185,48 +156,34 @@ class ReportQueue(DataTask):
         )
 
     def process_datamap(self, positions):
+        positions = [(lat, lon) for lat, lon in positions
+                     if lat is not None and lon is not None]
         if not positions:
             return
 
-        grids = set()
-        for lat, lon in positions:
-            if lat is not None and lon is not None:
-                grids.add(DataMap.scale(lat, lon))
+        points = numpy.array(positions, dtype=numpy.double)
+        lats, lons = DataMap.scale_array(points[:, 0], points[:, 1])
+        shard_ids = DataMap.shard_id_array(lats, lons)
 
-        shards = defaultdict(set)
-        for lat, lon in grids:
-            shards[DataMap.shard_id(lat, lon)].add(
-                encode_datamap_grid(lat, lon))
-
-        for shard_id, values in shards.items():
+        # only queue grids which haven't been queued today, checking
+        # and queueing them as part of the same pipeline
+        today = util.utcnow().date()
+        for shard_id in set(shard_ids.tolist()):
+            mask = shard_ids == shard_id
+            values = list(set(encode_datamap_grids(lats[mask], lons[mask])))
             queue = self.task.app.data_queues['update_datamap_' + shard_id]
-            queue.enqueue(list(values), pipe=self.pipe, json=False)
+            DataMapDayLog(shard_id, today).queue_new(self.pipe, queue, values)
 
-    def process_score(self, userid, positions, new_station_count):
+    def process_score(self, userid, positions):
         if userid is None or len(positions) <= 0:
             return
 
         queue = self.task.app.data_queues['update_score']
-        scores = []
-
         key = Score.to_hashkey(
             userid=userid,
             key=ScoreKey.location,
             time=None)
-        scores.append({'hashkey': key, 'value': len(positions)})
-
-        for name, score_key in (('cell', ScoreKey.new_cell),
-                                ('wifi', ScoreKey.new_wifi)):
-            count = new_station_count[name]
-            if count <= 0:
-                continue
-            key = Score.to_hashkey(
-                userid=userid,
-                key=score_key,
-                time=None)
-            scores.append({'hashkey': key, 'value': count})
-
-        queue.enqueue(scores)
+        queue.enqueue([{'hashkey': key, 'value': len(positions)}])
 
     def process_user(self, nickname):
         userid = None
@@ -1,7 +1,5 @@
 from collections import defaultdict
 
-from sqlalchemy.orm import load_only
-
 from ichnaea.data.base import DataTask
 from ichnaea.models.content import (
     Score,
@@ -9,6 +7,28 @@ from ichnaea.models.content import (
 from ichnaea import util
 
 
+def score_upsert(score_values):
+    """
+    Return an insert statement and a list of parameter rows, which add
+    the values of the score_values dictionary to the scores with the
+    given keys.
+
+    Executing the statement with all rows at once results in a single
+    multi-row insert.
+    """
+    rows = []
+    for key, value in score_values.items():
+        row = dict([(field, getattr(key, field)) for field in key._fields])
+        row['value'] = int(value)
+        rows.append(row)
+
+    # insert rows in a stable order, to avoid lock order deadlocks
+    rows.sort(key=lambda row: (row['userid'], row['key'], row['time']))
+    stmt = Score.__table__.insert(
+        mysql_on_duplicate='value = value + VALUES(value)')
+    return (stmt, rows)
+
+
 class ScoreUpdater(DataTask):
 
     def __init__(self, task, session, pipe):
@@ -25,24 +45,9 @@ class ScoreUpdater(DataTask):
                 key.time = self.today
             score_values[key] += score['value']
 
-        score_iter = Score.iterkeys(
-            self.session, list(score_values.keys()),
-            extra=lambda query: query.options(load_only('value', )))
-
-        scores = {}
-        for score in score_iter:
-            scores[score.hashkey()] = score
-
-        for key, value in score_values.items():
-            score = scores.get(key, None)
-            value = int(value)
-            if score is not None:
-                score.value += value
-            else:
-                stmt = Score.__table__.insert(
-                    mysql_on_duplicate='value = value + %s' % value
-                ).values(value=value, **key.__dict__)
-                self.session.execute(stmt)
+        if score_values:
+            stmt, rows = score_upsert(score_values)
+            self.session.execute(stmt, rows)
 
         if self.queue.enough_data(batch=batch):
             self.task.apply_async(
@@ -50,4 +55,4 @@ class ScoreUpdater(DataTask):
                 countdown=2,
                 expires=10)
 
-        return len(scores)
+        return len(score_values)
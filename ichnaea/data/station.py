@@ -8,10 +8,13 @@ from ichnaea.geocalc import (
     circle_radius,
     distance,
 )
-from ichnaea.geocode import GEOCODER
+from ichnaea.geocode import REGION_CACHE
 from ichnaea.models import (
+    CellChangeLog,
     decode_cellid,
     encode_cellarea,
+    Score,
+    ScoreKey,
     StatCounter,
     StatKey,
 )
@@ -26,6 +29,7 @@ class StationUpdater(DataTask):
 
     MAX_OLD_OBSERVATIONS = 1000
     max_dist_meters = None
+    score_key = None
     station_type = None
     stat_obs_key = None
     stat_station_key = None
@@ -35,6 +39,8 @@ class StationUpdater(DataTask):
         self.pipe = pipe
         self.shard_id = shard_id
         self.updated_areas = set()
+        self.updated_stations = set()
+        self.new_station_scores = defaultdict(int)
         self.utcnow = util.utcnow()
         self.today = self.utcnow.date()
         self.data_queues = self.task.app.data_queues
@@ -56,6 +62,28 @@ class StationUpdater(DataTask):
     def queue_area_updates(self):  # pragma: no cover
         pass
 
+    def add_station_update(self, key):  # pragma: no cover
+        pass
+
+    def log_station_updates(self):  # pragma: no cover
+        pass
+
+    def add_new_station_score(self, observations):
+        # Credit each user who submitted observations for the station.
+        for userid in set([obs.userid for obs in observations]):
+            if userid is not None:
+                self.new_station_scores[userid] += 1
+
+    def queue_scores(self):
+        scores = []
+        for userid, value in self.new_station_scores.items():
+            key = Score.to_hashkey(
+                userid=userid,
+                key=self.score_key,
+                time=None)
+            scores.append({'hashkey': key, 'value': value})
+        self.data_queues['update_score'].enqueue(scores, pipe=self.pipe)
+
     def emit_stats(self, stats_counter, drop_counter):
         day = self.today
         StatCounter(self.stat_obs_key, day).incr(
@@ -148,7 +176,7 @@ class StationUpdater(DataTask):
                 'max_lon': float(obs_max_lon),
                 'min_lon': float(obs_min_lon),
                 'radius': radius,
-                'region': GEOCODER.region(obs_new_lat, obs_new_lon),
+                'region': REGION_CACHE.region(obs_new_lat, obs_new_lon),
                 'samples': obs_length,
                 'source': None,
             })
@@ -208,12 +236,12 @@ class StationUpdater(DataTask):
                 radius = circle_radius(
                     new_lat, new_lon, max_lat, max_lon, min_lat, min_lon)
                 region = shard_station.region
-                if (region and not GEOCODER.in_region(
+                if (region and not REGION_CACHE.in_region(
                         new_lat, new_lon, region)):
                     # reset region if it no longer matches
                     region = None
                 if not region:
-                    region = GEOCODER.region(new_lat, new_lon)
+                    region = REGION_CACHE.region(new_lat, new_lon)
                 values.update({
                     'lat': new_lat,
                     'lon': new_lon,
@@ -275,6 +303,7 @@ class StationUpdater(DataTask):
             if shard_station is None:
                 # We discovered an actual new never before seen station.
                 stats_counter['new_station'] += 1
+                self.add_new_station_score(observations)
 
             status, result = self.station_values(
                 station_key, shard_station, observations)
@@ -287,6 +316,7 @@ class StationUpdater(DataTask):
 
             # track potential updates to dependent areas
             self.add_area_update(station_key)
+            self.add_station_update(station_key)
 
         if new_data['new']:
             # do a batch insert of new stations
@@ -323,6 +353,12 @@ class StationUpdater(DataTask):
         if self.updated_areas:
             self.queue_area_updates()
 
+        if self.updated_stations:
+            self.log_station_updates()
+
+        if self.new_station_scores:
+            self.queue_scores()
+
         self.emit_stats(stats_counter, drop_counter)
 
         if self.data_queue.enough_data(batch=batch):  # pragma: no cover
@@ -336,6 +372,7 @@ class CellUpdater(StationUpdater):
 
     max_dist_meters = CELL_MAX_RADIUS
     queue_prefix = 'update_cell_'
+    score_key = ScoreKey.new_cell
     station_type = 'cell'
     stat_obs_key = StatKey.cell
     stat_station_key = StatKey.unique_cell
@@ -348,6 +385,12 @@ class CellUpdater(StationUpdater):
         data_queue.enqueue(list(self.updated_areas),
                            pipe=self.pipe, json=False)
 
+    def add_station_update(self, key):
+        self.updated_stations.add(key)
+
+    def log_station_updates(self):
+        CellChangeLog(self.utcnow).add(self.pipe, list(self.updated_stations))
+
     def _base_station_values(self, station_key, observations):
         radio, mcc, mnc, lac, cid = decode_cellid(station_key)
         if observations:
@@ -372,6 +415,7 @@ class WifiUpdater(StationUpdater):
 
     max_dist_meters = WIFI_MAX_RADIUS
     queue_prefix = 'update_wifi_'
+    score_key = ScoreKey.new_wifi
     station_type = 'wifi'
     stat_obs_key = StatKey.wifi
     stat_station_key = StatKey.unique_wifi
@@ -10,7 +10,10 @@ from ichnaea.async.task import BaseTask
 from ichnaea.data import area
 from ichnaea.data.datamap import DataMapUpdater
 from ichnaea.data import export
-from ichnaea.data.internal import InternalUploader
+from ichnaea.data.internal import (
+    InternalExporter,
+    InternalUploader,
+)
 from ichnaea.data import monitor
 from ichnaea.data import ocid
 from ichnaea.data.report import ReportQueue
@@ -64,7 +67,12 @@ def schedule_export_reports(self):
 
 @celery_app.task(base=BaseTask, bind=True, queue='celery_export')
 def export_reports(self, export_queue_name, queue_key=None):
-    export.ReportExporter(
+    exporters = {
+        'internal': InternalExporter,
+    }
+    export_queue = self.app.export_queues[export_queue_name]
+    exporter_type = exporters.get(export_queue.scheme, export.ReportExporter)
+    exporter_type(
         self, None, export_queue_name, queue_key
     )(export_reports, upload_reports)
 
@@ -96,7 +104,8 @@ def queue_reports(self, reports=(),
 
 
 @celery_app.task(base=BaseTask, bind=True, queue='celery_upload')
-def upload_reports(self, export_queue_name, data, queue_key=None):
+def upload_reports(self, export_queue_name, data,
+                   queue_key=None, upload_keys=None):
     uploaders = {
         'http': export.GeosubmitUploader,
         'https': export.GeosubmitUploader,
@@ -107,7 +116,11 @@ def upload_reports(self, export_queue_name, data, queue_key=None):
     uploader_type = uploaders.get(export_queue.scheme, None)
 
     if uploader_type is not None:
-        uploader_type(self, None, export_queue_name, queue_key)(data)
+        uploader_type(self, None, export_queue_name, queue_key)(
+            data, upload_keys=upload_keys)
+    elif upload_keys:  # pragma: no cover
+        for upload_key in upload_keys:
+            export_queue.delete_upload(upload_key)
 
 
 @celery_app.task(base=BaseTask, bind=True, queue='celery_cell')
@@ -1,18 +1,21 @@
-from contextlib import contextmanager
 import json
 import time
 
-import boto
 import mock
+import requests
 import requests_mock
 
 from ichnaea.async.config import configure_export
 from ichnaea.config import DummyConfig
+from ichnaea.data.export import GeosubmitUploader
 from ichnaea.data.tasks import (
     schedule_export_reports,
     queue_reports,
 )
+from ichnaea.queue import ExportQueue
 from ichnaea.tests.base import CeleryTestCase
+from ichnaea.tests.fakehttp import stub_http_server
+from ichnaea.tests.fakes3 import mock_s3
 from ichnaea.tests.factories import (
     ApiKeyFactory,
     CellShardFactory,
@@ -21,21 +24,6 @@ from ichnaea.tests.factories import (
 from ichnaea import util
 
 
-@contextmanager
-def mock_s3(mock_keys):
-    mock_conn = mock.MagicMock()
-
-    def new_mock(*args, **kw):
-        mock_key = mock.MagicMock()
-        mock_key(*args, **kw)
-        mock_keys.append(mock_key)
-        return mock_key
-
-    with mock.patch.object(boto, 'connect_s3', mock_conn):
-        with mock.patch('boto.s3.key.Key', new_mock) as mock_key:
-            yield mock_key
-
-
 class BaseExportTest(CeleryTestCase):
 
     def add_reports(self, num=1, blue_factor=0, cell_factor=1, wifi_factor=2,
@@ -171,15 +159,28 @@ class TestExporter(BaseExportTest):
         schedule_export_reports.delay().get()
         self.assertEqual(self.queue_length(self.test_queue_key), 1)
 
+    def test_expired_queue(self):
+        self.add_reports(2)
+        export_queue = self.celery_app.export_queues['test']
+        self.redis_client.expire(
+            self.test_queue_key,
+            export_queue.queue_ttl - export_queue.queue_max_age - 1)
+        schedule_export_reports.delay().get()
+        self.assertEqual(self.queue_length(self.test_queue_key), 0)
+
 
 class TestGeosubmitUploader(BaseExportTest):
 
     def setUp(self):
         super(TestGeosubmitUploader, self).setUp()
+        self._configure('http://127.0.0.1:9')
+
+    def _configure(self, url, concurrency=1):
         config = DummyConfig({
             'export:test': {
-                'url': 'http://127.0.0.1:9/v2/geosubmit?key=external',
+                'url': url + '/v2/geosubmit?key=external',
                 'batch': '3',
+                'concurrency': str(concurrency),
             },
         })
         self.celery_app.export_queues = configure_export(
@@ -225,6 +226,73 @@ class TestGeosubmitUploader(BaseExportTest):
         ], timer=[
             ('data.export.upload', ['key:test']),
         ])
+        self.assertEqual(self.redis_client.keys('export_upload_*'), [])
+
+    def test_upload_batch_bytes(self):
+        self.celery_app.export_queues['test'].batch_bytes = 1
+        self.add_reports(3)
+
+        with requests_mock.Mocker() as mock:
+            mock.register_uri('POST', requests_mock.ANY, text='{}')
+            schedule_export_reports.delay().get()
+
+        self.assertEqual(mock.call_count, 3)
+        for req in mock.request_history:
+            body = util.decode_gzip(req.body)
+            self.assertEqual(len(json.loads(body)['items']), 1)
+
+        self.assertEqual(self.redis_client.keys('export_upload_*'), [])
+        self.check_stats(counter=[
+            ('data.export.batch', 3, 1, ['key:test']),
+        ])
+
+    def test_upload_concurrent(self):
+        with stub_http_server() as server:
+            self._configure(server.url, concurrency=2)
+            self.add_reports(12)
+            schedule_export_reports.delay().get()
+
+        self.assertEqual(len(server.requests), 4)
+        for req in server.requests:
+            self.assertEqual(req['path'], '/v2/geosubmit?key=external')
+            self.assertEqual(req['headers']['Content-Encoding'], 'gzip')
+            body = util.decode_gzip(req['body'])
+            self.assertEqual(len(json.loads(body)['items']), 3)
+
+        self.assertEqual(self.redis_client.keys('export_upload_*'), [])
+        self.check_stats(counter=[
+            ('data.export.batch', 4, 1, ['key:test']),
+            ('data.export.upload', 4, ['key:test', 'status:200']),
+        ])
+
+    def test_upload_retry(self):
+        with stub_http_server() as server:
+            server.statuses = [503]
+            self._configure(server.url)
+            self.add_reports(3)
+            with mock.patch.object(GeosubmitUploader, 'retry_backoff', 0.0):
+                schedule_export_reports.delay().get()
+
+        self.assertEqual(len(server.requests), 2)
+        self.assertEqual(server.requests[0]['body'],
+                         server.requests[1]['body'])
+        self.check_stats(counter=[
+            ('data.export.batch', 1, 1, ['key:test']),
+            ('data.export.upload', 1, ['key:test', 'status:503']),
+            ('data.export.upload', 1, ['key:test', 'status:200']),
+        ])
+
+    def test_upload_retry_once(self):
+        with stub_http_server() as server:
+            server.statuses = [503, 503, 503]
+            self._configure(server.url)
+            self.add_reports(3)
+            with mock.patch.object(GeosubmitUploader, 'retry_backoff', 0.0):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    schedule_export_reports.delay().get()
+
+        # the further retries are left to the task
+        self.assertEqual(len(server.requests), 2)
 
 
 class TestS3Uploader(BaseExportTest):
@@ -244,6 +312,49 @@ class TestS3Uploader(BaseExportTest):
         export_queue = self.celery_app.export_queues['backup']
         self.assertFalse(export_queue.monitor_name)
 
+    def test_queue_index(self):
+        export_queue = self.celery_app.export_queues['backup']
+        self.add_reports(3)
+        self.add_reports(1, api_key=None)
+        self.add_reports(1, api_key='e5444-794')
+
+        index = self.redis_client.zrange(export_queue.index_key, 0, -1)
+        self.assertEqual(set(index), set([
+            export_queue.queue_key(key).encode('ascii')
+            for key in ('test', 'no_key', 'e5444-794')]))
+
+        # mark one of the small queues as not having seen data in a while
+        old_key = export_queue.queue_key('e5444-794')
+        self.redis_client.zadd(
+            export_queue.index_key,
+            time.time() - export_queue.queue_max_age - 1, old_key)
+        ready = export_queue.ready_queue_keys()
+        self.assertEqual(set(ready), set([
+            export_queue.queue_key('test').encode('ascii'),
+            old_key.encode('ascii')]))
+
+    def test_queue_index_backfill(self):
+        backup_queue = self.celery_app.export_queues['backup']
+        export_queue = ExportQueue(
+            backup_queue.name, self.redis_client, backup_queue.settings)
+
+        # queues filled by older versions, without an index entry
+        new_key = export_queue.queue_key('new')
+        old_key = export_queue.queue_key('old')
+        with self.redis_client.pipeline() as pipe:
+            pipe.rpush(new_key, b'{}')
+            pipe.expire(new_key, export_queue.queue_ttl)
+            pipe.rpush(old_key, b'{}')
+            pipe.expire(old_key, export_queue.queue_ttl -
+                        export_queue.queue_max_age - 10)
+            pipe.execute()
+
+        self.assertEqual(export_queue.ready_queue_keys(),
+                         [old_key.encode('ascii')])
+        index = self.redis_client.zrange(export_queue.index_key, 0, -1)
+        self.assertEqual(set(index), set([
+            new_key.encode('ascii'), old_key.encode('ascii')]))
+
     def test_upload(self):
         ApiKeyFactory(valid_key='e5444-794', log_submit=True)
         self.session.flush()
@@ -252,33 +363,31 @@ class TestS3Uploader(BaseExportTest):
         self.add_reports(6, api_key='e5444-794')
         self.add_reports(3, api_key=None)
 
-        mock_keys = []
-        with mock_s3(mock_keys):
+        with mock_s3() as conn:
             schedule_export_reports.delay().get()
 
-        self.assertEqual(len(mock_keys), 4)
+        s3_keys = conn.get_bucket('bucket').list()
+        self.assertEqual(len(s3_keys), 4)
 
         keys = []
         test_export = None
-        for mock_key in mock_keys:
-            self.assertTrue(mock_key.set_contents_from_string.called)
-            self.assertEqual(mock_key.content_encoding, 'gzip')
-            self.assertEqual(mock_key.content_type, 'application/json')
-            self.assertTrue(mock_key.key.startswith('backups/'))
-            self.assertTrue(mock_key.key.endswith('.json.gz'))
-            self.assertTrue(mock_key.close.called)
-            keys.append(mock_key.key)
-            if 'test' in mock_key.key:
-                test_export = mock_key
+        for s3_key in s3_keys:
+            self.assertEqual(s3_key.headers, {
+                'Content-Encoding': 'gzip',
+                'Content-Type': 'application/json',
+            })
+            self.assertTrue(s3_key.key.startswith('backups/'))
+            self.assertTrue(s3_key.key.endswith('.json.gz'))
+            keys.append(s3_key.key)
+            if 'test' in s3_key.key:
+                test_export = s3_key
 
         # extract second path segment from key names
         queue_keys = [key.split('/')[1] for key in keys]
         self.assertEqual(set(queue_keys), set(['test', 'no_key', 'e5444-794']))
 
         # check uploaded content
-        args, kw = test_export.set_contents_from_string.call_args
-        uploaded_data = args[0]
-        uploaded_text = util.decode_gzip(uploaded_data)
+        uploaded_text = util.decode_gzip(test_export.data)
 
         send_reports = json.loads(uploaded_text)['items']
         self.assertEqual(len(send_reports), 3)
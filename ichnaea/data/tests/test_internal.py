@@ -1,10 +1,15 @@
+import mock
+
 from ichnaea.async.config import configure_export
 from ichnaea.config import DummyConfig
 from ichnaea.data.tasks import (
+    insert_reports,
     update_cell,
     update_wifi,
     schedule_export_reports,
+    upload_reports,
 )
+from ichnaea.data.internal import InternalTransform
 from ichnaea.data.tests.test_export import BaseExportTest
 from ichnaea.models import (
     CellShard,
@@ -12,9 +17,46 @@ from ichnaea.models import (
     User,
     WifiShard,
 )
+from ichnaea.models.content import encode_datamap_grid
+from ichnaea.tests.base import TestCase
 from ichnaea.tests.factories import ApiKeyFactory
 
 
+class TestTransform(TestCase):
+
+    def test_transform(self):
+        transform = InternalTransform()
+        report = transform({
+            'timestamp': 1460000000000.0,
+            'position': {
+                'latitude': 51.5,
+                'longitude': -0.1,
+                'accuracy': None,
+                'unknown': 1,
+            },
+            'cellTowers': [{
+                'radioType': 'lte',
+                'mobileCountryCode': 234,
+                'cellId': 1234,
+            }, {}],
+            'wifiAccessPoints': [{
+                'macAddress': '01005e901000',
+                'signalStrength': -80,
+            }, {'unknown': 1}],
+        })
+        self.assertEqual(report, {
+            'timestamp': 1460000000000.0,
+            'lat': 51.5,
+            'lon': -0.1,
+            'cell': [{'radio': 'lte', 'mcc': 234, 'cid': 1234}],
+            'wifi': [{'key': '01005e901000', 'signal': -80}],
+        })
+
+    def test_empty(self):
+        transform = InternalTransform()
+        self.assertEqual(transform({'position': {'latitude': 51.5}}), {})
+
+
 class TestUploader(BaseExportTest):
 
     nickname = b'World Tr\xc3\xa4veler'.decode('utf-8')
@@ -70,6 +112,39 @@ class TestUploader(BaseExportTest):
                                   for msg in insert_msgs]),
                              total)
 
+    def test_direct_ingest(self):
+        self.add_reports(3)
+        with mock.patch.object(upload_reports, 'delay') as upload_mock:
+            with mock.patch.object(insert_reports,
+                                   'apply_async') as insert_mock:
+                schedule_export_reports.delay().get()
+
+        self.assertFalse(upload_mock.called)
+        self.assertFalse(insert_mock.called)
+        export_queue = self.celery_app.export_queues['internal']
+        self.assertEqual(export_queue.size(export_queue.queue_key()), 0)
+        cell_queues = [queue for name, queue in
+                       self.celery_app.data_queues.items()
+                       if name.startswith('update_cell_')]
+        self.assertEqual(sum([queue.size() for queue in cell_queues]), 3)
+
+    def test_ingest_failure(self):
+        self.add_reports(3)
+        export_queue = self.celery_app.export_queues['internal']
+        with mock.patch('ichnaea.data.internal.ReportQueue',
+                        side_effect=ValueError()):
+            with self.assertRaises(ValueError):
+                schedule_export_reports.delay().get()
+
+        # the reports are back in the export queue
+        self.assertEqual(export_queue.size(export_queue.queue_key()), 3)
+        schedule_export_reports.delay().get()
+        self.assertEqual(export_queue.size(export_queue.queue_key()), 0)
+        cell_queues = [queue for name, queue in
+                       self.celery_app.data_queues.items()
+                       if name.startswith('update_cell_')]
+        self.assertEqual(sum([queue.size() for queue in cell_queues]), 3)
+
     def test_cell(self):
         reports = self.add_reports(cell_factor=1, wifi_factor=0)
         self._update_all()
@@ -204,9 +279,37 @@ class TestUploader(BaseExportTest):
         self.assertEqual(
             self.celery_app.data_queues['update_datamap_sw'].size(), 1)
 
+    def test_datamap_day_log(self):
+        queue = self.celery_app.data_queues['update_datamap_ne']
+        self.add_reports(2, cell_factor=0, wifi_factor=2, lat=50.0, lon=10.0)
+        schedule_export_reports.delay().get()
+        self.assertEqual(queue.size(), 1)
+        queue.dequeue()
+
+        # only the grid not seen today gets queued again
+        self.add_reports(1, cell_factor=0, wifi_factor=2, lat=50.0, lon=10.0)
+        self.add_reports(1, cell_factor=0, wifi_factor=2, lat=51.0, lon=10.0)
+        schedule_export_reports.delay().get()
+        self.assertEqual(queue.dequeue(json=False),
+                         [encode_datamap_grid(51000, 10000)])
+
+    def test_datamap_day_log_failure(self):
+        queue = self.celery_app.data_queues['update_datamap_ne']
+        self.add_reports(1, cell_factor=0, wifi_factor=2, lat=50.0, lon=10.0)
+        with mock.patch('ichnaea.data.report.ReportQueue.process_score',
+                        side_effect=ValueError()):
+            with self.assertRaises(ValueError):
+                schedule_export_reports.delay().get()
+        self.assertEqual(queue.size(), 0)
+
+        # the grid wasn't marked as queued, so the retry queues it
+        schedule_export_reports.delay().get()
+        self.assertEqual(queue.dequeue(json=False),
+                         [encode_datamap_grid(50000, 10000)])
+
     def test_nickname(self):
         self.add_reports(wifi_factor=0, nickname=self.nickname)
-        schedule_export_reports.delay().get()
+        self._update_all()
 
         queue = self.celery_app.data_queues['update_score']
         self.assertEqual(queue.size(), 2)
@@ -1,18 +1,21 @@
+import calendar
 import csv
 import os
 import re
 from contextlib import contextmanager
-from datetime import datetime
+from datetime import datetime, timedelta
 
-import boto
-from mock import MagicMock, patch
 from pytz import UTC
 import requests_mock
 import six
 
 from ichnaea.cache import redis_pipeline
 from ichnaea.data.ocid import (
+    chunk_ranges,
+    import_chunk_rows,
+    ImportBase,
     ImportLocal,
+    read_chunk,
     write_stations_to_csv,
 )
 from ichnaea.data.tasks import (
@@ -26,8 +29,10 @@ from ichnaea.data.tasks import (
 from ichnaea.models import (
     CellArea,
     CellAreaOCID,
+    CellChangeLog,
     CellOCID,
     CellShard,
+    encode_cellid,
     Radio,
     Stat,
     StatKey,
@@ -35,8 +40,13 @@ from ichnaea.models import (
 from ichnaea.tests.base import (
     CeleryTestCase,
     CeleryAppTestCase,
+    GB_LAT,
+    GB_LON,
+    SQLURI,
+    TestCase,
 )
 from ichnaea.tests.factories import CellShardFactory
+from ichnaea.tests.fakes3 import mock_s3
 from ichnaea import util
 
 CELL_FIELDS = [
@@ -45,15 +55,6 @@ CELL_FIELDS = [
     'created', 'updated', 'averageSignal']
 
 
-@contextmanager
-def mock_s3():
-    mock_conn = MagicMock()
-    mock_key = MagicMock()
-    with patch.object(boto, 'connect_s3', mock_conn):
-        with patch('boto.s3.key.Key', lambda _: mock_key):
-            yield mock_key
-
-
 class FakeTask(object):
 
     def __init__(self, app):
@@ -109,33 +110,100 @@ class TestExport(CeleryTestCase):
 
                     self.assertEqual(cells, exported_cells)
 
+    def test_paginated_export(self):
+        cellids = set()
+        for radio in (Radio.gsm, Radio.wcdma, Radio.lte):
+            for cell in CellShardFactory.create_batch(5, radio=radio):
+                cellids.add((cell.radio.name, cell.cid))
+        self.session.commit()
+
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'export.csv.gz')
+            write_stations_to_csv(
+                self.session, path, compresslevel=1, page_size=2, batch=1)
+
+            with util.gzip_open(path, 'r') as gzip_wrapper:
+                with gzip_wrapper as gzip_file:
+                    reader = csv.DictReader(gzip_file, CELL_FIELDS)
+                    six.next(reader)
+                    exported = [(row['radio'], int(row['cell']))
+                                for row in reader]
+
+        radios = {'GSM': 'gsm', 'UMTS': 'wcdma', 'LTE': 'lte'}
+        exported = [(radios[radio], cid) for radio, cid in exported]
+        self.assertEqual(len(exported), 15)
+        self.assertEqual(set(exported), cellids)
+
+    def test_export_changes(self):
+        cells = CellShardFactory.create_batch(6, radio=Radio.gsm)
+        cells.extend(CellShardFactory.create_batch(2, radio=Radio.lte))
+        self.session.commit()
+        changed = cells[1:3] + cells[-1:]
+
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'export.csv.gz')
+            write_stations_to_csv(
+                self.session, path, batch=2,
+                cellids=[encode_cellid(*cell.cellid) for cell in changed])
+
+            with util.gzip_open(path, 'r') as gzip_wrapper:
+                with gzip_wrapper as gzip_file:
+                    reader = csv.DictReader(gzip_file, CELL_FIELDS)
+                    six.next(reader)
+                    exported = set([int(row['cell']) for row in reader])
+
+        self.assertEqual(exported, set([cell.cid for cell in changed]))
+
     def test_export_diff(self):
-        CellShardFactory.create_batch(10, radio=Radio.gsm)
+        last_hour = util.utcnow().replace(
+            minute=0, second=0, microsecond=0) - timedelta(hours=1)
+        cells = CellShardFactory.create_batch(
+            10, radio=Radio.gsm, modified=last_hour + timedelta(minutes=5))
         self.session.commit()
+        changed = cells[2:5]
+        with redis_pipeline(self.redis_client) as pipe:
+            CellChangeLog(last_hour).add(
+                pipe, [encode_cellid(*cell.cellid) for cell in changed])
 
-        with mock_s3() as mock_key:
+        with mock_s3() as conn:
             cell_export_diff(_bucket='localhost.bucket')
-            pat = r'MLS-diff-cell-export-\d+-\d+-\d+T\d+0000\.csv\.gz'
-            self.assertRegex(mock_key.key, pat)
-            method = mock_key.set_contents_from_filename
-            self.assertRegex(method.call_args[0][0], pat)
+
+        s3_keys = conn.get_bucket('localhost.bucket').list()
+        self.assertEqual(len(s3_keys), 1)
+        pat = r'export/MLS-diff-cell-export-\d+-\d+-\d+T\d+0000\.csv\.gz'
+        self.assertRegex(s3_keys[0].key, pat)
+        self.assertEqual(s3_keys[0].headers, {'Content-Type': 'text/csv'})
+        self.assertTrue(s3_keys[0].reduced_redundancy)
+
+        # only the logged cells are exported
+        lines = util.decode_gzip(s3_keys[0].data).splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(
+            set([int(line.split(',')[4]) for line in lines[1:]]),
+            set([cell.cid for cell in changed]))
 
     def test_export_full(self):
         CellShardFactory.create_batch(10, radio=Radio.gsm)
         self.session.commit()
 
-        with mock_s3() as mock_key:
+        with mock_s3() as conn:
             cell_export_full(_bucket='localhost.bucket')
-            pat = r'MLS-full-cell-export-\d+-\d+-\d+T000000\.csv\.gz'
-            self.assertRegex(mock_key.key, pat)
-            method = mock_key.set_contents_from_filename
-            self.assertRegex(method.call_args[0][0], pat)
 
+        s3_keys = conn.get_bucket('localhost.bucket').list()
+        self.assertEqual(len(s3_keys), 1)
+        pat = r'export/MLS-full-cell-export-\d+-\d+-\d+T000000\.csv\.gz'
+        self.assertRegex(s3_keys[0].key, pat)
+
+        # the streamed export file contains all cells
+        lines = util.decode_gzip(s3_keys[0].data).splitlines()
+        self.assertTrue(lines[0].startswith('radio,mcc,net,area,cell'))
+        self.assertEqual(len(lines), 11)
 
-class TestImport(CeleryAppTestCase):
+
+class ImportTest(CeleryAppTestCase):
 
     def setUp(self):
-        super(TestImport, self).setUp()
+        super(ImportTest, self).setUp()
         self.cell = CellShardFactory.build(radio=Radio.wcdma)
         self.today = util.utcnow().date()
 
@@ -178,17 +246,23 @@ class TestImport(CeleryAppTestCase):
                     gzip_file.write(txt)
             yield path
 
-    def import_csv(self, lo=1, hi=10, time=1408604686, cell_type='ocid'):
+    def import_csv(self, lo=1, hi=10, time=1408604686, cell_type='ocid',
+                   bulk=False, processes=1):
         task = FakeTask(self.celery_app)
         with self.get_csv(lo=lo, hi=hi, time=time) as path:
             with redis_pipeline(self.redis_client) as pipe:
                 ImportLocal(task, self.session, pipe,
-                            cell_type=cell_type)(filename=path)
+                            cell_type=cell_type)(
+                    filename=path, bulk=bulk,
+                    processes=processes, db_url=SQLURI)
         if cell_type == 'ocid':
             update_cellarea_ocid.delay().get()
         else:
             update_cellarea.delay().get()
 
+
+class TestImport(ImportTest):
+
     def test_import_local_cell(self):
         self.import_csv(cell_type='cell')
         cells = self.session.query(CellShard.shards()['wcdma']).all()
@@ -201,6 +275,15 @@ class TestImport(CeleryAppTestCase):
         update_statcounter.delay(ago=0).get()
         self.check_stat(StatKey.unique_cell, 9)
 
+    def test_import_local_cell_changes(self):
+        now = util.utcnow()
+        self.import_csv(time=calendar.timegm(now.timetuple()),
+                        cell_type='cell')
+        cells = self.session.query(CellShard.shards()['wcdma']).all()
+        self.assertEqual(len(cells), 9)
+        self.assertEqual(CellChangeLog(now).get(self.redis_client),
+                         set([encode_cellid(*cell.cellid) for cell in cells]))
+
     def test_import_local_ocid(self):
         self.import_csv()
         cells = self.session.query(CellOCID).all()
@@ -250,6 +333,58 @@ class TestImport(CeleryAppTestCase):
         update_statcounter.delay(ago=0).get()
         self.check_stat(StatKey.unique_cell_ocid, 12)
 
+    def test_import_chunks(self):
+        with self.get_csv() as path:
+            with util.selfdestruct_tempdir() as temp_dir:
+                csv_path = os.path.join(temp_dir, 'import.csv')
+                with util.gzip_open(path, 'r') as gzip_wrapper:
+                    with gzip_wrapper as gzip_file:
+                        with open(csv_path, 'w') as fd:
+                            fd.write(gzip_file.read())
+
+                inserted_rows = 0
+                areaids = set()
+                for start, end in chunk_ranges(csv_path, 3):
+                    chunk_rows, chunk_areaids, _ = import_chunk_rows(
+                        self.session, 'ocid', csv_path, start, end)
+                    inserted_rows += chunk_rows
+                    areaids.update(chunk_areaids)
+
+        self.assertEqual(inserted_rows, 9)
+        self.assertEqual(areaids, set([
+            (int(Radio.wcdma), self.cell.mcc, self.cell.mnc, self.cell.lac)]))
+        self.assertEqual(self.session.query(CellOCID).count(), 9)
+
+    def delete_cells(self):
+        # the worker processes commit their own transactions
+        with self.db_rw.engine.connect() as conn:
+            trans = conn.begin()
+            conn.execute(CellOCID.__table__.delete())
+            for shard in CellShard.shards().values():
+                conn.execute(shard.__table__.delete())
+            trans.commit()
+
+    def test_import_parallel(self):
+        self.addCleanup(self.delete_cells)
+        now = util.utcnow()
+        self.import_csv(time=calendar.timegm(now.timetuple()),
+                        cell_type='cell', processes=2)
+        cells = self.session.query(CellShard.shards()['wcdma']).all()
+        self.assertEqual(len(cells), 9)
+        self.assertEqual(CellChangeLog(now).get(self.redis_client),
+                         set([encode_cellid(*cell.cellid) for cell in cells]))
+
+        areaids = set([cell.areaid for cell in cells])
+        self.assertEqual(
+            self.session.query(CellArea).count(), len(areaids))
+
+        update_statcounter.delay(ago=0).get()
+        self.check_stat(StatKey.unique_cell, 9)
+
+    def test_import_bulk_processes(self):
+        with self.assertRaises(ValueError):
+            self.import_csv(bulk=True, processes=2)
+
     def test_import_external(self):
         with self.get_csv() as path:
             with open(path, 'rb') as gzip_file:
@@ -265,3 +400,140 @@ class TestImport(CeleryAppTestCase):
         areaids = set([cell.areaid for cell in cells])
         self.assertEqual(
             self.session.query(CellAreaOCID).count(), len(areaids))
+
+
+class TestImportBulk(ImportTest):
+
+    local_infile = True
+
+    def test_import_bulk_cell(self):
+        self.import_csv(cell_type='cell', bulk=True)
+        cells = self.session.query(CellShard.shards()['wcdma']).all()
+        self.assertEqual(len(cells), 9)
+        for cell in cells:
+            self.assertEqual(cell.cellid, (cell.radio, cell.mcc, cell.mnc,
+                                           cell.lac, cell.cid))
+            self.assertEqual(cell.region, 'GB')
+            self.assertEqual(cell.block_count, 0)
+
+        areaids = set([cell.areaid for cell in cells])
+        self.assertEqual(
+            self.session.query(CellArea).count(), len(areaids))
+
+        update_statcounter.delay(ago=0).get()
+        self.check_stat(StatKey.unique_cell, 9)
+
+    def test_import_bulk_delta(self):
+        old_time = 1407000000
+        new_time = 1408000000
+        old_date = datetime.utcfromtimestamp(old_time).replace(tzinfo=UTC)
+        new_date = datetime.utcfromtimestamp(new_time).replace(tzinfo=UTC)
+
+        self.import_csv(time=old_time, bulk=True)
+        self.import_csv(lo=5, hi=13, time=new_time, bulk=True)
+        self.session.commit()
+
+        cells = (self.session.query(CellOCID)
+                             .order_by(CellOCID.modified).all())
+        self.assertEqual(len(cells), 12)
+
+        for i in range(0, 4):
+            self.assertEqual(cells[i].created, old_date)
+            self.assertEqual(cells[i].modified, old_date)
+
+        for i in range(4, 12):
+            self.assertEqual(cells[i].modified, new_date)
+
+        areaids = set([cell.areaid for cell in cells])
+        self.assertEqual(
+            self.session.query(CellAreaOCID).count(), len(areaids))
+
+        update_statcounter.delay(ago=0).get()
+        self.check_stat(StatKey.unique_cell_ocid, 12)
+
+
+class TestChunks(TestCase):
+
+    def test_chunk_ranges(self):
+        lines = ['%s,%s\n' % (i, 'x' * (i % 7)) for i in range(100)]
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'import.csv')
+            with open(path, 'w') as fd:
+                fd.write(''.join(lines))
+
+            for chunks in (1, 3, 7, 500):
+                ranges = chunk_ranges(path, chunks)
+                self.assertEqual(ranges[0][0], 0)
+                self.assertEqual(ranges[-1][1], os.path.getsize(path))
+                result = []
+                for start, end in ranges:
+                    result.extend(list(read_chunk(path, start, end)))
+                self.assertEqual(result, lines)
+
+    def test_empty(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'import.csv')
+            open(path, 'w').close()
+            self.assertEqual(chunk_ranges(path, 4), [])
+
+
+class TestParseBulk(TestCase):
+
+    def make_rows(self):
+        template = ['UMTS', '234', '30', '1', '1', '', str(GB_LON),
+                    str(GB_LAT), '10', '2', '1', '1408604686',
+                    '1408604686', '']
+        changes = [
+            {},
+            {0: 'GSM', 4: '65536'},
+            {0: 'LTE', 5: '12'},
+            {0: 'LTE', 5: '510'},
+            {0: 'CDMA'},
+            {1: ''},
+            {1: '1'},
+            {2: '1000'},
+            {3: '', 5: '12'},
+            {3: '65534'},
+            {4: '268435456'},
+            {5: '600'},
+            {6: '181.0'},
+            {6: '0.0', 7: '0.0'},
+            {7: '86.0'},
+            {8: '', 9: ''},
+            {8: '100001'},
+            {1: '208'},
+        ]
+        rows = []
+        for i, change in enumerate(changes):
+            row = list(template)
+            row[4] = str(int(row[4]) + i)
+            for pos, value in change.items():
+                row[pos] = value
+            rows.append(row)
+        return rows
+
+    def test_parse(self):
+        columns = ImportBase.parse_bulk_rows(self.make_rows())
+        self.assertEqual(list(columns['cid']), [1, 65536, 3, 12, 16])
+        self.assertEqual(list(columns['radio']), [2, 2, 3, 2, 2])
+        self.assertEqual(list(columns['psc']), [-1, -1, 12, -1, -1])
+        self.assertEqual(list(columns['radius']), [10, 10, 10, 10, 0])
+        self.assertEqual(list(columns['region']), ['GB'] * 5)
+
+    def test_matches_validate(self):
+        rows = self.make_rows()
+        columns = ImportBase.parse_bulk_rows(rows)
+        batch = [ImportBase.make_import_dict(ImportBase.import_spec, row)
+                 for row in rows]
+        expected = ImportBase.validate_import_dicts(
+            CellOCID.validate, [data for data in batch if data is not None])
+
+        self.assertEqual(len(columns['radio']), len(expected))
+        for i, data in enumerate(expected):
+            self.assertEqual(columns['radio'][i], int(data['radio']))
+            self.assertEqual(columns['psc'][i],
+                             -1 if data['psc'] is None else data['psc'])
+            for field in ('mcc', 'mnc', 'lac', 'cid', 'lat', 'lon',
+                          'max_lat', 'min_lat', 'max_lon', 'min_lon',
+                          'radius', 'samples', 'region'):
+                self.assertEqual(columns[field][i], data[field])
@@ -1,15 +1,37 @@
 from datetime import timedelta
 
+from ichnaea.data.score import score_upsert
 from ichnaea.data.tasks import update_score
 from ichnaea.models.content import (
     Score,
     ScoreKey,
     User,
 )
-from ichnaea.tests.base import CeleryTestCase
+from ichnaea.tests.base import (
+    CeleryTestCase,
+    TestCase,
+)
 from ichnaea import util
 
 
+class TestScoreUpsert(TestCase):
+
+    def test_rows(self):
+        today = util.utcnow().date()
+        stmt, rows = score_upsert({
+            Score.to_hashkey(userid=2, key=ScoreKey.location, time=today): 3,
+            Score.to_hashkey(userid=1, key=ScoreKey.new_wifi, time=today): 1,
+            Score.to_hashkey(userid=1, key=ScoreKey.location, time=today): 2,
+        })
+        self.assertEqual(rows, [
+            {'userid': 1, 'key': ScoreKey.location, 'time': today, 'value': 2},
+            {'userid': 1, 'key': ScoreKey.new_wifi, 'time': today, 'value': 1},
+            {'userid': 2, 'key': ScoreKey.location, 'time': today, 'value': 3},
+        ])
+        self.assertEqual(stmt.dialect_kwargs['mysql_on_duplicate'],
+                         'value = value + VALUES(value)')
+
+
 class TestScore(CeleryTestCase):
 
     def setUp(self):
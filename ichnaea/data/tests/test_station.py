@@ -10,7 +10,10 @@ from ichnaea.data.tasks import (
     update_wifi,
 )
 from ichnaea.models import (
+    CellChangeLog,
     CellShard,
+    encode_cellid,
+    ScoreKey,
     StatCounter,
     StatKey,
     WifiShard,
@@ -217,6 +220,12 @@ class TestCell(StationTest):
         self.assertAlmostEqual(found.lat, expected_lat, 7)
         self.assertAlmostEqual(found.lon, expected_lon, 7)
 
+        # all updated cells are added to the change log
+        self.assertEqual(
+            CellChangeLog(now).get(self.redis_client),
+            set([encode_cellid(*cell.cellid)
+                 for cell in (cell1, cell2, cell3)]))
+
     def test_max_min_radius_update(self):
         cell = CellShardFactory(radius=150, samples=3)
         cell_lat = cell.lat
@@ -287,6 +296,30 @@ class TestWifi(StationTest):
         self.assertEqual(wifi.block_last, None)
         self.assertEqual(wifi.block_count, None)
 
+    def test_new_score(self):
+        wifi = WifiShardFactory()
+        self.session.flush()
+
+        obs = [
+            WifiObservationFactory.build(key=wifi.mac),
+            WifiObservationFactory.build(key='001122334455'),
+            WifiObservationFactory.build(key='001122334455'),
+            WifiObservationFactory.build(key='001122334466'),
+        ]
+        obs[1].lat += 0.0001
+        for ob, userid in zip(obs, (1, 1, 2, None)):
+            ob.userid = userid
+        self._queue_and_update(obs)
+
+        queue = self.celery_app.data_queues['update_score']
+        scores = dict([
+            ((score['hashkey'].userid, score['hashkey'].key), score['value'])
+            for score in queue.dequeue()])
+        self.assertEqual(scores, {
+            (1, ScoreKey.new_wifi): 1,
+            (2, ScoreKey.new_wifi): 1,
+        })
+
     def test_update(self):
         utcnow = util.utcnow()
         obs = []
@@ -27,15 +27,16 @@ def on_duplicate(insert, compiler, **kw):
 Insert.argument_for('mysql', 'on_duplicate', None)
 
 
-def configure_db(uri, _db=None):
+def configure_db(uri, local_infile=False, _db=None):
     """
     Configure and return a :class:`~ichnaea.db.Database` instance.
 
+    :param local_infile: Allow `LOAD DATA LOCAL INFILE` statements.
     :param _db: Test-only hook to provide a pre-configured db.
     """
     if _db is not None:
         return _db
-    return Database(uri)
+    return Database(uri, local_infile=local_infile)
 
 
 # the request db_ro_session and db_tween_factory are inspired by
@@ -98,9 +99,10 @@ class Database(object):
     """A class representing an active database.
 
     :param uri: A database connection string.
+    :param local_infile: Allow `LOAD DATA LOCAL INFILE` statements.
     """
 
-    def __init__(self, uri):
+    def __init__(self, uri, local_infile=False):
         options = {
             'pool_recycle': 3600,
             'pool_size': 10,
@@ -110,6 +112,8 @@ class Database(object):
             'isolation_level': 'REPEATABLE READ',
         }
         options['connect_args'] = {'charset': 'utf8'}
+        if local_infile:
+            options['connect_args']['local_infile'] = True
         options['execution_options'] = {'autocommit': False}
         self.engine = create_engine(uri, **options)
 
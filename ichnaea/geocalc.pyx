@@ -4,8 +4,8 @@ Contains helper functions for various geo related calculations.
 These are implemented in Cython / C using NumPy.
 """
 
-from libc.math cimport asin, cos, fmax, fmin, M_PI, pow, sin, sqrt
-from numpy cimport double_t, ndarray
+from libc.math cimport asin, cos, fmax, fmin, INFINITY, M_PI, pow, sin, sqrt
+from numpy cimport double_t, int64_t, ndarray
 
 import numpy
 
@@ -229,12 +229,27 @@ cpdef double max_distance(double lat, double lon,
     Returns the maximum distance from the given lat/lon point to any of
     the provided points in the points array.
     """
-    cdef double dist, p_lat, p_lon, result
+    cdef double result
+    cdef Py_ssize_t i
 
     result = 0.0
-    for p_lat, p_lon in points:
-        dist = distance(lat, lon, p_lat, p_lon)
-        result = fmax(result, dist)
+    for i in range(points.shape[0]):
+        result = fmax(result, distance(lat, lon, points[i, 0], points[i, 1]))
+    return result
+
+
+cpdef double min_distance(double lat, double lon,
+                          ndarray[double_t, ndim=2] points):
+    """
+    Returns the minimum distance from the given lat/lon point to any of
+    the provided points in the points array.
+    """
+    cdef double result
+    cdef Py_ssize_t i
+
+    result = INFINITY
+    for i in range(points.shape[0]):
+        result = fmin(result, distance(lat, lon, points[i, 0], points[i, 1]))
     return result
 
 
@@ -270,3 +285,47 @@ cpdef list random_points(long lat, long lon, int num):
             (lon_d + RANDOM_LON[lon_random + i]) / 1000.0))
 
     return result
+
+
+cpdef tuple random_points_array(ndarray[int64_t, ndim=1] lats,
+                                ndarray[int64_t, ndim=1] lons,
+                                ndarray[int64_t, ndim=1] nums):
+    """
+    Array based version of :func:`random_points`, taking arrays of
+    scaled grid latitudes, longitudes and numbers.
+
+    Returns a tuple of two arrays, holding the latitudes and longitudes
+    of all the points of the first grid, followed by those of the
+    second grid and so on. The points are the same as those returned
+    by :func:`random_points`, without the rounding to six decimals.
+    """
+    cdef ndarray[int64_t, ndim=1] counts
+    cdef ndarray[double_t, ndim=1] point_lats, point_lons
+    cdef Py_ssize_t i, j, pos, total
+    cdef long lat, lon, lat_random, lon_random
+    cdef double lat_d, lon_d
+
+    counts = numpy.empty(lats.shape[0], dtype=numpy.int64)
+    total = 0
+    for i in range(lats.shape[0]):
+        counts[i] = min(max(6 - nums[i], 1), 6) * 2
+        total += counts[i]
+
+    point_lats = numpy.empty(total, dtype=numpy.double)
+    point_lons = numpy.empty(total, dtype=numpy.double)
+
+    pos = 0
+    for i in range(lats.shape[0]):
+        lat = lats[i]
+        lon = lons[i]
+        lat_d = float(lat)
+        lon_d = float(lon)
+        lat_random = (lon * (lat * 17) % 1021) % 179
+        lon_random = (lat * (lon * 11) % 1913) % 181
+
+        for j in range(counts[i]):
+            point_lats[pos] = (lat_d + RANDOM_LAT[lat_random + j]) / 1000.0
+            point_lons[pos] = (lon_d + RANDOM_LON[lon_random + j]) / 1000.0
+            pos += 1
+
+    return (point_lats, point_lons)
@@ -4,12 +4,18 @@ codes.
 """
 
 from collections import namedtuple
+import math
+import mmap
 import os
 
 import genc
 import mobile_codes
+import numpy
+from repoze.lru import LRUCache
 from shapely import geometry
 from shapely import prepared
+from shapely import vectorized
+from shapely import wkb
 import simplejson
 from rtree import index
 
@@ -20,6 +26,18 @@ REGIONS_FILE = os.path.join(os.path.abspath(
     os.path.dirname(__file__)), 'regions.geojson.gz')
 REGIONS_BUFFER_FILE = os.path.join(os.path.abspath(
     os.path.dirname(__file__)), 'regions_buffer.geojson.gz')
+REGIONS_RASTER_FILE = os.path.join(os.path.abspath(
+    os.path.dirname(__file__)), 'regions_raster.npy')
+REGIONS_CACHE_FILE = os.path.join(os.path.abspath(
+    os.path.dirname(__file__)), 'regions_cache.bin')
+
+RASTER_AMBIGUOUS = b'..'
+"""
+Raster value of a grid cell touching the border of any region.
+
+Other raster values are either empty for grid cells outside of all
+regions, or the region code of the one region containing the grid cell.
+"""
 
 DATELINE_EAST = geometry.box(180.0, -90.0, 270.0, 90.0)
 DATELINE_WEST = geometry.box(-270.0, -90.0, -180.0, 90.0)
@@ -32,82 +50,270 @@ MCC_TO_GENC_MAP = {
 Region = namedtuple('Region', 'code name radius')
 
 
+def build_cache(regions_file=REGIONS_FILE, buffer_file=REGIONS_BUFFER_FILE):
+    """
+    Parse the region and buffered region GeoJSON files into a
+    two-tuple of a region index and a binary blob of WKB geometries.
+
+    The index maps each region code to a dictionary with its radius,
+    the envelopes of each buffered polygon and the offset and size of
+    the precise and buffered geometries inside the blob.
+    """
+    regions = {}
+    chunks = []
+    offset = 0
+
+    genc_regions = frozenset([rec.alpha2 for rec in genc.REGIONS])
+    for filename, name in ((regions_file, 'shape'),
+                           (buffer_file, 'buffered')):
+        with util.gzip_open(filename, 'r') as fd:
+            data = simplejson.load(fd)
+
+        for feature in sorted(data['features'],
+                              key=lambda f: f['properties']['alpha2']):
+            code = feature['properties']['alpha2']
+            if code not in genc_regions:
+                continue
+
+            shape = geometry.shape(feature['geometry'])
+            value = shape.wkb
+            region = regions.setdefault(code, {})
+            region[name] = (offset, len(value))
+            chunks.append(value)
+            offset += len(value)
+
+            if name == 'shape':
+                region['radius'] = feature['properties']['radius']
+            elif isinstance(shape, geometry.base.BaseMultipartGeometry):
+                # Index bounding box of individual polygons instead of
+                # the multipolygon, to avoid issues with regions crossing
+                # the -180.0/+180.0 longitude boundary.
+                region['envelopes'] = [
+                    geom.envelope.bounds for geom in shape.geoms]
+            else:
+                region['envelopes'] = [shape.envelope.bounds]
+
+    return (regions, b''.join(chunks))
+
+
+def write_cache(filename,
+                regions_file=REGIONS_FILE, buffer_file=REGIONS_BUFFER_FILE):
+    """
+    Write a binary region cache file, consisting of a single line
+    JSON header with the region index, followed by the WKB blob.
+    """
+    regions, blob = build_cache(regions_file, buffer_file)
+    header = simplejson.dumps(regions, sort_keys=True,
+                              separators=(',', ':'))
+    with open(filename, 'wb') as fd:
+        fd.write(header.encode('ascii') + b'\n')
+        fd.write(blob)
+
+
+def read_cache(filename):
+    """
+    Read a binary region cache file and return a two-tuple of the
+    region index and a read-only memory-map of the WKB blob.
+    """
+    with open(filename, 'rb') as fd:
+        header = fd.readline()
+        blob = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+    regions = simplejson.loads(header.decode('ascii'))
+    return (regions, _BlobView(blob, len(header)))
+
+
+class _BlobView(object):
+    """A view on a memory-mapped blob, skipping the leading header."""
+
+    def __init__(self, blob, start):
+        self.blob = blob
+        self.start = start
+
+    def __getitem__(self, key):
+        return self.blob[key.start + self.start:key.stop + self.start]
+
+
+class _LazyRegionDict(dict):
+    """A dictionary calling a loader function for missing keys."""
+
+    def __init__(self, loader):
+        super(_LazyRegionDict, self).__init__()
+        self.loader = loader
+
+    def __missing__(self, code):
+        value = self[code] = self.loader(code)
+        return value
+
+
 class Geocoder(object):
     """
     The Geocoder offers reverse geocoding lat/lon positions
     into region codes.
+
+    Region geometries are only parsed on first use of each region,
+    either from a memory-mapped binary cache file or from the GeoJSON
+    files, if no cache file is available.
     """
 
+    _boundaries = None  #: maps region code to an array of border lat/lons
     _buffered_shapes = None  #: maps region code to a buffered prepared shape
     _prepared_shapes = None  #: maps region code to a precise prepared shape
     _shapes = None  #: maps region code to a precise shape
     _tree = None  #: RTree of buffered region envelopes
+    _envelopes = None  #: Array of the RTree envelopes for batch lookups
     _tree_ids = None  #: maps RTree entry id to region code
     _valid_regions = None  #: Set of known and valid region codes
     _radii = None  #: A cache of region radii
+    _raster = None  #: Memory-mapped array of region codes per grid cell
+    _raster_resolution = None  #: Number of raster grid cells per degree
+    _regions = None  #: maps region code to its region cache index entry
+    _region_metadata = None  #: maps region code to a Region instance
+    _mcc_codes = None  #: maps mcc to a tuple of region codes
+    _mcc_regions = None  #: maps mcc to a tuple of Region instances
+    _wkb = None  #: Blob of WKB encoded region shapes
 
     def __init__(self,
                  regions_file=REGIONS_FILE,
-                 buffer_file=REGIONS_BUFFER_FILE):
-        self._buffered_shapes = {}
-        self._prepared_shapes = {}
-        self._shapes = {}
+                 buffer_file=REGIONS_BUFFER_FILE,
+                 raster_file=REGIONS_RASTER_FILE,
+                 cache_file=REGIONS_CACHE_FILE):
+        self._boundaries = _LazyRegionDict(self._load_boundary)
+        self._buffered_shapes = _LazyRegionDict(self._load_buffered)
+        self._prepared_shapes = _LazyRegionDict(self._load_prepared)
+        self._shapes = _LazyRegionDict(self._load_shape)
         self._tree_ids = {}
         self._radii = {}
 
-        with util.gzip_open(regions_file, 'r') as fd:
-            regions_data = simplejson.load(fd)
-
-        genc_regions = frozenset([rec.alpha2 for rec in genc.REGIONS])
-        for feature in regions_data['features']:
-            code = feature['properties']['alpha2']
-            if code in genc_regions:
-                shape = geometry.shape(feature['geometry'])
-                self._shapes[code] = shape
-                self._prepared_shapes[code] = prepared.prep(shape)
-                self._radii[code] = feature['properties']['radius']
-
-        with util.gzip_open(buffer_file, 'r') as fd:
-            buffer_data = simplejson.load(fd)
+        if cache_file and os.path.isfile(cache_file):
+            self._regions, self._wkb = read_cache(cache_file)
+        else:
+            self._regions, self._wkb = build_cache(regions_file, buffer_file)
 
         i = 0
         envelopes = []
-        for feature in buffer_data['features']:
-            code = feature['properties']['alpha2']
-            if code in genc_regions:
-                shape = geometry.shape(feature['geometry'])
-                self._buffered_shapes[code] = prepared.prep(shape)
-                # Collect rtree index entries, and maintain a separate id to
-                # code mapping. We don't use index object support as it
-                # requires un/pickling the object entries on each lookup.
-                if isinstance(shape, geometry.base.BaseMultipartGeometry):
-                    # Index bounding box of individual polygons instead of
-                    # the multipolygon, to avoid issues with regions crossing
-                    # the -180.0/+180.0 longitude boundary.
-                    for geom in shape.geoms:
-                        envelopes.append((i, geom.envelope.bounds, None))
-                        self._tree_ids[i] = code
-                        i += 1
-                else:
-                    envelopes.append((i, shape.envelope.bounds, None))
-                    self._tree_ids[i] = code
-                    i += 1
+        for code, region in sorted(self._regions.items()):
+            if 'radius' in region:
+                self._radii[code] = region['radius']
+            # Collect rtree index entries, and maintain a separate id to
+            # code mapping. We don't use index object support as it
+            # requires un/pickling the object entries on each lookup.
+            for bounds in region.get('envelopes', ()):
+                envelopes.append((i, tuple(bounds), None))
+                self._tree_ids[i] = code
+                i += 1
 
         props = index.Property()
         props.fill_factor = 0.9
         props.leaf_capacity = 20
         self._tree = index.Index(envelopes, interleaved=True, properties=props)
-        self._valid_regions = frozenset(self._shapes.keys())
+        self._envelopes = numpy.array(
+            [bounds for _, bounds, _ in envelopes],
+            dtype=numpy.double).reshape(-1, 4)
+        self._valid_regions = frozenset(
+            [code for code, region in self._regions.items()
+             if 'shape' in region])
+
+        self._region_metadata = {}
+        for code in self._valid_regions:
+            region = genc.region_by_alpha2(code)
+            if region is not None:
+                self._region_metadata[code] = Region(
+                    code=region.alpha2,
+                    name=region.name,
+                    radius=self.region_max_radius(code))
+
+        # The regions of each mcc are looked up on first use.
+        self._mcc_codes = _LazyRegionDict(self._load_mcc_codes)
+        self._mcc_regions = _LazyRegionDict(self._load_mcc_regions)
+
+        if raster_file and os.path.isfile(raster_file):
+            # The raster is an optional build artifact. Memory-map it,
+            # so its pages are loaded on demand and shared between
+            # forked worker processes.
+            self._raster = numpy.load(raster_file, mmap_mode='r')
+            self._raster_resolution = self._raster.shape[0] // 180
+
+    def _load_wkb(self, code, name):
+        offset, size = self._regions[code][name]
+        return wkb.loads(bytes(self._wkb[offset:offset + size]))
+
+    def _load_boundary(self, code):
+        return self._boundary_array(self._shapes[code])
+
+    def _load_buffered(self, code):
+        return prepared.prep(self._load_wkb(code, 'buffered'))
+
+    def _load_prepared(self, code):
+        return prepared.prep(self._shapes[code])
+
+    def _load_shape(self, code):
+        return self._load_wkb(code, 'shape')
+
+    def _load_mcc_codes(self, mcc):
+        codes = [region.alpha2 for region in mobile_codes.mcc(mcc)]
+        # map mcc region codes to genc region codes
+        codes = [MCC_TO_GENC_MAP.get(code, code) for code in codes]
+        return tuple(sorted(set(codes).intersection(self._valid_regions)))
+
+    def _load_mcc_regions(self, mcc):
+        return tuple([self._region_metadata[code]
+                      for code in self._mcc_codes[mcc]
+                      if code in self._region_metadata])
+
+    @staticmethod
+    def _boundary_array(shape):
+        """
+        Return a two-column array of the lat/lon coordinates of
+        the shape's boundary.
+        """
+        boundary = shape.boundary
+        if isinstance(boundary, geometry.base.BaseMultipartGeometry):
+            geoms = list(boundary.geoms)
+        else:
+            geoms = [boundary]
+        # flip x/y aka lon/lat to lat/lon
+        return numpy.ascontiguousarray(numpy.fliplr(numpy.concatenate(
+            [numpy.array(geom.coords, dtype=numpy.double)[:, :2]
+             for geom in geoms])))
 
     @property
     def valid_regions(self):
         return self._valid_regions
 
+    def _raster_region(self, lat, lon):
+        """
+        Look up the position in the precomputed region raster.
+
+        Return a two-tuple of a boolean indicating if the raster has
+        an unambiguous result for the position, and the region code
+        or None.
+        """
+        if self._raster is None:
+            return (False, None)
+
+        resolution = self._raster_resolution
+        row = int(math.floor((lat + 90.0) * resolution))
+        col = int(math.floor((lon + 180.0) * resolution))
+        if not (0 <= row < self._raster.shape[0] and
+                0 <= col < self._raster.shape[1]):
+            return (False, None)
+
+        value = self._raster[row, col]
+        if value == RASTER_AMBIGUOUS:
+            return (False, None)
+        if not value:
+            return (True, None)
+        return (True, str(value.decode('ascii')))
+
     def region(self, lat, lon):
         """
         Return a region code matching the provided position.
         If the position is not found inside any region return None.
         """
+        safe, code = self._raster_region(lat, lon)
+        if safe:
+            return code
+
         # Look up point in RTree of buffered region envelopes.
         # This is a coarse-grained but very fast match.
         point = geometry.Point(lon, lat)
@@ -131,38 +337,156 @@ class Geocoder(object):
             return precise_codes[0]
 
         # Use distance from the border of each region as the tie-breaker.
-        distances = {}
 
         # point wasn't in any precise region, which one of the buffered
         # regions is it closest to?
         if not precise_codes:
-            for code in buffered_codes:
-                coords = []
-                if isinstance(self._shapes[code].boundary,
-                              geometry.base.BaseMultipartGeometry):
-                    for geom in self._shapes[code].boundary.geoms:
-                        coords.extend([coord for coord in geom.coords])
-                else:
-                    coords = self._shapes[code].boundary.coords
-                for coord in coords:
-                    distances[geocalc.distance(
-                        coord[1], coord[0], lat, lon)] = code
-            return distances[min(distances.keys())]
+            distances = [
+                (geocalc.min_distance(lat, lon, self._boundaries[code]), code)
+                for code in buffered_codes]
+            return min(distances)[1]
 
         # point was in multiple overlapping regions, take the one where it
         # is farthest away from the border / the most inside a region
-        for code in precise_codes:
-            coords = []
-            if isinstance(self._shapes[code].boundary,
-                          geometry.base.BaseMultipartGeometry):
-                for geom in self._shapes[code].boundary.geoms:
-                    coords.extend([coord for coord in geom.coords])
+        distances = [
+            (geocalc.max_distance(lat, lon, self._boundaries[code]), code)
+            for code in precise_codes]
+        return max(distances)[1]
+
+    def _raster_regions(self, lats, lons):
+        """
+        Look up many positions in the precomputed region raster.
+
+        Return a boolean array marking the positions with an unambiguous
+        raster result, and a list of region codes or None.
+        """
+        codes = [None] * len(lats)
+        if self._raster is None:
+            return (numpy.zeros(len(lats), dtype=bool), codes)
+
+        resolution = self._raster_resolution
+        rows = numpy.floor((lats + 90.0) * resolution)
+        cols = numpy.floor((lons + 180.0) * resolution)
+        inside = ((rows >= 0) & (rows < self._raster.shape[0]) &
+                  (cols >= 0) & (cols < self._raster.shape[1]))
+
+        values = numpy.empty(len(lats), dtype=self._raster.dtype)
+        values[:] = RASTER_AMBIGUOUS
+        values[inside] = self._raster[rows[inside].astype(numpy.intp),
+                                      cols[inside].astype(numpy.intp)]
+
+        safe = values != RASTER_AMBIGUOUS
+        for i in numpy.flatnonzero(safe & (values != b'')):
+            codes[i] = str(values[i].decode('ascii'))
+        return (safe, codes)
+
+    def _envelope_candidates(self, lats, lons, rows):
+        """
+        Match the positions at the given row indices against the
+        buffered region envelopes.
+
+        Return a dictionary mapping region codes to arrays of candidate
+        row indices.
+        """
+        candidates = {}
+        if not len(rows):
+            return candidates
+
+        # Sort the positions by longitude, so each envelope only needs
+        # to look at a slice of them.
+        order = rows[numpy.argsort(lons[rows], kind='mergesort')]
+        sorted_lons = lons[order]
+        for i, (min_lon, min_lat, max_lon, max_lat) in enumerate(
+                self._envelopes):
+            start = numpy.searchsorted(sorted_lons, min_lon, side='left')
+            end = numpy.searchsorted(sorted_lons, max_lon, side='right')
+            if start >= end:
+                continue
+            hits = order[start:end]
+            hit_lats = lats[hits]
+            hits = hits[(hit_lats >= min_lat) & (hit_lats <= max_lat)]
+            if len(hits):
+                candidates.setdefault(self._tree_ids[i], []).append(hits)
+
+        return dict([(code, numpy.unique(numpy.concatenate(hits)))
+                     for code, hits in candidates.items()])
+
+    def _buffered_regions(self, lats, lons, candidates):
+        """
+        Match the candidate positions of each region against its
+        buffered region shape.
+
+        Return a dictionary mapping row indices to a sorted list of
+        region codes. Rows outside of all regions are omitted.
+        """
+        matches = {}
+        for code, rows in sorted(candidates.items()):
+            contained = vectorized.contains(
+                self._buffered_shapes[code], lons[rows], lats[rows])
+            for i in rows[contained]:
+                matches.setdefault(int(i), []).append(code)
+        return matches
+
+    def _prepare_many(self, lats, lons):
+        # Shared first steps of all the batch methods.
+        lats = numpy.asarray(lats, dtype=numpy.double)
+        lons = numpy.asarray(lons, dtype=numpy.double)
+        safe, codes = self._raster_regions(lats, lons)
+        return (lats, lons, numpy.flatnonzero(~safe), codes)
+
+    def regions(self, lats, lons):
+        """
+        Return a list of region codes matching the provided sequences
+        of latitudes and longitudes. Positions outside of all regions
+        are returned as None.
+        """
+        lats, lons, unsafe, codes = self._prepare_many(lats, lons)
+        matches = self._buffered_regions(
+            lats, lons, self._envelope_candidates(lats, lons, unsafe))
+        for i, buffered_codes in matches.items():
+            if len(buffered_codes) == 1:
+                codes[i] = buffered_codes[0]
             else:
-                coords = self._shapes[code].boundary.coords
-            for coord in coords:
-                distances[geocalc.distance(
-                    coord[1], coord[0], lat, lon)] = code
-        return distances[max(distances.keys())]
+                codes[i] = self.region(float(lats[i]), float(lons[i]))
+        return codes
+
+    def any_region_many(self, lats, lons):
+        """
+        Return a boolean array indicating which of the provided
+        lat/lon positions are inside any of the regions.
+        """
+        lats, lons, unsafe, codes = self._prepare_many(lats, lons)
+        matches = self._buffered_regions(
+            lats, lons, self._envelope_candidates(lats, lons, unsafe))
+        result = numpy.array([code is not None for code in codes], dtype=bool)
+        result[list(matches.keys())] = True
+        return result
+
+    def region_for_box(self, min_lat, min_lon, max_lat, max_lon):
+        """
+        Classify a lat/lon bounding box.
+
+        Return a two-tuple of a boolean and a region code. The boolean
+        indicates if the box lies unambiguously inside exactly one
+        buffered region, or outside of all of them. In that case every
+        position inside the box maps to the returned region code, or to
+        None. If the box touches the border of any region, return
+        ``(False, None)``.
+        """
+        box = geometry.box(min_lon, min_lat, max_lon, max_lat)
+        codes = set([self._tree_ids[id_] for id_ in
+                     self._tree.intersection(box.bounds)])
+
+        touching = [code for code in codes
+                    if self._buffered_shapes[code].intersects(box)]
+        if not touching:
+            return (True, None)
+
+        if (len(touching) == 1 and
+                self._buffered_shapes[touching[0]].contains(box)):
+            return (True, touching[0])
+
+        return (False, None)
 
     def any_region(self, lat, lon):
         """
@@ -170,6 +494,10 @@ class Geocoder(object):
 
         Returns False if the position is outside of all known regions.
         """
+        safe, code = self._raster_region(lat, lon)
+        if safe:
+            return code is not None
+
         point = geometry.Point(lon, lat)
         codes = [self._tree_ids[id_] for id_ in
                  self._tree.intersection(point.bounds)]
@@ -188,6 +516,10 @@ class Geocoder(object):
         if code not in self._valid_regions:
             return False
 
+        safe, region = self._raster_region(lat, lon)
+        if safe:
+            return region == code
+
         point = geometry.Point(lon, lat)
         if self._buffered_shapes[code].contains(point):
             return True
@@ -198,6 +530,10 @@ class Geocoder(object):
         Is the provided lat/lon position inside one of the regions
         associated with the given mcc.
         """
+        safe, region = self._raster_region(lat, lon)
+        if safe:
+            return region is not None and region in self.regions_for_mcc(mcc)
+
         for code in self.regions_for_mcc(mcc):
             if self.in_region(lat, lon, code):
                 return True
@@ -210,41 +546,25 @@ class Geocoder(object):
         The return list is filtered by the set of recognized
         region codes present in the GENC dataset.
         """
-        if code in self._valid_regions:
-            region = genc.region_by_alpha2(code)
-            return Region(
-                code=region.alpha2,
-                name=region.name,
-                radius=self.region_max_radius(code))
-        return None
+        return self._region_metadata.get(code, None)
 
     def regions_for_mcc(self, mcc, metadata=False):
         """
-        Return a list of region codes matching the passed in
+        Return a tuple of region codes matching the passed in
         mobile country code.
 
-        If the metadata argument is set to True, returns a list of
+        If the metadata argument is set to True, returns a tuple of
         region instances containing additional metadata instead.
 
-        The return list is filtered by the set of recognized
+        The return tuple is filtered by the set of recognized
         region codes present in the GENC dataset.
         """
-        codes = [region.alpha2 for region in mobile_codes.mcc(str(mcc))]
-        # map mcc region codes to genc region codes
-        codes = [MCC_TO_GENC_MAP.get(code, code) for code in codes]
-        valid_codes = set(codes).intersection(self._valid_regions)
-        if not metadata:
-            return list(valid_codes)
-
-        result = []
-        for code in valid_codes:
-            region = genc.region_by_alpha2(code)
-            if region is not None:
-                result.append(Region(
-                    code=region.alpha2,
-                    name=region.name,
-                    radius=self.region_max_radius(code)))
-        return result
+        mcc = str(mcc)
+        if len(mcc) != 3 or not mcc.isdigit():
+            return ()
+        if metadata:
+            return self._mcc_regions[mcc]
+        return self._mcc_codes[mcc]
 
     def region_for_cell(self, lat, lon, mcc):
         """
@@ -264,6 +584,43 @@ class Geocoder(object):
         # fall back to lookup without the mcc/region code hint
         return self.region(lat, lon)
 
+    def region_for_cell_many(self, lats, lons, mccs):
+        """
+        Return a list of region codes matching the provided sequences
+        of latitudes, longitudes and mccs. Positions not found inside
+        any of the regions for their mcc are returned as None.
+        """
+        lats, lons, unsafe, codes = self._prepare_many(lats, lons)
+        result = [None] * len(codes)
+
+        mcc_rows = {}
+        for i, mcc in enumerate(mccs):
+            mcc_rows.setdefault(mcc, []).append(i)
+
+        # Only test the regions associated with each mcc, like
+        # region_for_cell does.
+        candidates = {}
+        for mcc, rows in mcc_rows.items():
+            mcc_codes = self.regions_for_mcc(mcc)
+            for i in rows:
+                if codes[i] in mcc_codes:
+                    result[i] = codes[i]
+            mcc_unsafe = numpy.intersect1d(rows, unsafe)
+            if len(mcc_unsafe):
+                for code in mcc_codes:
+                    candidates.setdefault(code, []).append(mcc_unsafe)
+
+        candidates = dict([(code, numpy.concatenate(rows))
+                           for code, rows in candidates.items()])
+        matches = self._buffered_regions(lats, lons, candidates)
+        for i, hits in matches.items():
+            if len(hits) == 1:
+                result[i] = hits[0]
+            else:
+                # fall back to lookup without the mcc/region code hint
+                result[i] = self.region(float(lats[i]), float(lons[i]))
+        return result
+
     def region_max_radius(self, code):
         """
         Return the maximum radius of a circle encompassing the largest
@@ -272,4 +629,106 @@ class Geocoder(object):
         return self._radii.get(code, None)
 
 
+class RegionCache(object):
+    """
+    A cache for region lookups of positions, which change very little
+    between consecutive lookups, like those of stations.
+
+    Positions are quantized into grid cells. A grid cell is only used
+    if it lies unambiguously inside one buffered region or outside of
+    all regions. Lookups for positions in all other grid cells fall
+    back to the exact geocoder.
+
+    A raster of whole degree interior cells is filled in on first use
+    of each cell, so most lookups never touch any shapes. Smaller grid
+    cells of ``1 / resolution`` degrees are used close to region
+    borders and kept in a LRU cache.
+    """
+
+    UNKNOWN = -2  #: Raster value of a not yet classified cell.
+    AMBIGUOUS = -1  #: Raster value of a cell touching a region border.
+    NO_REGION = 0  #: Raster value of a cell outside of all regions.
+
+    def __init__(self, geocoder, resolution=100, size=100000):
+        self.geocoder = geocoder
+        self.resolution = resolution
+        self._codes = [None] + sorted(geocoder.valid_regions)
+        self._code_values = dict(
+            [(code, i) for i, code in enumerate(self._codes)])
+        self._cells = LRUCache(size)
+        self._interior = numpy.empty((180, 360), dtype=numpy.int16)
+        self._interior.fill(self.UNKNOWN)
+
+    def _classify(self, min_lat, min_lon, max_lat, max_lon):
+        safe, code = self.geocoder.region_for_box(
+            min_lat, min_lon, max_lat, max_lon)
+        if not safe:
+            return self.AMBIGUOUS
+        return self._code_values[code]
+
+    def _lookup(self, lat, lon):
+        """
+        Return a two-tuple of a boolean indicating if the cached result
+        is valid for the position, and the region code or None.
+        """
+        row = int(math.floor(lat)) + 90
+        col = int(math.floor(lon)) + 180
+        if not (0 <= row < 180 and 0 <= col < 360):
+            return (False, None)
+
+        value = self._interior[row, col]
+        if value == self.UNKNOWN:
+            value = self._classify(row - 90, col - 180, row - 89, col - 179)
+            self._interior[row, col] = value
+        if value != self.AMBIGUOUS:
+            return (True, self._codes[value])
+
+        resolution = self.resolution
+        key = (int(math.floor(lat * resolution)),
+               int(math.floor(lon * resolution)))
+        value = self._cells.get(key)
+        if value is None:
+            value = self._classify(
+                float(key[0]) / resolution, float(key[1]) / resolution,
+                float(key[0] + 1) / resolution, float(key[1] + 1) / resolution)
+            self._cells.put(key, value)
+        if value != self.AMBIGUOUS:
+            return (True, self._codes[value])
+
+        return (False, None)
+
+    def region(self, lat, lon):
+        """
+        Return a region code matching the provided position.
+        If the position is not found inside any region return None.
+        """
+        safe, code = self._lookup(lat, lon)
+        if safe:
+            return code
+        return self.geocoder.region(lat, lon)
+
+    def in_region(self, lat, lon, code):
+        """
+        Is the provided lat/lon position inside the region associated
+        with the given region code.
+        """
+        safe, region = self._lookup(lat, lon)
+        if safe:
+            return bool(region is not None and region == code)
+        return self.geocoder.in_region(lat, lon, code)
+
+    def region_for_cell(self, lat, lon, mcc):
+        """
+        Return a region code matching the provided mcc and position.
+        If the position is not found inside any region return None.
+        """
+        safe, region = self._lookup(lat, lon)
+        if safe:
+            if region in self.geocoder.regions_for_mcc(mcc):
+                return region
+            return None
+        return self.geocoder.region_for_cell(lat, lon, mcc)
+
+
 GEOCODER = Geocoder()
+REGION_CACHE = RegionCache(GEOCODER)
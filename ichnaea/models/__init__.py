@@ -9,6 +9,7 @@ from ichnaea.models.api import ApiKey  # NOQA
 from ichnaea.models.cell import (  # NOQA
     CellArea,
     CellAreaOCID,
+    CellChangeLog,
     CellOCID,
     CellShard,
     decode_cellarea,
@@ -19,6 +20,7 @@ from ichnaea.models.cell import (  # NOQA
 )
 from ichnaea.models.content import (  # NOQA
     DataMap,
+    DataMapDayLog,
     RegionStat,
     Score,
     ScoreKey,
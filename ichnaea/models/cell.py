@@ -1,4 +1,6 @@
 import base64
+from collections import defaultdict
+from datetime import timedelta
 import math
 import struct
 
@@ -20,6 +22,7 @@ from sqlalchemy.ext.declarative import declared_attr
 from sqlalchemy.types import TypeDecorator
 
 from ichnaea.geocode import GEOCODER
+from ichnaea import util
 from ichnaea.models.base import (
     _Model,
     CreationMixin,
@@ -548,3 +551,53 @@ class CellShardLte(CellShard, _Model):
     __tablename__ = 'cell_lte'
 
 CELL_SHARDS[Radio.lte.name] = CellShardLte
+
+
+class CellChangeLog(object):
+    """
+    A Redis set of the cellids of all cell shard rows modified
+    within one hour.
+    """
+
+    expire = 172800  #: Seconds to keep the change log around (2 days).
+
+    def __init__(self, hour):
+        self.hour = hour.replace(minute=0, second=0, microsecond=0)
+        self.redis_key = 'cellchange_{hour}'.format(
+            hour=self.hour.strftime('%Y%m%d%H'))
+
+    def add(self, pipe, cellids):
+        if cellids:
+            pipe.sadd(self.redis_key, *cellids)
+            pipe.expire(self.redis_key, self.expire)
+
+    def get(self, redis_client):
+        return redis_client.smembers(self.redis_key)
+
+    @classmethod
+    def retained(cls, modified, now=None):
+        """
+        Return whether or not changes at the modified time are still
+        kept in a change log.
+        """
+        if modified is None:
+            return False
+        if now is None:
+            now = util.utcnow()
+        if modified.tzinfo is None:
+            modified = modified.replace(tzinfo=now.tzinfo)
+        return modified >= now - timedelta(seconds=cls.expire)
+
+    @classmethod
+    def add_changes(cls, pipe, changes, now=None):
+        """
+        Add a list of cellid, modified time tuples to the change logs
+        for the hour of each modified time.
+        """
+        hours = defaultdict(set)
+        for cellid, modified in changes:
+            if cls.retained(modified, now=now):
+                hour = modified.replace(minute=0, second=0, microsecond=0)
+                hours[hour].add(cellid)
+        for hour, cellids in hours.items():
+            cls(hour).add(pipe, list(cellids))
@@ -1,7 +1,9 @@
 import base64
+import math
 import struct
 
 from enum import IntEnum
+import numpy
 from sqlalchemy import (
     BINARY,
     Column,
@@ -36,6 +38,12 @@ latitude and longitude each moved to the positive space by adding
 90000 / 180000.
 """
 
+DATAMAP_GRID_DTYPE = numpy.dtype([('lat', '>u4'), ('lon', '>u4')])
+"""
+A NumPy structured dtype with the same memory layout as
+:data:`DATAMAP_GRID_STRUCT`.
+"""
+
 DATAMAP_SHARDS = {}
 
 
@@ -91,6 +99,18 @@ def encode_datamap_grid(lat, lon, scale=False, codec=None):
     return value
 
 
+def encode_datamap_grids(lats, lons):
+    """
+    Given arrays of scaled latitude/longitude integers, return a list
+    of compact 8 byte sequences representing the datamap grids.
+    """
+    grids = numpy.empty(len(lats), dtype=DATAMAP_GRID_DTYPE)
+    grids['lat'] = numpy.asarray(lats) + 90000
+    grids['lon'] = numpy.asarray(lons) + 180000
+    data = grids.tobytes()
+    return [data[i:i + 8] for i in range(0, len(data), 8)]
+
+
 class DataMapGridColumn(TypeDecorator):
     """A binary type storing scaled lat/lon grids."""
 
@@ -148,6 +168,16 @@ class DataMap(object):
             else:
                 return 'ne'
 
+    @classmethod
+    def shard_id_array(cls, lats, lons):
+        """
+        Given arrays of scaled lat/lon integers, return an array of
+        the shard ids for these grids.
+        """
+        index = ((numpy.asarray(lats) >= 36000) * 2 +
+                 (numpy.asarray(lons) >= 5000))
+        return numpy.array(['sw', 'se', 'nw', 'ne'])[index]
+
     @classmethod
     def shard_model(cls, lat, lon):
         """
@@ -164,10 +194,27 @@ class DataMap(object):
 
     @classmethod
     def scale(cls, lat, lon):
-        return (
-            int(round(lat * DATAMAP_GRID_SCALE)),
-            int(round(lon * DATAMAP_GRID_SCALE)),
-        )
+        def _scale(value):
+            # round half away from zero, like Python 2's round
+            value = value * DATAMAP_GRID_SCALE
+            return int(math.copysign(math.floor(abs(value) + 0.5), value))
+
+        return (_scale(lat), _scale(lon))
+
+    @classmethod
+    def scale_array(cls, lats, lons):
+        """
+        Given arrays of lat/lon floats, return a tuple of two arrays
+        of scaled lat/lon integers.
+        """
+        def _scale(values):
+            # round half away from zero, like Python 2's round
+            values = numpy.asarray(values, dtype=numpy.double)
+            values = values * DATAMAP_GRID_SCALE
+            return (numpy.sign(values) *
+                    numpy.floor(numpy.abs(values) + 0.5)).astype(numpy.int64)
+
+        return (_scale(lats), _scale(lons))
 
 
 class DataMapNE(DataMap, _Model):
@@ -249,6 +296,53 @@ class Score(HashKeyQueryMixin, _Model):
     value = Column(Integer)
 
 
+class DataMapDayLog(object):
+    """
+    A Redis set of the encoded grids of one datamap shard, which
+    have been queued for an update on one day.
+    """
+
+    expire = 172800  #: Seconds to keep the day log around (2 days).
+
+    # Add each grid to the day log and push it into the queue, if it
+    # wasn't part of the day log yet. KEYS are the day log and queue,
+    # ARGV are their expiry times followed by the grids.
+    _queue_script = '''\
+local queued = 0
+for i = 3, #ARGV do
+    if redis.call('sadd', KEYS[1], ARGV[i]) == 1 then
+        redis.call('lpush', KEYS[2], ARGV[i])
+        queued = queued + 1
+    end
+end
+redis.call('expire', KEYS[1], ARGV[1])
+if queued > 0 then
+    redis.call('expire', KEYS[2], ARGV[2])
+end
+return queued
+'''
+
+    def __init__(self, shard_id, day):
+        self.shard_id = shard_id
+        self.day = day
+        self.redis_key = 'datamap_{shard_id}_{date}'.format(
+            shard_id=shard_id, date=day.strftime('%Y%m%d'))
+
+    def queue_new(self, pipe, queue, grids):
+        """
+        Add the grids to the day log and push those, which weren't
+        part of it yet, into the data queue.
+
+        Both happen in one Lua script run as part of the pipeline,
+        so grids are only marked as queued if they got queued.
+        """
+        if not grids:
+            return
+        pipe.eval(self._queue_script, 2,
+                  self.redis_key, queue.queue_key(),
+                  self.expire, queue.queue_ttl, *grids)
+
+
 class StatCounter(object):
 
     def __init__(self, stat_key, day):
@@ -27,8 +27,11 @@ from ichnaea.models.wifi import (
 )
 
 
-class ValidReportSchema(colander.MappingSchema, ValidatorNode):
-    """A schema which validates the fields present in a report."""
+class ValidReportPositionSchema(colander.MappingSchema, ValidatorNode):
+    """
+    A schema which validates the fields present in a report,
+    without checking if the position is inside any region.
+    """
 
     lat = colander.SchemaNode(
         colander.Float(), missing=None, validator=colander.Range(
@@ -53,12 +56,19 @@ class ValidReportSchema(colander.MappingSchema, ValidatorNode):
             0.0, constants.MAX_SPEED))
 
     def validator(self, node, cstruct):
-        super(ValidReportSchema, self).validator(node, cstruct)
+        super(ValidReportPositionSchema, self).validator(node, cstruct)
         for field in ('lat', 'lon'):
             if (cstruct[field] is None or
                     cstruct[field] is colander.null):  # pragma: no cover
                 raise colander.Invalid(node, 'Report %s is required.' % field)
 
+
+class ValidReportSchema(ValidReportPositionSchema):
+    """A schema which validates the fields present in a report."""
+
+    def validator(self, node, cstruct):
+        super(ValidReportSchema, self).validator(node, cstruct)
+
         if not GEOCODER.any_region(cstruct['lat'], cstruct['lon']):
             raise colander.Invalid(node, (
                 'Lat/lon must be inside a region.'))
@@ -68,6 +78,7 @@ class Report(HashKey, CreationMixin, ValidationMixin):
     """A class for report data."""
 
     _valid_schema = ValidReportSchema()
+    _valid_position_schema = ValidReportPositionSchema()
     _fields = (
         'lat',
         'lon',
@@ -88,10 +99,42 @@ class Report(HashKey, CreationMixin, ValidationMixin):
         return dct
 
     @classmethod
-    def combine(cls, *reports):
+    def create_many(cls, entries):
+        """
+        Returns a list of instances of this class, one for each passed
+        in dictionary. Entries failing schema validation are returned
+        as None.
+
+        The region check is done for all entries in one batch.
+        """
+        validated = []
+        for entry in entries:
+            try:
+                validated.append(
+                    cls._valid_position_schema.deserialize(entry))
+            except colander.Invalid:
+                validated.append(None)
+
+        positions = [(value['lat'], value['lon'])
+                     for value in validated if value is not None]
+        in_region = iter(GEOCODER.any_region_many(
+            [lat for lat, lon in positions],
+            [lon for lat, lon in positions]))
+
+        result = []
+        for value in validated:
+            if value is not None and next(in_region):
+                result.append(cls(**value))
+            else:
+                result.append(None)
+        return result
+
+    @classmethod
+    def combine(cls, *reports, **kw):
         values = {}
         for report in reports:
             values.update(report.__dict__)
+        values.update(kw)
         return cls(**values)
 
 
@@ -186,7 +229,7 @@ class CellObservation(CellReport, Report):
     """A class for cell observation data."""
 
     _valid_schema = ValidCellObservationSchema()
-    _fields = CellReport._fields + Report._fields
+    _fields = CellReport._fields + Report._fields + ('userid', )
 
 
 class ValidWifiReportSchema(ValidWifiSignalSchema):
@@ -247,4 +290,4 @@ class WifiObservation(WifiReport, Report):
     """A class for wifi observation data."""
 
     _valid_schema = ValidWifiObservationSchema()
-    _fields = WifiReport._fields + Report._fields
+    _fields = WifiReport._fields + Report._fields + ('userid', )
@@ -1,6 +1,9 @@
+import numpy
+
 from ichnaea.models.content import (
     decode_datamap_grid,
     encode_datamap_grid,
+    encode_datamap_grids,
     DataMap,
     RegionStat,
     Score,
@@ -64,6 +67,14 @@ class TestDataMapCodec(TestCase):
         self.assertEqual(encode_datamap_grid(90000, 180000, codec='base64'),
                          b'AAK/IAAFfkA=')
 
+    def test_encode_datamap_grids(self):
+        lats = numpy.array([-90000, 0, 90000, 12345])
+        lons = numpy.array([-180000, 0, 180000, -23456])
+        self.assertEqual(
+            encode_datamap_grids(lats, lons),
+            [encode_datamap_grid(lat, lon) for lat, lon in zip(lats, lons)])
+        self.assertEqual(encode_datamap_grids([], []), [])
+
 
 class TestDataMap(DBTestCase):
 
@@ -83,6 +94,37 @@ class TestDataMap(DBTestCase):
         self.assertEqual(DataMap.scale(-1.12345678, 2.23456789),
                          (-1123, 2235))
 
+    def test_scale_half(self):
+        self.assertEqual(DataMap.scale(0.0005, -0.0005), (1, -1))
+        self.assertEqual(DataMap.scale(0.0025, -0.0025), (3, -3))
+        self.assertEqual(DataMap.scale(12.3465, -1.0005), (12347, -1001))
+        lats, lons = DataMap.scale_array(
+            [0.0005, 0.0025, 12.3465], [-0.0005, -0.0025, -1.0005])
+        self.assertEqual(list(zip(lats.tolist(), lons.tolist())), [
+            DataMap.scale(0.0005, -0.0005),
+            DataMap.scale(0.0025, -0.0025),
+            DataMap.scale(12.3465, -1.0005)])
+
+    def test_scale_array(self):
+        lats, lons = DataMap.scale_array(
+            [-1.12345678, 0.0, 89.9999], [2.23456789, -0.0004, -180.0])
+        self.assertEqual(lats.tolist(), [-1123, 0, 90000])
+        self.assertEqual(lons.tolist(), [2235, 0, -180000])
+
+    def test_scale_array_half(self):
+        lats, lons = DataMap.scale_array(
+            [0.0005, -0.0005, 0.0025, 12.3465],
+            [-0.0025, 0.0015, -1.0005, -12.3465])
+        self.assertEqual(lats.tolist(), [1, -1, 3, 12347])
+        self.assertEqual(lons.tolist(), [-3, 2, -1001, -12347])
+
+    def test_shard_id_array(self):
+        lats = [85000, 36000, 35999, -85000, 85000, 36000, 35999, -85000]
+        lons = [180000, 5000, 5000, 180000, -180000, 4999, 4999, -180000]
+        self.assertEqual(
+            DataMap.shard_id_array(lats, lons).tolist(),
+            [DataMap.shard_id(lat, lon) for lat, lon in zip(lats, lons)])
+
     def test_shard_id(self):
         self.assertEqual(DataMap.shard_id(None, None), None)
         self.assertEqual(DataMap.shard_id(85000, 180000), 'ne')
@@ -5,6 +5,7 @@ from ichnaea.internaljson import (
 from ichnaea.models import (
     CellObservation,
     Radio,
+    Report,
     WifiObservation,
 )
 from ichnaea.tests.base import (
@@ -12,9 +13,30 @@ from ichnaea.tests.base import (
     GB_LAT,
     GB_LON,
     GB_MCC,
+    TestCase,
 )
 
 
+class TestReport(TestCase):
+
+    def test_create_many(self):
+        reports = Report.create_many([
+            {'lat': GB_LAT, 'lon': GB_LON, 'accuracy': 10.0},
+            {'lat': 0.0, 'lon': 0.0},
+            {'lat': None, 'lon': GB_LON},
+            {'lat': GB_LAT + 0.1, 'lon': GB_LON},
+        ])
+        self.assertEqual(len(reports), 4)
+        self.assertEqual(reports[0].lat, GB_LAT)
+        self.assertEqual(reports[0].accuracy, 10.0)
+        self.assertTrue(reports[1] is None)
+        self.assertTrue(reports[2] is None)
+        self.assertEqual(reports[3].lat, GB_LAT + 0.1)
+
+    def test_create_many_empty(self):
+        self.assertEqual(Report.create_many([]), [])
+
+
 class TestCellObservation(DBTestCase):
 
     def test_fields(self):
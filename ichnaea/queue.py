@@ -3,6 +3,8 @@ Functionality related to custom Redis based queues.
 """
 
 import re
+import time
+import uuid
 
 from six.moves.urllib.parse import urlparse
 
@@ -12,7 +14,9 @@ from ichnaea.internaljson import (
     internal_loads,
 )
 
+EXPORT_INDEX_PREFIX = 'index_export_'
 EXPORT_QUEUE_PREFIX = 'queue_export_'
+EXPORT_UPLOAD_PREFIX = 'export_upload_'
 WHITESPACE = re.compile('\s', flags=re.UNICODE)
 
 
@@ -78,7 +82,7 @@ class BaseQueue(object):
         if ttl < 0:
             age = -1
         else:
-            age = min(self.queue_ttl - ttl, 0)
+            age = max(self.queue_ttl - ttl, 0)
         return (size, age)
 
 
@@ -119,11 +123,20 @@ class ExportQueue(BaseQueue):
         super(ExportQueue, self).__init__(name, redis_client)
         self.settings = settings
         self.batch = int(settings.get('batch', 0))
+        self.batch_bytes = int(settings.get('batch_bytes', 0))
+        self.concurrency = max(int(settings.get('concurrency', 1)), 1)
         self.metadata = bool(settings.get('metadata', False))
         self.url = settings.get('url', '') or ''
         self.scheme = urlparse(self.url).scheme
         skip_keys = WHITESPACE.split(settings.get('skip_keys', ''))
         self.skip_keys = tuple([key for key in skip_keys if key])
+        self._index_backfilled = False
+
+    @property
+    def compresslevel(self):
+        if self.scheme == 's3':
+            return 7
+        return 5
 
     @property
     def monitor_name(self):
@@ -144,6 +157,83 @@ class ExportQueue(BaseQueue):
             return EXPORT_QUEUE_PREFIX + self.name + ':'
         return None
 
+    @property
+    def index_key(self):
+        """
+        Key of a Redis sorted set containing all queue keys of a
+        multi-queue export, scored by the time of their last enqueue.
+        """
+        if self.queue_prefix:
+            return EXPORT_INDEX_PREFIX + self.name
+        return None
+
+    def _push(self, pipe, items, queue_key, batch=100):
+        if items and self.index_key:
+            pipe.zadd(self.index_key, time.time(), queue_key)
+        super(ExportQueue, self)._push(pipe, items, queue_key, batch=batch)
+
+    def backfill_index(self):
+        """
+        Add all existing queue keys of a multi-queue export to its index.
+
+        This picks up queues filled by older versions, which didn't
+        maintain the index. Each queue is scored by the time of its
+        last enqueue, as derived from its remaining TTL.
+        """
+        queue_keys = list(self.redis_client.scan_iter(
+            match=self.queue_prefix + '*', count=100))
+        if not queue_keys:
+            return
+
+        with self.redis_client.pipeline() as pipe:
+            for queue_key in queue_keys:
+                pipe.ttl(queue_key)
+            ttls = pipe.execute()
+
+        now = time.time()
+        with self.redis_client.pipeline() as pipe:
+            for queue_key, ttl in zip(queue_keys, ttls):
+                score = now
+                if ttl is not None and ttl >= 0:
+                    score = now - max(self.queue_ttl - ttl, 0)
+                pipe.zadd(self.index_key, score, queue_key)
+            pipe.execute()
+
+    def ready_queue_keys(self):
+        """
+        Return all queue keys of a multi-queue export, which have
+        enough data in them to be exported.
+        """
+        if not self._index_backfilled:
+            # BBB queues filled before the index was introduced
+            self.backfill_index()
+            self._index_backfilled = True
+
+        now = time.time()
+        with self.redis_client.pipeline() as pipe:
+            # remove queues whose list has expired
+            pipe.zremrangebyscore(
+                self.index_key, '-inf', '(%s' % (now - self.queue_ttl))
+            pipe.zrangebyscore(
+                self.index_key, now - self.queue_ttl, '+inf', withscores=True)
+            entries = pipe.execute()[1]
+
+        if not entries:
+            return []
+
+        with self.redis_client.pipeline() as pipe:
+            for queue_key, _ in entries:
+                pipe.llen(queue_key)
+            sizes = pipe.execute()
+
+        queue_keys = []
+        for (queue_key, score), size in zip(entries, sizes):
+            age = now - score
+            if size > 0 and (
+                    size >= self.batch or age >= self.queue_max_age):
+                queue_keys.append(queue_key)
+        return queue_keys
+
     def export_allowed(self, api_key):
         return (api_key not in self.skip_keys)
 
@@ -164,3 +254,18 @@ class ExportQueue(BaseQueue):
 
     def size_age(self, queue_key):
         return self._size_age(queue_key)
+
+    def store_upload(self, data, pipe):
+        """
+        Store the compressed data of one upload and return the
+        Redis key under which it can be loaded again.
+        """
+        upload_key = EXPORT_UPLOAD_PREFIX + self.name + ':' + uuid.uuid4().hex
+        pipe.setex(upload_key, self.queue_ttl, data)
+        return upload_key
+
+    def load_upload(self, upload_key):
+        return self.redis_client.get(upload_key)
+
+    def delete_upload(self, upload_key):
+        self.redis_client.delete(upload_key)
@@ -0,0 +1,194 @@
+"""Helper functionality for uploading data to Amazon S3."""
+
+from contextlib import closing
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+import os
+
+import boto
+from filechunkio import FileChunkIO
+
+PART_SIZE = 8 * 1024 * 1024
+"""
+Size of the individual parts of multipart uploads in bytes.
+
+Amazon S3 requires all parts but the last one to be at least 5 MB.
+"""
+
+_CONNECTIONS = {}
+
+
+def connect_s3():
+    """
+    Return a :class:`boto.s3.connection.S3Connection`.
+
+    The connection is reused for all uploads done in the same process.
+    """
+    pid = os.getpid()
+    conn = _CONNECTIONS.get(pid, None)
+    if conn is None:
+        conn = _CONNECTIONS[pid] = boto.connect_s3()
+    return conn
+
+
+class S3Upload(object):
+    """
+    A writable file-like object uploading all data written to it into
+    a single Amazon S3 key.
+
+    Data larger than the part size is sent as a multipart upload, with
+    up to `concurrency` parts being uploaded in parallel, while more
+    data is written. Smaller data is sent in one request on close.
+
+    The upload can be used as a context manager, which completes the
+    upload on success and cancels it on any exception.
+    """
+
+    def __init__(self, bucket, key_name, headers=None,
+                 reduced_redundancy=False,
+                 part_size=PART_SIZE, concurrency=4):
+        self.bucket = bucket
+        self.key_name = key_name
+        self.headers = headers
+        self.reduced_redundancy = reduced_redundancy
+        self.part_size = part_size
+        self.concurrency = concurrency
+        self.size = 0
+        self._buffer = BytesIO()
+        self._multipart = None
+        self._part_num = 0
+        self._pool = None
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _upload_part(self, part_num, data=None, path=None,
+                     offset=0, size=None):
+        # this is executed in a worker thread
+        if path is None:
+            fp = BytesIO(data)
+        else:
+            fp = FileChunkIO(path, 'r', offset=offset, bytes=size)
+        with closing(fp):
+            self._multipart.upload_part_from_file(fp, part_num)
+
+    def _submit(self, **kw):
+        if self._multipart is None:
+            self._multipart = self.bucket.initiate_multipart_upload(
+                self.key_name, headers=self.headers,
+                reduced_redundancy=self.reduced_redundancy)
+            self._pool = ThreadPool(self.concurrency)
+
+        # Limit the number of parts held in memory.
+        while len(self._pending) >= self.concurrency:
+            self._pending.pop(0).get()
+
+        self._part_num += 1
+        self._pending.append(self._pool.apply_async(
+            self._upload_part, (self._part_num, ), kw))
+
+    def _flush_buffer(self):
+        data = self._buffer.getvalue()
+        self._buffer = BytesIO()
+        if data:
+            self._submit(data=data)
+
+    def flush(self):
+        pass
+
+    def tell(self):
+        return self.size
+
+    def write(self, data):
+        self._buffer.write(data)
+        self.size += len(data)
+        if self._buffer.tell() >= self.part_size:
+            self._flush_buffer()
+
+    def write_file(self, path):
+        """
+        Upload the content of the file at `path` as the next parts,
+        reading each part directly from the file in the worker threads.
+        """
+        self._flush_buffer()
+        file_size = os.path.getsize(path)
+        for offset in range(0, file_size, self.part_size):
+            self._submit(path=path, offset=offset,
+                         size=min(self.part_size, file_size - offset))
+        self.size += file_size
+
+    def close(self):
+        if self._multipart is None:
+            key = self.bucket.new_key(self.key_name)
+            with closing(key):
+                key.set_contents_from_string(
+                    self._buffer.getvalue(), headers=self.headers,
+                    reduced_redundancy=self.reduced_redundancy)
+            return
+
+        try:
+            self._flush_buffer()
+            while self._pending:
+                self._pending.pop(0).get()
+        except Exception:
+            self.abort()
+            raise
+
+        self._pool.close()
+        self._pool.join()
+        self._multipart.complete_upload()
+
+    def abort(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+        if self._multipart is not None:
+            self._multipart.cancel_upload()
+
+
+class S3Bucket(object):
+    """Upload data into an Amazon S3 bucket."""
+
+    def __init__(self, bucketname, part_size=PART_SIZE, concurrency=4):
+        self.bucket = connect_s3().get_bucket(bucketname, validate=False)
+        self.part_size = part_size
+        self.concurrency = concurrency
+
+    def open_upload(self, key_name, headers=None, reduced_redundancy=False):
+        """
+        Return a :class:`ichnaea.s3.S3Upload` to stream data into
+        the key with the given name.
+        """
+        return S3Upload(self.bucket, key_name, headers=headers,
+                        reduced_redundancy=reduced_redundancy,
+                        part_size=self.part_size,
+                        concurrency=self.concurrency)
+
+    def upload_string(self, key_name, data,
+                      headers=None, reduced_redundancy=False):
+        """Upload the data into the key with the given name."""
+        with self.open_upload(key_name, headers=headers,
+                              reduced_redundancy=reduced_redundancy) as fd:
+            fd.write(data)
+
+    def upload_file(self, key_name, path,
+                    headers=None, reduced_redundancy=False):
+        """Upload the file at `path` into the key with the given name."""
+        if os.path.getsize(path) <= self.part_size:
+            key = self.bucket.new_key(key_name)
+            with closing(key):
+                key.set_contents_from_filename(
+                    path, headers=headers,
+                    reduced_redundancy=reduced_redundancy)
+            return
+
+        with self.open_upload(key_name, headers=headers,
+                              reduced_redundancy=reduced_redundancy) as fd:
+            fd.write_file(path)
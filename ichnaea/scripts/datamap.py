@@ -6,30 +6,42 @@ Script is installed as `location_map`.
 
 import argparse
 import hashlib
+import math
+from multiprocessing.pool import ThreadPool
 import os
 import os.path
 import shutil
+import struct
 import sys
+import time
+import zlib
 
 import billiard
-import boto
-from simplejson import dumps
+import numpy
+from scipy import signal
+from simplejson import (
+    dumps,
+    loads,
+)
 from sqlalchemy import text
 
 from ichnaea.config import read_config
 from ichnaea.models.content import (
     DataMap,
+    DATAMAP_GRID_SCALE,
     decode_datamap_grid,
+    encode_datamap_grid,
 )
 from ichnaea.db import (
     configure_db,
     db_worker_session,
 )
-from ichnaea.geocalc import random_points
+from ichnaea.geocalc import random_points_array
 from ichnaea.log import (
     configure_raven,
     configure_stats,
 )
+from ichnaea.s3 import S3Bucket
 from ichnaea import util
 
 try:
@@ -46,10 +58,36 @@ JSON_HEADERS = {
     'Cache-Control': 'max-age=3600, public',
 }
 
-if sys.platform == 'darwin':  # pragma: no cover
-    ZCAT = 'gzcat'
-else:  # pragma: no cover
-    ZCAT = 'zcat'
+DELETE_BATCH = 1000  #: Maximum number of keys deleted in one request.
+HASH_BLOCK_SIZE = 2 ** 16  #: Size of the blocks read to hash a tile.
+UPLOAD_CONCURRENCY = 4  #: Number of upload threads per process.
+
+MAX_TILE_LAT = 85.0511  #: Maximum latitude shown on mercator tiles.
+TILE_MARGIN = 0.1  #: Fraction of a tile covered by the rendered dots.
+EXPORT_BAND = 2000  #: Latitude range of each export job in scaled degrees.
+TILE_SIZE = 256  #: Width and height of the tiles in pixels.
+WORLD_SIZE = 2 ** 32  #: Width and height of the world in fixed point units.
+
+DOT_BRIGHTNESS = (12, 0.0379, 0.874)
+"""Base zoom level, brightness at that level and ramp per zoom level."""
+
+DOT_AREA = (16, 1600.0, 1.5)
+"""Base zoom level, dot area in pixels at that level and ramp per level."""
+
+DOT_COLOR = (0x00, 0x88, 0xff)  #: RGB color of the dots.
+GAMMA = 0.5  #: Gamma correction applied to the dot density.
+PALETTE_SIZE = 32  #: Number of colors in the tile palette.
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+MORTON_MASKS = [(numpy.uint64(shift), numpy.uint64(mask)) for shift, mask in (
+    (0, 0x00000000ffffffff),
+    (16, 0x0000ffff0000ffff),
+    (8, 0x00ff00ff00ff00ff),
+    (4, 0x0f0f0f0f0f0f0f0f),
+    (2, 0x3333333333333333),
+    (1, 0x5555555555555555),
+)]
 
 
 def recursive_scandir(top):  # pragma: no cover
@@ -60,255 +98,790 @@ def recursive_scandir(top):  # pragma: no cover
                 yield subentry
 
 
-def export_file(db_url, filename, tablename, _db_rw=None, _session=None):
+def grid_points(grids, nums):
+    """
+    Return two arrays of the latitudes and longitudes of the
+    pseudo-random points shown for the scaled lat/lon grids, with
+    the number of points depending on the age of each grid.
+    """
+    grids = numpy.array(grids, dtype=numpy.int64).reshape(-1, 2)
+    return random_points_array(grids[:, 0], grids[:, 1],
+                               numpy.array(nums, dtype=numpy.int64))
+
+
+def world_coordinates(lats, lons):
+    """
+    Return two arrays of the x and y spherical mercator coordinates of
+    the given latitudes and longitudes, as fixed point unsigned 32 bit
+    integers, covering the whole world with 2 ** 32 units.
+    """
+    scale = float(WORLD_SIZE)
+    x, y = tile_coordinates(lats, lons, 0)
+    return (numpy.clip(x * scale, 0, scale - 1).astype(numpy.uint32),
+            numpy.clip(y * scale, 0, scale - 1).astype(numpy.uint32))
+
+
+def _spread_bits(values):
+    # Insert a zero bit in front of each of the lower 32 bits.
+    values = numpy.asarray(values, dtype=numpy.uint64) & MORTON_MASKS[0][1]
+    for shift, mask in MORTON_MASKS[1:]:
+        values = (values | (values << shift)) & mask
+    return values
+
+
+def _compact_bits(values):
+    # Reverse of _spread_bits, dropping every second bit.
+    values = numpy.asarray(values, dtype=numpy.uint64) & MORTON_MASKS[-1][1]
+    for (shift, _), (_, mask) in zip(MORTON_MASKS[:0:-1],
+                                     MORTON_MASKS[-2::-1]):
+        values = (values | (values >> shift)) & mask
+    return values
+
+
+def tile_keys(x, y):
+    """
+    Return the Morton codes (Z-order curve keys) of the integer tile
+    coordinates. All tiles contained in one tile of a lower zoom level
+    form a consecutive range of keys.
+    """
+    return _spread_bits(x) | (_spread_bits(y) << numpy.uint64(1))
+
+
+def tile_key_coordinates(keys):
+    """Return the tile x and y coordinates of the Morton codes."""
+    keys = numpy.asarray(keys, dtype=numpy.uint64)
+    return (_compact_bits(keys), _compact_bits(keys >> numpy.uint64(1)))
+
+
+def grid_ranges(db_url, tablename, band=EXPORT_BAND,
+                _db_rw=None, _session=None):
+    """
+    Return a list of start and end grid tuples, splitting the table into
+    latitude bands of `band` scaled degrees. Each range includes its
+    start grid and excludes its end grid.
+    """
     # this is executed in a worker process
     stmt = text('''\
-SELECT
-`grid`, CAST(ROUND(DATEDIFF(CURDATE(), `modified`) / 30) AS UNSIGNED) as `num`
+SELECT MIN(`grid`) AS `min_grid`, MAX(`grid`) AS `max_grid`
 FROM {tablename}
-LIMIT :limit OFFSET :offset
 '''.format(tablename=tablename).replace('\n', ' '))
     db = configure_db(db_url, _db=_db_rw)
 
-    offset = 0
-    limit = 200000
+    with db_worker_session(db, commit=False) as session:
+        if _session is not None:
+            # testing hook
+            session = _session
+        row = session.execute(stmt).fetchone()
 
-    result_rows = 0
-    with util.gzip_open(filename, 'w', compresslevel=2) as fd:
-        with db_worker_session(db, commit=False) as session:
-            if _session is not None:
-                # testing hook
-                session = _session
-            while True:
-                result = session.execute(
-                    stmt.bindparams(limit=limit, offset=offset))
-                rows = result.fetchall()
-                result.close()
-                if not rows:
-                    break
+    db.engine.pool.dispose()
+
+    ranges = []
+    if row is None or row.min_grid is None:
+        return ranges
 
-                lines = []
-                extend = lines.extend
-                for row in rows:
-                    lat, lon = decode_datamap_grid(row.grid)
-                    extend(random_points(lat, lon, row.num))
+    min_lat = decode_datamap_grid(row.min_grid)[0]
+    max_lat = decode_datamap_grid(row.max_grid)[0]
+    for lat in range(min_lat, max_lat + 1, band):
+        ranges.append((encode_datamap_grid(lat, -180000),
+                       encode_datamap_grid(lat + band, -180000)))
+    return ranges
 
-                fd.writelines(lines)
-                result_rows += len(lines)
-                offset += limit
 
-    if not result_rows:
-        os.remove(filename)
+def export_points(db_url, filename, tablename, start, end, limit=200000,
+                  _db_rw=None, _session=None):
+    """
+    Export the points of all grids from the `start` grid up to the `end`
+    grid in the datamap table into a NumPy `.npz` file containing the
+    `x` and `y` world coordinate arrays.
+
+    The grids are read in pages of `limit` rows, each page starting
+    after the last grid of the previous one.
+
+    Returns the number of points, the file isn't written if there
+    are none.
+    """
+    # this is executed in a worker process
+    stmt = '''\
+SELECT
+`grid`, CAST(ROUND(DATEDIFF(CURDATE(), `modified`) / 30) AS UNSIGNED) as `num`
+FROM {tablename}
+WHERE `grid` {op} :after AND `grid` < :end
+ORDER BY `grid`
+LIMIT :limit
+'''.replace('\n', ' ')
+    first_stmt = text(stmt.format(tablename=tablename, op='>='))
+    next_stmt = text(stmt.format(tablename=tablename, op='>'))
+    db = configure_db(db_url, _db=_db_rw)
+
+    xs = []
+    ys = []
+    with db_worker_session(db, commit=False) as session:
+        if _session is not None:
+            # testing hook
+            session = _session
+        stmt = first_stmt
+        after = start
+        while True:
+            result = session.execute(
+                stmt.bindparams(after=after, end=end, limit=limit))
+            rows = result.fetchall()
+            result.close()
+            if not rows:
+                break
+
+            lats, lons = grid_points(
+                [decode_datamap_grid(row.grid) for row in rows],
+                [row.num for row in rows])
+            x, y = world_coordinates(lats, lons)
+            xs.append(x)
+            ys.append(y)
+
+            if len(rows) < limit:
+                break
+            stmt = next_stmt
+            after = rows[-1].grid
 
     db.engine.pool.dispose()
-    return result_rows
 
+    result_points = sum([len(x) for x in xs])
+    if result_points:
+        numpy.savez(filename, x=numpy.concatenate(xs), y=numpy.concatenate(ys))
+    return result_points
 
-def export_files(pool, db_url, csvdir):  # pragma: no cover
-    jobs = []
-    result_rows = 0
+
+def export_files(pool, db_url, pointdir):  # pragma: no cover
+    range_jobs = []
     for shard_id, shard in sorted(DataMap.shards().items()):
         # sorting the shards prefers the north which contains more
         # data points than the south
-        filename = os.path.join(csvdir, 'map_%s.csv.gz' % shard_id)
-        jobs.append(pool.apply_async(export_file,
-                                     (db_url, filename, shard.__tablename__)))
+        range_jobs.append((shard_id, shard.__tablename__, pool.apply_async(
+            grid_ranges, (db_url, shard.__tablename__))))
 
-    for job in jobs:
-        result_rows += job.get()
+    # Split each shard into ranges, so the large shards are exported
+    # by multiple processes.
+    jobs = []
+    for shard_id, tablename, range_job in range_jobs:
+        for i, (start, end) in enumerate(range_job.get()):
+            filename = os.path.join(
+                pointdir, 'map_%s_%04d.npz' % (shard_id, i))
+            jobs.append(pool.apply_async(
+                export_points, (db_url, filename, tablename, start, end)))
 
-    return result_rows
+    result_points = 0
+    for job in jobs:
+        result_points += job.get()
+
+    return result_points
+
+
+def merge_points(pointdir, max_zoom, chunk=2 ** 22):
+    """
+    Merge all exported point files into the `keys.npy`, `x.npy` and
+    `y.npy` arrays, sorted by the Morton code of the tile at `max_zoom`
+    containing each point. The points of any tile can then be found
+    by a binary search in the sorted keys.
+
+    Each exported file is sorted on its own first. The sorted files
+    are then merged into the memory-mapped result arrays, taking up to
+    `chunk` points from all files at a time.
+
+    Returns the number of points.
+    """
+    shift = numpy.uint64(32 - max_zoom)
+    runs = []
+    for name in sorted(os.listdir(pointdir)):
+        if name.startswith('map_') and name.endswith('.npz'):
+            path = os.path.join(pointdir, name)
+            with numpy.load(path) as data:
+                x = data['x']
+                y = data['y']
+            os.remove(path)
+
+            keys = tile_keys(x.astype(numpy.uint64) >> shift,
+                             y.astype(numpy.uint64) >> shift)
+            order = numpy.argsort(keys, kind='mergesort')
+            run = os.path.join(pointdir, 'run_' + name[:-len('.npz')])
+            for suffix, values in (('keys', keys), ('x', x), ('y', y)):
+                numpy.save(run + '_' + suffix + '.npy', values[order])
+            runs.append(run)
+
+    sources = []
+    for run in runs:
+        sources.append(tuple([
+            numpy.load(run + '_' + suffix + '.npy', mmap_mode='r')
+            for suffix in ('keys', 'x', 'y')]))
+    total = sum([len(source[0]) for source in sources])
+
+    names = ('keys', 'x', 'y')
+    if not total:
+        empty = numpy.zeros(0, dtype=numpy.uint32)
+        values = (tile_keys(empty, empty), empty, empty)
+        for name, value in zip(names, values):
+            numpy.save(os.path.join(pointdir, name + '.npy'), value)
+    else:
+        results = [numpy.lib.format.open_memmap(
+            os.path.join(pointdir, name + '.npy'), mode='w+',
+            dtype=sources[0][i].dtype, shape=(total, ))
+            for i, name in enumerate(names)]
+
+        # k-way merge of the sorted runs, each round takes all points
+        # up to the smallest of the last keys of each run's window
+        window = max(chunk // len(sources), 1)
+        positions = [0] * len(sources)
+        written = 0
+        while written < total:
+            active = [i for i, source in enumerate(sources)
+                      if positions[i] < len(source[0])]
+            boundary = min([
+                sources[i][0][min(positions[i] + window,
+                                  len(sources[i][0])) - 1]
+                for i in active])
+
+            parts = []
+            for i in active:
+                keys = sources[i][0]
+                start = positions[i]
+                end = min(start + window, len(keys))
+                end = start + int(numpy.searchsorted(
+                    keys[start:end], boundary, side='right'))
+                parts.append([numpy.asarray(column[start:end])
+                              for column in sources[i]])
+                positions[i] = end
+
+            merged = [numpy.concatenate([part[j] for part in parts])
+                      for j in range(len(names))]
+            order = numpy.argsort(merged[0], kind='mergesort')
+            for result, values in zip(results, merged):
+                result[written:written + len(order)] = values[order]
+            written += len(order)
+
+        for result in results:
+            result.flush()
+        del results
+
+    del sources
+    for run in runs:
+        for suffix in ('keys', 'x', 'y'):
+            os.remove(run + '_' + suffix + '.npy')
+    return total
+
+
+def load_points(pointdir):
+    """
+    Memory-map the merged point arrays, returning a tuple of the
+    sorted keys, x and y arrays.
+    """
+    return tuple([numpy.load(os.path.join(pointdir, name + '.npy'),
+                             mmap_mode='r')
+                  for name in ('keys', 'x', 'y')])
+
+
+def _distinct_sorted(values):
+    """Return the distinct values of a sorted array."""
+    values = numpy.asarray(values)
+    if not len(values):
+        return values
+    return values[numpy.r_[True, values[1:] != values[:-1]]]
+
+
+def enumerate_tiles(keys, max_zoom, chunk=2 ** 22):
+    """
+    Return a sorted list of zoom, x, y tuples of all tiles up to
+    and including `max_zoom` containing any points.
+
+    The sorted keys are only scanned once, in chunks of `chunk` keys.
+    The tiles of each lower zoom level are derived from the distinct
+    tile keys of the level above.
+    """
+    parts = []
+    last = None
+    for start in range(0, len(keys), chunk):
+        values = _distinct_sorted(keys[start:start + chunk])
+        if last is not None and len(values) and values[0] == last:
+            values = values[1:]
+        if len(values):
+            parts.append(values)
+            last = values[-1]
+
+    if parts:
+        distinct = numpy.concatenate(parts)
+    else:
+        distinct = numpy.zeros(0, dtype=numpy.uint64)
+
+    levels = []
+    for zoom in range(max_zoom, -1, -1):
+        if zoom < max_zoom:
+            distinct = _distinct_sorted(distinct >> numpy.uint64(2))
+        tile_x, tile_y = tile_key_coordinates(distinct)
+        levels.append(sorted(zip([zoom] * len(tile_x),
+                                 tile_x.astype(int).tolist(),
+                                 tile_y.astype(int).tolist())))
+
+    result = []
+    for level in reversed(levels):
+        result.extend(level)
+    return result
 
 
-def encode_file(name, csvdir, quaddir, datamaps):
+def dot_model(zoom, size=TILE_SIZE):
+    """
+    Return the brightness and radius in pixels of a single dot rendered
+    into a tile of the given zoom level and pixel size.
+
+    Both change by a constant ramp factor per zoom level, following the
+    `render -B 12:0.0379:0.874 -O 16:1600:1.5` options of the
+    datamaps tools.
+    """
+    base, brightness, ramp = DOT_BRIGHTNESS
+    brightness = brightness * ramp ** (zoom - base)
+    base, area, ramp = DOT_AREA
+    area = area * ramp ** (zoom - base) * (float(size) / TILE_SIZE) ** 2
+    return (brightness, math.sqrt(area / math.pi))
+
+
+def dot_kernel(radius):
+    """
+    Return a two-dimensional array describing the coverage of the
+    pixels by an anti-aliased dot centered in the middle pixel.
+    """
+    pad = int(math.ceil(radius))
+    rows, cols = numpy.mgrid[-pad:pad + 1, -pad:pad + 1]
+    return numpy.clip(radius + 0.5 - numpy.hypot(rows, cols), 0.0, 1.0)
+
+
+def tile_palette(size=PALETTE_SIZE):
+    """
+    Return the RGB colors and alpha values of the palette used for all
+    tiles. The dot color fades in with increasing dot density, and
+    fades to white once the density exceeds the full dot brightness.
+    """
+    values = numpy.linspace(0.0, 2.0, size)
+    color = numpy.array(DOT_COLOR, dtype=numpy.double)
+    whiten = numpy.clip(values - 1.0, 0.0, 1.0).reshape(-1, 1)
+    colors = color + (255.0 - color) * whiten
+    alpha = numpy.clip(values, 0.0, 1.0) * 255.0
+    return (numpy.rint(colors).astype(numpy.uint8),
+            numpy.rint(alpha).astype(numpy.uint8))
+
+
+def render_tile(points, max_zoom, zoom, x, y, size=TILE_SIZE):
+    """
+    Render a single tile as a two-dimensional array of palette indices.
+
+    Returns `None` for tiles without any visible dots.
+    """
+    keys, xs, ys = points
+    tiles = 2 ** zoom
+    brightness, radius = dot_model(zoom, size=size)
+    kernel = dot_kernel(radius)
+    pad = kernel.shape[0] // 2
+    width = size + 2 * pad
+
+    # Dots of points in the neighboring tiles reach into this tile.
+    shift = 2 * (max_zoom - zoom)
+    selections = []
+    for tile_x in range(max(x - 1, 0), min(x + 2, tiles)):
+        for tile_y in range(max(y - 1, 0), min(y + 2, tiles)):
+            key = int(tile_keys(tile_x, tile_y))
+            start, end = numpy.searchsorted(keys, numpy.array(
+                [key << shift, (key + 1) << shift], dtype=numpy.uint64))
+            if end > start:
+                selections.append((start, end))
+
+    if not selections:
+        return None
+
+    scale = float(tiles * size) / WORLD_SIZE
+    pixel_x = numpy.concatenate([xs[start:end] for start, end in selections])
+    pixel_y = numpy.concatenate([ys[start:end] for start, end in selections])
+    pixel_x = numpy.floor(pixel_x * scale - x * size).astype(numpy.int64) + pad
+    pixel_y = numpy.floor(pixel_y * scale - y * size).astype(numpy.int64) + pad
+    inside = ((pixel_x >= 0) & (pixel_x < width) &
+              (pixel_y >= 0) & (pixel_y < width))
+    if not inside.any():
+        return None
+
+    counts = numpy.bincount(
+        pixel_y[inside] * width + pixel_x[inside],
+        minlength=width * width).reshape(width, width)
+    density = signal.fftconvolve(counts.astype(numpy.double), kernel,
+                                 mode='same')[pad:pad + size, pad:pad + size]
+
+    # The FFT leaves tiny rounding errors in empty areas, which the
+    # quantization to the palette removes.
+    values = numpy.clip(density * brightness, 0.0, None) ** GAMMA
+    pixels = numpy.clip(numpy.rint(values * (PALETTE_SIZE - 1) / 2.0),
+                        0, PALETTE_SIZE - 1).astype(numpy.uint8)
+    if not pixels.any():
+        return None
+    return pixels
+
+
+def _png_chunk(tag, data):
+    return b''.join([
+        struct.pack('!I', len(data)), tag, data,
+        struct.pack('!I', zlib.crc32(tag + data) & 0xffffffff)])
+
+
+def write_png(filename, pixels, colors, alpha):
+    """
+    Write the two-dimensional array of palette indices into a PNG file,
+    using the given palette colors and alpha values.
+    """
+    height, width = pixels.shape
+    scanlines = numpy.zeros((height, width + 1), dtype=numpy.uint8)
+    scanlines[:, 1:] = pixels
+    with open(filename, 'wb') as fd:
+        fd.write(PNG_SIGNATURE)
+        fd.write(_png_chunk(b'IHDR', struct.pack(
+            '!IIBBBBB', width, height, 8, 3, 0, 0, 0)))
+        fd.write(_png_chunk(b'PLTE', colors.tobytes()))
+        fd.write(_png_chunk(b'tRNS', alpha.tobytes()))
+        fd.write(_png_chunk(b'IDAT', zlib.compress(scanlines.tobytes(), 9)))
+        fd.write(_png_chunk(b'IEND', b''))
+
+
+def render_tiles(pointdir, tiles, max_zoom, tile_list):
+    """
+    Render all tiles in the list of zoom, x, y tuples into PNG files
+    below the `tiles` directory. For zoom level 0 an additional high
+    resolution tile is rendered.
+
+    Returns the number of written tile files.
+    """
     # this is executed in a worker process
-    cmd = '{zcat} {input} | {encode} -z15 -o {output}'.format(
-        zcat=ZCAT,
-        input=os.path.join(csvdir, name),
-        encode=os.path.join(datamaps, 'encode'),
-        output=os.path.join(quaddir, name.split('.')[0]))
+    points = load_points(pointdir)
+    colors, alpha = tile_palette()
+
+    rendered = 0
+    for zoom, x, y in tile_list:
+        sizes = [(TILE_SIZE, '')]
+        if zoom == 0:
+            sizes.append((TILE_SIZE * 2, '@2x'))
+
+        for size, suffix in sizes:
+            pixels = render_tile(points, max_zoom, zoom, x, y, size=size)
+            if pixels is None:
+                continue
+
+            folder = os.path.join(tiles, str(zoom), str(x))
+            try:
+                os.makedirs(folder)
+            except OSError:  # pragma: no cover
+                # created by another worker
+                if not os.path.isdir(folder):
+                    raise
+
+            write_png(os.path.join(folder, '%s%s.png' % (y, suffix)),
+                      pixels, colors, alpha)
+            rendered += 1
 
-    os.system(cmd)
+    return rendered
 
 
-def encode_files(pool, csvdir, quaddir, datamaps):  # pragma: no cover
+def render_files(pool, pointdir, tiles, max_zoom,
+                 tile_list, batch=200):  # pragma: no cover
     jobs = []
-    for name in os.listdir(csvdir):
-        if name.startswith('map_') and name.endswith('.csv.gz'):
-            jobs.append(pool.apply_async(
-                encode_file,
-                (name, csvdir, quaddir, datamaps)))
+    for i in range(0, len(tile_list), batch):
+        jobs.append(pool.apply_async(
+            render_tiles,
+            (pointdir, tiles, max_zoom, tile_list[i:i + batch])))
 
+    rendered = 0
     for job in jobs:
-        job.get()
-
-    return len(jobs)
-
-
-def merge_files(quaddir, shapes, datamaps):
-    cmd = '{merge} -u -o {output} {input}'.format(
-        merge=os.path.join(datamaps, 'merge'),
-        input=os.path.join(quaddir, 'map*'),
-        output=shapes)
-
-    os.system(cmd)
-
-
-def render_tiles(shapes, tiles, concurrency, max_zoom, datamaps, pngquant):
-    cmd = ("{enumerate} -z{zoom} {shapes} | xargs -L1 -P{concurrency} "
-           "sh -c 'mkdir -p {output}/$2/$3; {render} "
-           "-B 12:0.0379:0.874 -c0088FF -t0 "
-           "-O 16:1600:1.5 -G 0.5{extra} $1 $2 $3 $4 | "
-           "{pngquant} --speed=3 --quality=65-95 32 > "
-           "{output}/$2/$3/$4{suffix}.png' dummy")
-
-    datamaps_enumerate = os.path.join(datamaps, 'enumerate')
-    datamaps_render = os.path.join(datamaps, 'render')
-
-    zoom_0_cmd = cmd.format(
-        enumerate=datamaps_enumerate,
-        zoom=0,
-        shapes=shapes,
-        concurrency=concurrency,
-        render=datamaps_render,
-        pngquant=pngquant,
-        output=tiles,
-        extra=' -T 512',
-        suffix='@2x')
-
-    zoom_all_cmd = cmd.format(
-        enumerate=datamaps_enumerate,
-        zoom=max_zoom,
-        shapes=shapes,
-        concurrency=concurrency,
-        render=datamaps_render,
-        pngquant=pngquant,
-        output=tiles,
-        extra='',
-        suffix='')
-
-    # Create high-res version for zoom level 0.
-    os.system(zoom_0_cmd)
-    os.system(zoom_all_cmd)
-
-
-def upload_folder(bucketname, bucket_prefix,
-                  tiles, folder):  # pragma: no cover
+        rendered += job.get()
+
+    return rendered
+
+
+def changed_grids(db_url, tablename, since, _db_rw=None, _session=None):
+    """
+    Return a list of scaled lat/lon tuples for all grids whose rendered
+    points changed since the given date.
+
+    These are the grids modified since that date and the grids whose
+    age based number of points changed since then.
+    """
     # this is executed in a worker process
-    result = {
-        'tile_changed': 0,
-        'tile_deleted': 0,
-        'tile_new': 0,
-        'tile_unchanged': 0,
-    }
+    stmt = text('''\
+SELECT `grid`
+FROM {tablename}
+WHERE `modified` >= :since OR (
+`modified` >= DATE_SUB(CURDATE(), INTERVAL 180 DAY) AND
+ROUND(DATEDIFF(:since, `modified`) / 30) !=
+ROUND(DATEDIFF(CURDATE(), `modified`) / 30))
+'''.format(tablename=tablename).replace('\n', ' '))
+    db = configure_db(db_url, _db=_db_rw)
+
+    with db_worker_session(db, commit=False) as session:
+        if _session is not None:
+            # testing hook
+            session = _session
+        grids = [decode_datamap_grid(row.grid) for row in
+                 session.execute(stmt.bindparams(since=since)).fetchall()]
+
+    db.engine.pool.dispose()
+    return grids
+
+
+def tile_coordinates(lats, lons, zoom):
+    """
+    Return two arrays of the fractional x and y tile coordinates
+    of the given latitudes and longitudes at one zoom level, using
+    the spherical mercator tiling scheme.
+    """
+    tiles = 2 ** zoom
+    lat_rad = numpy.radians(numpy.clip(lats, -MAX_TILE_LAT, MAX_TILE_LAT))
+    x = (numpy.asarray(lons, dtype=numpy.double) + 180.0) / 360.0 * tiles
+    y = (1.0 - numpy.log(numpy.tan(lat_rad) + 1.0 / numpy.cos(lat_rad)) /
+         math.pi) / 2.0 * tiles
+    return (x, y)
+
+
+def changed_tiles(grids, max_zoom, margin=TILE_MARGIN):
+    """
+    Return a sorted list of zoom, x, y tuples of all tiles up to
+    and including `max_zoom` showing any of the given grids.
+
+    Each grid is extended by `margin`, a fraction of the tile size,
+    to include the neighboring tiles the rendered dots reach into.
+    """
+    if not len(grids):
+        return []
+
+    grids = numpy.array(grids, dtype=numpy.double).reshape(-1, 2)
+    lat0 = grids[:, 0] / DATAMAP_GRID_SCALE
+    lon0 = grids[:, 1] / DATAMAP_GRID_SCALE
+    lat1 = lat0 + 1.0 / DATAMAP_GRID_SCALE
+    lon1 = lon0 + 1.0 / DATAMAP_GRID_SCALE
+
+    result = []
+    for zoom in range(max_zoom + 1):
+        tiles = 2 ** zoom
+        # the tile y coordinates increase from north to south
+        min_x, max_y = tile_coordinates(lat0, lon0, zoom)
+        max_x, min_y = tile_coordinates(lat1, lon1, zoom)
+        bounds = []
+        for low, high in ((min_x, max_x), (min_y, max_y)):
+            bounds.append((
+                numpy.clip(numpy.floor(low - margin), 0, tiles - 1),
+                numpy.clip(numpy.floor(high + margin), 0, tiles - 1)))
+        (min_x, max_x), (min_y, max_y) = bounds
+
+        keys = []
+        for i in range(int((max_x - min_x).max()) + 1):
+            x = numpy.minimum(min_x + i, max_x)
+            for j in range(int((max_y - min_y).max()) + 1):
+                y = numpy.minimum(min_y + j, max_y)
+                keys.append(x * tiles + y)
+
+        for key in numpy.unique(numpy.concatenate(keys)).astype(numpy.int64):
+            result.append((zoom, int(key // tiles), int(key % tiles)))
 
-    # Get all the S3 keys.
-    conn = boto.connect_s3()
-    bucket = conn.get_bucket(bucketname, validate=False)
+    return result
 
-    key_root = bucket_prefix + folder[len(tiles):].lstrip('/') + '/'
-    keys = {}
-    for key in bucket.list(prefix=key_root):
-        keys[key.name[len(bucket_prefix):]] = key
 
-    # Traverse local file system
-    for entry in recursive_scandir(folder):
-        if not entry.is_file() or not entry.name.endswith('.png'):
-            continue
+def load_manifest(filename):
+    """
+    Load the tile manifest from the JSON file, returning `None` if
+    it doesn't exist.
+
+    The manifest contains the date of the data the tiles are based on
+    and a mapping of tile names to the sizes and md5 hashes of the
+    tile files.
+    """
+    if not os.path.isfile(filename):
+        return None
+    with open(filename, 'r') as fd:
+        return loads(fd.read())
+
+
+def save_manifest(filename, manifest):
+    with open(filename + '.tmp', 'w') as fd:
+        fd.write(dumps(manifest))
+    os.rename(filename + '.tmp', filename)
+
+
+def hash_tile(path):
+    """
+    Return a list of the size and md5 hash of the tile file, or `None`
+    if the file doesn't exist.
+    """
+    md5 = hashlib.md5()
+    size = 0
+    try:
+        with open(path, 'rb') as fd:
+            while True:
+                data = fd.read(HASH_BLOCK_SIZE)
+                if not data:
+                    break
+                md5.update(data)
+                size += len(data)
+    except (IOError, OSError):
+        return None
+    return [size, md5.hexdigest()]
+
+
+def tile_names(tile_list):
+    names = []
+    for zoom, x, y in tile_list:
+        names.append('%s/%s/%s.png' % (zoom, x, y))
+        if zoom == 0:
+            names.append('0/0/0@2x.png')
+    return names
+
+
+def remote_manifest(bucketname, bucket_prefix='tiles/'):
+    """
+    Return a manifest of all tiles in the bucket, by listing all keys.
+
+    This is only used if there is no local manifest from a previous run.
+    The tiles are small enough to be uploaded in a single request, so
+    the key etags are the md5 hashes of the tiles.
+    """
+    bucket = S3Bucket(bucketname).bucket
+    tiles = {}
+    for key in bucket.list(prefix=bucket_prefix):
+        if key.name.endswith('.png'):
+            tiles[key.name[len(bucket_prefix):]] = [
+                key.size, key.etag.strip('"')]
+    return {'tiles': tiles}
+
+
+def update_status_file(bucketname, bucket_prefix):
+    S3Bucket(bucketname).upload_string(
+        bucket_prefix + 'data.json',
+        dumps({'updated': util.utcnow().isoformat()}).encode('utf-8'),
+        headers=JSON_HEADERS,
+        reduced_redundancy=True)
 
-        key_name = entry.path[len(tiles):].lstrip('/')
-        key = keys.pop(key_name, None)
-        changed = True
 
-        if key is not None:
-            if entry.stat().st_size != key.size:
-                # Mismatched file sizes?
-                changed = True
-            else:
-                remote_md5 = key.etag.strip('"')
-                with open(entry.path, 'rb') as fd:
-                    local_md5 = hashlib.md5(fd.read()).hexdigest()
-                if local_md5 == remote_md5:
-                    # Do the md5/etags match?
-                    changed = False
-
-        if changed:
-            if key is None:
-                key = boto.s3.key.Key(bucket)
-                key.key = bucket_prefix + key_name
-                result['tile_new'] += 1
-            else:
-                result['tile_changed'] += 1
+def upload_tiles(bucketname, bucket_prefix, tiles, known_tiles,
+                 concurrency=UPLOAD_CONCURRENCY):
+    """
+    Upload all tiles whose size or md5 hash differs from the known
+    size and hash. The tiles are hashed and uploaded by a pool of
+    `concurrency` threads.
 
-            # Create or update the key.
-            key.set_contents_from_filename(
-                entry.path,
+    Returns a tuple of a mapping of uploaded tile names to their new
+    sizes and hashes and a list of the names of all missing tiles.
+    """
+    # this is executed in a worker process
+    s3_bucket = S3Bucket(bucketname)
+    names = sorted(known_tiles.keys())
+    thread_pool = ThreadPool(concurrency)
+    try:
+        infos = thread_pool.map(
+            hash_tile, [os.path.join(tiles, name) for name in names])
+
+        changed = []
+        missing = []
+        for name, info in zip(names, infos):
+            if info is None:
+                # the tile didn't contain any points
+                missing.append(name)
+            elif info != known_tiles[name]:
+                changed.append((name, info))
+
+        def _upload(name):
+            s3_bucket.upload_file(
+                bucket_prefix + name, os.path.join(tiles, name),
                 headers=IMAGE_HEADERS,
                 reduced_redundancy=True)
-        else:
-            result['tile_unchanged'] += 1
 
-    # Delete orphaned keys.
-    if keys:
-        result['tile_deleted'] += len(keys)
-        bucket.delete_keys(keys.values())
+        thread_pool.map(_upload, [name for name, info in changed])
+    finally:
+        thread_pool.close()
+        thread_pool.join()
 
-    return result
+    return (dict(changed), missing)
+
+
+def delete_tiles(bucketname, bucket_prefix, names, batch=DELETE_BATCH):
+    """Delete the named tiles, using one request per batch of tiles."""
+    bucket = S3Bucket(bucketname).bucket
+    for i in range(0, len(names), batch):
+        bucket.delete_keys([bucket_prefix + name
+                            for name in names[i:i + batch]])
 
 
-def upload_files(pool, bucketname, tiles, max_zoom,
-                 bucket_prefix='tiles/'):  # pragma: no cover
+def sync_tiles(pool, bucketname, tiles, names, manifest,
+               delete_unknown=False, bucket_prefix='tiles/', batch=1000):
+    """
+    Upload the named tiles if they changed, compared to the sizes and
+    hashes in the manifest. This avoids listing the existing keys in S3.
+
+    Tiles in the manifest which no longer exist locally are deleted.
+    With `delete_unknown`, all tiles in the manifest which aren't
+    in the list of names are deleted as well.
+
+    The manifest is updated in place with the new tile sizes and hashes.
+    """
     result = {
+        'tile_bytes': 0,
         'tile_changed': 0,
         'tile_deleted': 0,
         'tile_new': 0,
         'tile_unchanged': 0,
     }
-
-    zoom_levels = frozenset([str(i) for i in range(max_zoom + 1)])
-    tiny_levels = frozenset([str(i) for i in range(max_zoom - 2)])
-
-    paths = []
-    for entry in scandir(tiles):
-        if not entry.is_dir() or entry.name not in zoom_levels:
-            continue
-        if entry.name in tiny_levels:
-            # Process upper zoom levels in one go, as these contain
-            # very few files. This avoids the overhead of repeated
-            # Amazon S3 list calls and job scheduling.
-            paths.append(entry.path)
-        else:
-            for subentry in scandir(entry.path):
-                if subentry.is_dir():
-                    paths.append(subentry.path)
+    known = manifest['tiles']
 
     jobs = []
-    for folder in paths:
+    for i in range(0, len(names), batch):
+        known_tiles = dict([(name, known.get(name))
+                            for name in names[i:i + batch]])
         jobs.append(pool.apply_async(
-            upload_folder, (bucketname, bucket_prefix, tiles, folder)))
+            upload_tiles, (bucketname, bucket_prefix, tiles, known_tiles)))
 
+    uploaded = {}
+    missing = set()
     for job in jobs:
-        folder_result = job.get()
-        for key, value in folder_result.items():
-            result[key] += value
-
-    # Update status file
-    conn = boto.connect_s3()
-    bucket = conn.get_bucket(bucketname, validate=False)
-
-    key = boto.s3.key.Key(bucket)
-    key.key = bucket_prefix + 'data.json'
-    key.set_contents_from_string(
-        dumps({'updated': util.utcnow().isoformat()}),
-        headers=JSON_HEADERS,
-        reduced_redundancy=True)
+        job_uploaded, job_missing = job.get()
+        uploaded.update(job_uploaded)
+        missing.update(job_missing)
+
+    for name in names:
+        if name in uploaded:
+            if name in known:
+                result['tile_changed'] += 1
+            else:
+                result['tile_new'] += 1
+            result['tile_bytes'] += uploaded[name][0]
+        elif name not in missing:
+            result['tile_unchanged'] += 1
 
+    deleted = missing
+    if delete_unknown:
+        deleted = deleted.union(set(known.keys()).difference(set(names)))
+    deleted = sorted(deleted.intersection(set(known.keys())))
+    if deleted:
+        delete_tiles(bucketname, bucket_prefix, deleted)
+    result['tile_deleted'] = len(deleted)
+
+    known.update(uploaded)
+    for name in deleted:
+        del known[name]
+    if uploaded or deleted or delete_unknown:
+        update_status_file(bucketname, bucket_prefix)
     return result
 
 
+def changed_grid_files(pool, db_url, since):  # pragma: no cover
+    jobs = []
+    for shard_id, shard in sorted(DataMap.shards().items()):
+        jobs.append(pool.apply_async(changed_grids,
+                                     (db_url, shard.__tablename__, since)))
+
+    grids = []
+    for job in jobs:
+        grids.extend(job.get())
+
+    return grids
+
+
 def generate(db_url, bucketname, raven_client, stats_client,
-             upload=True, concurrency=2, max_zoom=13,
-             datamaps='', output=None):  # pragma: no cover
+             upload=True, concurrency=2, max_zoom=13, output=None,
+             incremental=False):  # pragma: no cover
     with util.selfdestruct_tempdir() as workdir:
         pool = billiard.Pool(processes=concurrency)
 
@@ -320,53 +893,79 @@ def generate(db_url, bucketname, raven_client, stats_client,
         if not os.path.isdir(basedir):
             os.makedirs(basedir)
 
-        # Concurrently export datamap table to CSV files.
-        csvdir = os.path.join(basedir, 'csv')
-        if not os.path.isdir(csvdir):
-            os.mkdir(csvdir)
+        # The manifest contains the date of the last run and the sizes
+        # and hashes of all uploaded tiles. In incremental mode, only
+        # the tiles showing grids changed since the last run are
+        # rendered and uploaded.
+        manifest_file = os.path.join(basedir, 'manifest.json')
+        today = util.utcnow().date().isoformat()
+        manifest = load_manifest(manifest_file)
+
+        tile_list = None
+        if incremental and manifest is not None:
+            with stats_client.timed('datamaps', tags=['func:changes']):
+                grids = changed_grid_files(
+                    pool, db_url, manifest['updated'])
+                tile_list = changed_tiles(grids, max_zoom)
+
+            stats_client.timing('datamaps', len(grids),
+                                tags=['count:changed_grids'])
+            stats_client.timing('datamaps', len(tile_list),
+                                tags=['count:changed_tiles'])
+
+        full_run = tile_list is None
+
+        # Concurrently export the points of all datamap tables.
+        pointdir = os.path.join(basedir, 'points')
+        if os.path.isdir(pointdir):
+            shutil.rmtree(pointdir)
+        os.mkdir(pointdir)
 
         with stats_client.timed('datamaps', tags=['func:export']):
-            result_rows = export_files(pool, db_url, csvdir)
-
-        stats_client.timing('datamaps', result_rows, tags=['count:csv_rows'])
+            result_points = export_files(pool, db_url, pointdir)
 
-        # Concurrently create quadtrees out of CSV files.
-        quaddir = os.path.join(basedir, 'quadtrees')
-        if os.path.isdir(quaddir):
-            shutil.rmtree(quaddir)
-        os.mkdir(quaddir)
+        stats_client.timing('datamaps', result_points,
+                            tags=['count:points'])
 
-        with stats_client.timed('datamaps', tags=['func:encode']):
-            quadtrees = encode_files(pool, csvdir, quaddir, datamaps)
-
-        stats_client.timing('datamaps', quadtrees, tags=['count:quadtrees'])
-
-        pool.close()
-        pool.join()
-
-        # Merge quadtrees and make points unique. This process cannot
+        # Sort all points by their tiles. This process cannot
         # be made concurrent.
-        shapes = os.path.join(basedir, 'shapes')
-        if os.path.isdir(shapes):
-            shutil.rmtree(shapes)
-
         with stats_client.timed('datamaps', tags=['func:merge']):
-            merge_files(quaddir, shapes, datamaps)
+            merge_points(pointdir, max_zoom)
+            if full_run:
+                tile_list = enumerate_tiles(
+                    load_points(pointdir)[0], max_zoom)
 
-        # Render tiles, using xargs -P to get concurrency.
+        # Concurrently render the tiles. A full run starts from
+        # scratch, to not keep any tiles which no longer show data.
         tiles = os.path.abspath(os.path.join(basedir, 'tiles'))
+        if full_run and os.path.isdir(tiles):
+            shutil.rmtree(tiles)
 
         with stats_client.timed('datamaps', tags=['func:render']):
-            render_tiles(shapes, tiles, concurrency, max_zoom,
-                         datamaps, 'pngquant')
+            rendered = render_files(pool, pointdir, tiles, max_zoom,
+                                    tile_list)
+
+        stats_client.timing('datamaps', rendered, tags=['count:tiles'])
+
+        pool.close()
+        pool.join()
 
         if upload:
             # The upload process is largely network I/O bound, so we
             # can use more processes compared to the CPU bound tasks.
             pool = billiard.Pool(processes=concurrency * 2)
 
+            if manifest is None:
+                # Bootstrap the manifest by listing all existing tiles.
+                with stats_client.timed('datamaps', tags=['func:list']):
+                    manifest = remote_manifest(bucketname)
+
+            start = time.time()
             with stats_client.timed('datamaps', tags=['func:upload']):
-                result = upload_files(pool, bucketname, tiles, max_zoom)
+                result = sync_tiles(pool, bucketname, tiles,
+                                    tile_names(tile_list), manifest,
+                                    delete_unknown=full_run)
+            duration = max(time.time() - start, 0.001)
 
             pool.close()
             pool.join()
@@ -375,10 +974,21 @@ def generate(db_url, bucketname, raven_client, stats_client,
                 stats_client.timing('datamaps', value,
                                     tags=['count:%s' % metric])
 
+            uploaded = result['tile_changed'] + result['tile_new']
+            stats_client.timing('datamaps', int(uploaded / duration),
+                                tags=['rate:tiles'])
+            stats_client.timing('datamaps',
+                                int(result['tile_bytes'] / duration),
+                                tags=['rate:bytes'])
+
+            # The manifest mirrors the uploaded tiles.
+            manifest['updated'] = today
+            save_manifest(manifest_file, manifest)
+
 
 def main(argv, _raven_client=None, _stats_client=None):
     # run for example via:
-    # bin/location_map --create --upload --datamaps=/path/to/datamaps/ \
+    # bin/location_map --create --upload \
     #   --output=ichnaea/content/static/tiles/
 
     parser = argparse.ArgumentParser(
@@ -390,12 +1000,16 @@ def main(argv, _raven_client=None, _stats_client=None):
                         help='Upload tiles to S3?')
     parser.add_argument('--concurrency', default=2,
                         help='How many concurrent processes to use?')
-    parser.add_argument('--datamaps',
-                        help='Directory of the datamaps tools.')
     parser.add_argument('--output',
                         help='Optional directory for output files.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Only render and upload changed tiles? '
+                             'Requires --output and --upload.')
 
     args = parser.parse_args(argv[1:])
+    if args.incremental and not (args.output and args.upload):
+        parser.error('--incremental requires --output and --upload')
+
     if args.create:
         conf = read_config()
         db_url = conf.get('database', 'rw_url')
@@ -416,10 +1030,6 @@ def main(argv, _raven_client=None, _stats_client=None):
         if args.concurrency:
             concurrency = int(args.concurrency)
 
-        datamaps = ''
-        if args.datamaps:
-            datamaps = os.path.abspath(args.datamaps)
-
         output = None
         if args.output:
             output = os.path.abspath(args.output)
@@ -429,8 +1039,8 @@ def main(argv, _raven_client=None, _stats_client=None):
                 generate(db_url, bucketname, raven_client, stats_client,
                          upload=upload,
                          concurrency=concurrency,
-                         datamaps=datamaps,
-                         output=output)
+                         output=output,
+                         incremental=bool(args.incremental))
         except Exception:  # pragma: no cover
             raven_client.captureException()
             raise
@@ -30,13 +30,16 @@ class FakeTask(object):
         self.app = app
 
 
-def load_file(db, redis_client, datatype, filename):  # pragma: no cover
+def load_file(db, redis_client, datatype, filename,
+              bulk=False, processes=1, db_url=None):  # pragma: no cover
     celery_app.data_queues = configure_data(redis_client)
     task = FakeTask(celery_app)
     with redis_pipeline(redis_client) as pipe:
         with db_worker_session(db) as session:
             ocid.ImportLocal(
-                task, session, pipe, cell_type=datatype)(filename=filename)
+                task, session, pipe, cell_type=datatype)(
+                    filename=filename, bulk=bulk,
+                    processes=processes, db_url=db_url)
 
 
 def main(argv, _db_rw=None, _redis_client=None):  # pragma: no cover
@@ -46,6 +49,10 @@ def main(argv, _db_rw=None, _redis_client=None):  # pragma: no cover
                         help='Type of the data file, cell or ocid')
     parser.add_argument('--filename',
                         help='Path to the gzipped csv file.')
+    parser.add_argument('--bulk', action='store_true',
+                        help='Use LOAD DATA LOCAL INFILE via staging tables.')
+    parser.add_argument('--processes', default=1, type=int,
+                        help='How many concurrent processes to use?')
 
     args = parser.parse_args(argv[1:])
     if not args.filename:
@@ -62,13 +69,19 @@ def main(argv, _db_rw=None, _redis_client=None):  # pragma: no cover
         print('Unknown data type.')
         sys.exit(1)
 
+    if args.bulk and args.processes > 1:
+        print('The --bulk and --processes options can not be combined.')
+        sys.exit(1)
+
     configure_logging()
     app_config = read_config()
-    db = configure_db(app_config.get('database', 'rw_url'), _db=_db_rw)
+    db_url = app_config.get('database', 'rw_url')
+    db = configure_db(db_url, local_infile=args.bulk, _db=_db_rw)
     redis_client = configure_redis(
         app_config.get('cache', 'cache_url'), _client=_redis_client)
 
-    load_file(db, redis_client, datatype, filename)
+    load_file(db, redis_client, datatype, filename,
+              bulk=args.bulk, processes=args.processes, db_url=db_url)
 
 
 def console_entry():  # pragma: no cover
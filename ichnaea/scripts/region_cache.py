@@ -0,0 +1,34 @@
+"""
+Generate a binary cache file of the region and buffered region
+geometries out of the GeoJSON files.
+
+The geocoder memory-maps the cache file and only parses the WKB
+encoded geometry of a region on first use, which avoids parsing
+all of the GeoJSON data on startup. The cache file needs to be
+regenerated whenever the GeoJSON files change.
+
+Script is installed as `location_region_cache`.
+"""
+
+import argparse
+import sys
+
+from ichnaea import geocode
+
+
+def main(argv):  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        prog=argv[0], description='Create region cache file.')
+    parser.add_argument('--output', default=geocode.REGIONS_CACHE_FILE,
+                        help='Path to the cache file.')
+
+    args = parser.parse_args(argv[1:])
+    geocode.write_cache(args.output)
+
+
+def console_entry():  # pragma: no cover
+    main(sys.argv)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    console_entry()
@@ -0,0 +1,88 @@
+"""
+Generate a raster of region codes out of the region and buffered
+region GeoJSON files.
+
+The raster is saved as a NumPy array file, which the geocoder memory-maps
+and consults before doing any exact point-in-polygon tests. It needs to
+be regenerated whenever the GeoJSON files change.
+
+Script is installed as `location_region_raster`.
+"""
+
+import argparse
+import sys
+
+import numpy
+
+from ichnaea import geocode
+
+BLOCK_SIZE = 10  #: Size of the initial raster blocks in degrees.
+
+
+def generate(geocoder, resolution):
+    """
+    Return a two-dimensional array of region codes with `resolution`
+    grid cells per degree.
+
+    Each grid cell holds either the code of the one buffered region
+    containing it, an empty value for grid cells outside of all regions,
+    or :data:`ichnaea.geocode.RASTER_AMBIGUOUS`.
+    """
+    rows = 180 * resolution
+    cols = 360 * resolution
+    raster = numpy.zeros((rows, cols), dtype='S2')
+
+    def classify(row0, col0, row1, col1):
+        # Classify a block of grid cells in one go and only split it
+        # into quarters, if it touches the border of any region.
+        safe, code = geocoder.region_for_box(
+            float(row0) / resolution - 90.0,
+            float(col0) / resolution - 180.0,
+            float(row1) / resolution - 90.0,
+            float(col1) / resolution - 180.0)
+
+        if safe:
+            if code is not None:
+                raster[row0:row1, col0:col1] = code.encode('ascii')
+            return
+
+        if row1 - row0 == 1 and col1 - col0 == 1:
+            raster[row0, col0] = geocode.RASTER_AMBIGUOUS
+            return
+
+        row_mid = max(row0 + 1, (row0 + row1) // 2)
+        col_mid = max(col0 + 1, (col0 + col1) // 2)
+        for r0, r1 in ((row0, row_mid), (row_mid, row1)):
+            for c0, c1 in ((col0, col_mid), (col_mid, col1)):
+                if r0 < r1 and c0 < c1:
+                    classify(r0, c0, r1, c1)
+
+    block = BLOCK_SIZE * resolution
+    for row in range(0, rows, block):
+        for col in range(0, cols, block):
+            classify(row, col, min(row + block, rows), min(col + block, cols))
+
+    return raster
+
+
+def main(argv):  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        prog=argv[0], description='Create region raster file.')
+    parser.add_argument('--resolution', default=10, type=int,
+                        help='Number of grid cells per degree.')
+    parser.add_argument('--output', default=geocode.REGIONS_RASTER_FILE,
+                        help='Path to the raster file.')
+
+    args = parser.parse_args(argv[1:])
+
+    geocoder = geocode.Geocoder(raster_file=None)
+    raster = generate(geocoder, args.resolution)
+    numpy.save(args.output, raster)
+
+
+def console_entry():  # pragma: no cover
+    main(sys.argv)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    console_entry()
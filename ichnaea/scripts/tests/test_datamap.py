@@ -1,38 +1,51 @@
+from datetime import timedelta
+from multiprocessing.pool import ThreadPool
 import os
 import os.path
+import struct
+import zlib
 
 from mock import MagicMock, patch
+import numpy
 
-from ichnaea import ROOT
 from ichnaea.models.content import (
     DataMap,
+    encode_datamap_grid,
 )
 from ichnaea.scripts import datamap
 from ichnaea.scripts.datamap import (
-    encode_file,
-    export_file,
+    changed_grids,
+    changed_tiles,
+    enumerate_tiles,
+    export_points,
+    grid_ranges,
+    load_manifest,
+    load_points,
     main,
-    merge_files,
+    merge_points,
+    PNG_SIGNATURE,
+    remote_manifest,
+    render_tile,
     render_tiles,
+    save_manifest,
+    sync_tiles,
+    tile_key_coordinates,
+    tile_keys,
+    tile_palette,
+    tile_names,
+    upload_tiles,
+    write_png,
 )
 from ichnaea.tests.base import (
     _make_db,
     CeleryTestCase,
 )
+from ichnaea.tests.fakes3 import mock_s3
 from ichnaea import util
 
-GIT_ROOT = os.path.abspath(os.path.join(ROOT, os.pardir))
-DATAMAPS_DIR = os.path.join(GIT_ROOT, 'datamaps')
-PNGQUANT = os.path.join(GIT_ROOT, 'pngquant', 'pngquant')
-
 
 class TestMap(CeleryTestCase):
 
-    def _check_quadtree(self, path):
-        self.assertTrue(os.path.isdir(path))
-        for name in ('1,0', 'meta'):
-            self.assertTrue(os.path.isfile(os.path.join(path, name)))
-
     def test_files(self):
         today = util.utcnow().date()
         rows = [
@@ -47,51 +60,148 @@ class TestMap(CeleryTestCase):
             self.session.add(data)
         self.session.flush()
 
-        lines = []
-        rows = 0
+        points = 0
         with util.selfdestruct_tempdir() as temp_dir:
-            quaddir = os.path.join(temp_dir, 'quadtrees')
-            os.mkdir(quaddir)
-            shapes = os.path.join(temp_dir, 'shapes')
+            pointdir = os.path.join(temp_dir, 'points')
+            os.mkdir(pointdir)
             tiles = os.path.join(temp_dir, 'tiles')
 
             for shard_id, shard in DataMap.shards().items():
-                filename = 'map_%s.csv.gz' % shard_id
-                filepath = os.path.join(temp_dir, filename)
-                result = export_file(
-                    None, filepath, shard.__tablename__,
+                ranges = grid_ranges(
+                    None, shard.__tablename__,
                     _db_rw=_make_db(), _session=self.session)
+                for i, (start, end) in enumerate(ranges):
+                    filepath = os.path.join(
+                        pointdir, 'map_%s_%s.npz' % (shard_id, i))
+                    result = export_points(
+                        None, filepath, shard.__tablename__, start, end,
+                        _db_rw=_make_db(), _session=self.session)
 
-                if not result:
-                    self.assertFalse(os.path.isfile(filepath))
-                    continue
+                    if not result:
+                        self.assertFalse(os.path.isfile(filepath))
+                        continue
 
-                rows += result
-                with util.gzip_open(filepath, 'r') as fd:
-                    written = fd.read()
-                lines.extend([line.split(',') for line in written.split()])
+                    points += result
+                    self.assertTrue(os.path.isfile(filepath))
 
-                encode_file(filename, temp_dir, quaddir, DATAMAPS_DIR)
+            self.assertEqual(merge_points(pointdir, 2), 36)
+            self.assertEqual(sorted(os.listdir(pointdir)),
+                             ['keys.npy', 'x.npy', 'y.npy'])
 
-                quadfolder = os.path.join(quaddir, 'map_' + shard_id)
-                self.assertTrue(os.path.isdir(quadfolder))
-                self._check_quadtree(quadfolder)
+            keys, xs, ys = load_points(pointdir)
+            self.assertEqual(list(keys), sorted(keys))
+            tile_list = enumerate_tiles(keys, 2)
+            self.assertEqual(tile_list, [
+                (0, 0, 0),
+                (1, 0, 1), (1, 1, 0),
+                (2, 1, 2), (2, 2, 1),
+            ])
 
-            merge_files(quaddir, shapes, DATAMAPS_DIR)
-            self._check_quadtree(shapes)
-
-            render_tiles(shapes, tiles, 1, 2, DATAMAPS_DIR, PNGQUANT)
+            self.assertEqual(render_tiles(pointdir, tiles, 2, tile_list), 6)
             self.assertEqual(sorted(os.listdir(tiles)),
                              ['0', '1', '2'])
             self.assertEqual(sorted(os.listdir(os.path.join(tiles, '0', '0'))),
                              ['0.png', '0@2x.png'])
 
-        self.assertEqual(rows, 36)
-        self.assertEqual(len(lines), 36)
-        self.assertEqual(set([round(float(l[0]), 2) for l in lines]),
-                         set([-10.0, 0.0, 12.35]))
-        self.assertEqual(set([round(float(l[1]), 2) for l in lines]),
-                         set([-11.0, 12.35]))
+        self.assertEqual(points, 36)
+
+    def test_export_ranges(self):
+        today = util.utcnow().date()
+        for lat in range(-3, 3):
+            for lon in (-1.0, 0.0, 1.0):
+                grid = DataMap.scale(lat * 0.5, lon)
+                self.session.add(DataMap.shard_model(*grid)(
+                    grid=grid, created=today, modified=today))
+        self.session.flush()
+
+        shard = DataMap.shard_model(0, 0)
+        ranges = grid_ranges(
+            None, shard.__tablename__, band=1000,
+            _db_rw=_make_db(), _session=self.session)
+        self.assertEqual(ranges, [
+            (encode_datamap_grid(-1500, -180000),
+             encode_datamap_grid(-500, -180000)),
+            (encode_datamap_grid(-500, -180000),
+             encode_datamap_grid(500, -180000)),
+            (encode_datamap_grid(500, -180000),
+             encode_datamap_grid(1500, -180000)),
+        ])
+
+        points = []
+        with util.selfdestruct_tempdir() as temp_dir:
+            for i, (start, end) in enumerate(ranges):
+                filepath = os.path.join(temp_dir, 'map_%s.npz' % i)
+                points.append(export_points(
+                    None, filepath, shard.__tablename__, start, end,
+                    limit=2, _db_rw=_make_db(), _session=self.session))
+
+        # two latitudes with three longitudes each, per range
+        self.assertEqual(points, [72, 72, 72])
+
+        self.assertEqual(grid_ranges(
+            None, DataMap.shard_model(50000, 50000).__tablename__,
+            _db_rw=_make_db(), _session=self.session), [])
+
+    def test_tile_keys(self):
+        x = numpy.array([0, 1, 0, 1, 5, 2 ** 16 - 1])
+        y = numpy.array([0, 0, 1, 1, 3, 2 ** 16 - 1])
+        keys = tile_keys(x, y)
+        self.assertEqual(list(keys[:5]), [0, 1, 2, 3, 27])
+        self.assertEqual(int(keys[5]), 2 ** 32 - 1)
+        tile_x, tile_y = tile_key_coordinates(keys)
+        self.assertEqual(list(tile_x), list(x))
+        self.assertEqual(list(tile_y), list(y))
+
+    def test_render_tile(self):
+        # one point in the center of tile 1/0/0 and one close
+        # to its right border, reaching into tile 1/1/0
+        xs = numpy.array([2 ** 30, 2 ** 31 - 2 ** 20], dtype=numpy.uint32)
+        ys = numpy.array([2 ** 30, 2 ** 30], dtype=numpy.uint32)
+        keys = tile_keys(xs >> 31, ys >> 31)
+        points = (keys, xs, ys)
+
+        pixels = render_tile(points, 1, 1, 0, 0)
+        self.assertEqual(pixels.shape, (256, 256))
+        self.assertTrue(pixels[128, 128] > 0)
+        self.assertTrue(pixels[128, 255] > 0)
+        self.assertEqual(pixels[0, 0], 0)
+
+        pixels = render_tile(points, 1, 1, 1, 0)
+        self.assertTrue(pixels[128, 0] > 0)
+        self.assertEqual(pixels[128, 128], 0)
+
+        self.assertEqual(render_tile(points, 1, 1, 1, 1), None)
+        self.assertEqual(render_tile(points, 1, 0, 0, 0, size=512).shape,
+                         (512, 512))
+
+    def test_write_png(self):
+        colors, alpha = tile_palette()
+        self.assertEqual(colors.shape, (32, 3))
+        self.assertEqual(list(colors[0]), [0, 0x88, 0xff])
+        self.assertEqual(list(colors[-1]), [255, 255, 255])
+        self.assertEqual((alpha[0], alpha[-1]), (0, 255))
+
+        pixels = numpy.zeros((3, 2), dtype=numpy.uint8)
+        pixels[1, 1] = 31
+        with util.selfdestruct_tempdir() as temp_dir:
+            filename = os.path.join(temp_dir, 'tile.png')
+            write_png(filename, pixels, colors, alpha)
+            with open(filename, 'rb') as fd:
+                data = fd.read()
+
+        self.assertEqual(data[:8], PNG_SIGNATURE)
+        chunks = {}
+        offset = 8
+        while offset < len(data):
+            length, tag = struct.unpack('!I4s', data[offset:offset + 8])
+            chunks[tag] = data[offset + 8:offset + 8 + length]
+            offset += length + 12
+        self.assertEqual(set(chunks.keys()),
+                         set([b'IHDR', b'PLTE', b'tRNS', b'IDAT', b'IEND']))
+        self.assertEqual(struct.unpack('!IIBBBBB', chunks[b'IHDR']),
+                         (2, 3, 8, 3, 0, 0, 0))
+        self.assertEqual(zlib.decompress(chunks[b'IDAT']),
+                         b'\x00\x00\x00\x00\x00\x1f\x00\x00\x00')
 
     def test_main(self):
         with util.selfdestruct_tempdir() as temp_dir:
@@ -102,7 +212,6 @@ class TestMap(CeleryTestCase):
                     '--create',
                     '--upload',
                     '--concurrency=1',
-                    '--datamaps=%s/datamaps' % temp_dir,
                     '--output=%s' % temp_dir,
                 ]
                 main(argv,
@@ -113,6 +222,144 @@ class TestMap(CeleryTestCase):
                 args, kw = mock_generate.call_args
 
                 self.assertEqual(kw['concurrency'], 1)
-                self.assertEqual(kw['datamaps'], temp_dir + '/datamaps')
                 self.assertEqual(kw['output'], temp_dir)
                 self.assertEqual(kw['upload'], True)
+                self.assertEqual(kw['incremental'], False)
+
+    def test_main_incremental(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            mock_generate = MagicMock()
+            with patch.object(datamap, 'generate', mock_generate):
+                for options in (['--upload'], ['--output=%s' % temp_dir]):
+                    argv = ['bin/location_map', '--create',
+                            '--incremental'] + options
+                    with self.assertRaises(SystemExit):
+                        main(argv,
+                             _raven_client=self.raven_client,
+                             _stats_client=self.stats_client)
+                self.assertFalse(mock_generate.called)
+
+                main(['bin/location_map', '--create', '--incremental',
+                      '--upload', '--output=%s' % temp_dir],
+                     _raven_client=self.raven_client,
+                     _stats_client=self.stats_client)
+                args, kw = mock_generate.call_args
+                self.assertEqual(kw['incremental'], True)
+
+    def test_changed_grids(self):
+        today = util.utcnow().date()
+        rows = [
+            # modified since the last run
+            dict(lat=1.0, lon=2.0, modified=today),
+            # unchanged
+            dict(lat=1.5, lon=2.0, modified=today - timedelta(days=3)),
+            # number of points changed from the last run
+            dict(lat=2.0, lon=2.0, modified=today - timedelta(days=46)),
+            # too old to matter
+            dict(lat=2.5, lon=2.0, modified=today - timedelta(days=400)),
+        ]
+        for row in rows:
+            lat, lon = DataMap.scale(row['lat'], row['lon'])
+            data = DataMap.shard_model(lat, lon)(
+                grid=(lat, lon), created=row['modified'],
+                modified=row['modified'])
+            self.session.add(data)
+        self.session.flush()
+
+        shard = DataMap.shard_model(1000, 2000)
+        grids = changed_grids(
+            None, shard.__tablename__, today - timedelta(days=2),
+            _db_rw=_make_db(), _session=self.session)
+        self.assertEqual(sorted(grids), [(1000, 2000), (2000, 2000)])
+
+    def test_changed_tiles(self):
+        self.assertEqual(changed_tiles([], 3), [])
+        tiles = changed_tiles([(51500, -100)], 3)
+        self.assertEqual(tiles, [
+            (0, 0, 0),
+            (1, 0, 0), (1, 1, 0),
+            (2, 1, 1), (2, 2, 1),
+            (3, 3, 2), (3, 4, 2),
+        ])
+        self.assertEqual(changed_tiles([(51500, -100)], 3, margin=0.0), [
+            (0, 0, 0), (1, 0, 0), (2, 1, 1), (3, 3, 2)])
+        self.assertEqual(tile_names(tiles[:2]),
+                         ['0/0/0.png', '0/0/0@2x.png', '1/0/0.png'])
+
+    def test_manifest(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            filename = os.path.join(temp_dir, 'manifest.json')
+            self.assertEqual(load_manifest(filename), None)
+            manifest = {'updated': '2016-01-01',
+                        'tiles': {'0/0/0.png': [10, 'a']}}
+            save_manifest(filename, manifest)
+            self.assertEqual(load_manifest(filename), manifest)
+
+    def test_upload_tiles(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            os.makedirs(os.path.join(temp_dir, '1', '0'))
+            for name in ('1/0/0.png', '1/0/1.png'):
+                with open(os.path.join(temp_dir, name), 'wb') as fd:
+                    fd.write(name.encode('ascii'))
+
+            with mock_s3() as conn:
+                uploaded, missing = upload_tiles(
+                    'bucket', 'tiles/', temp_dir, {
+                        '1/0/0.png': None,
+                        '1/0/1.png': [9, 'abc'],
+                        '1/1/0.png': None,
+                    })
+                uploaded_again, _ = upload_tiles(
+                    'bucket', 'tiles/', temp_dir, uploaded)
+
+        self.assertEqual(set(uploaded.keys()), set(['1/0/0.png', '1/0/1.png']))
+        self.assertEqual(uploaded['1/0/0.png'][0], 9)
+        self.assertEqual(missing, ['1/1/0.png'])
+        self.assertEqual(uploaded_again, {})
+        keys = conn.get_bucket('bucket').list(prefix='tiles/')
+        self.assertEqual([key.name for key in keys],
+                         ['tiles/1/0/0.png', 'tiles/1/0/1.png'])
+        self.assertEqual(keys[0].headers['Content-Type'], 'image/png')
+        self.assertEqual(uploaded['1/0/0.png'][1], keys[0].etag.strip('"'))
+
+    def test_sync_tiles(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            os.makedirs(os.path.join(temp_dir, '1', '0'))
+            for name in ('1/0/0.png', '1/0/1.png'):
+                with open(os.path.join(temp_dir, name), 'wb') as fd:
+                    fd.write(name.encode('ascii'))
+
+            pool = ThreadPool(2)
+            with mock_s3() as conn:
+                bucket = conn.get_bucket('bucket')
+                for name in ('1/0/1.png', '1/1/0.png', '1/1/1.png'):
+                    bucket.new_key('tiles/' + name).set_contents_from_string(
+                        name.encode('ascii'))
+                manifest = remote_manifest('bucket')
+                self.assertEqual(sorted(manifest['tiles'].keys()),
+                                 ['1/0/1.png', '1/1/0.png', '1/1/1.png'])
+
+                names = ['1/0/0.png', '1/0/1.png', '1/1/0.png']
+                result = sync_tiles(pool, 'bucket', temp_dir, names,
+                                    manifest, batch=2)
+                self.assertEqual(result, {
+                    'tile_bytes': 9,
+                    'tile_changed': 0,
+                    'tile_deleted': 1,
+                    'tile_new': 1,
+                    'tile_unchanged': 1,
+                })
+                self.assertEqual(sorted(manifest['tiles'].keys()),
+                                 ['1/0/0.png', '1/0/1.png', '1/1/1.png'])
+
+                result = sync_tiles(pool, 'bucket', temp_dir, names[:1],
+                                    manifest, delete_unknown=True)
+                self.assertEqual(result['tile_unchanged'], 1)
+                self.assertEqual(result['tile_deleted'], 2)
+                self.assertEqual(list(manifest['tiles'].keys()),
+                                 ['1/0/0.png'])
+            pool.close()
+            pool.join()
+
+        self.assertEqual([key.name for key in bucket.list(prefix='tiles/')],
+                         ['tiles/1/0/0.png', 'tiles/data.json'])
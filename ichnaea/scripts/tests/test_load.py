@@ -1,8 +1,19 @@
+import os
+
 from ichnaea.scripts import load
 from ichnaea.tests.base import TestCase
+from ichnaea import util
 
 
 class LoadTestCase(TestCase):
 
     def test_compiles(self):
         self.assertTrue(hasattr(load, 'console_entry'))
+
+    def test_bulk_processes(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            filename = os.path.join(temp_dir, 'import.csv.gz')
+            open(filename, 'w').close()
+            with self.assertRaises(SystemExit):
+                load.main(['location_load', '--filename', filename,
+                           '--bulk', '--processes', '2'])
@@ -0,0 +1,8 @@
+from ichnaea.scripts import region_cache
+from ichnaea.tests.base import TestCase
+
+
+class RegionCacheTestCase(TestCase):
+
+    def test_compiles(self):
+        self.assertTrue(hasattr(region_cache, 'console_entry'))
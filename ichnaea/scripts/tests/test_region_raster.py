@@ -0,0 +1,56 @@
+import os.path
+
+import numpy
+
+from ichnaea.geocode import (
+    Geocoder,
+    GEOCODER,
+    RASTER_AMBIGUOUS,
+)
+from ichnaea.scripts import region_raster
+from ichnaea.tests.base import TestCase
+from ichnaea import util
+
+
+class RegionRasterTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super(RegionRasterTestCase, cls).setUpClass()
+        cls.raster = region_raster.generate(GEOCODER, 1)
+
+    @classmethod
+    def tearDownClass(cls):
+        super(RegionRasterTestCase, cls).tearDownClass()
+        del cls.raster
+
+    def test_compiles(self):
+        self.assertTrue(hasattr(region_raster, 'console_entry'))
+
+    def test_generate(self):
+        self.assertEqual(self.raster.shape, (180, 360))
+        self.assertEqual(self.raster[51 + 90, -1 + 180], b'GB')
+        self.assertEqual(self.raster[0 + 90, 0 + 180], b'')
+        self.assertEqual(self.raster[46 + 90, 6 + 180], RASTER_AMBIGUOUS)
+
+    def test_geocoder(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'raster.npy')
+            numpy.save(path, self.raster)
+            geocoder = Geocoder(raster_file=path)
+
+        positions = [
+            (0.0, 0.0), (31.522, 34.455), (46.2130, 6.1290),
+            (51.5142, -0.0931), (60.1, 20.0),
+        ]
+        for lat, lon in positions:
+            self.assertEqual(geocoder.region(lat, lon),
+                             GEOCODER.region(lat, lon))
+            self.assertEqual(geocoder.any_region(lat, lon),
+                             GEOCODER.any_region(lat, lon))
+            for code in ('FR', 'GB', 'XW'):
+                self.assertEqual(geocoder.in_region(lat, lon, code),
+                                 GEOCODER.in_region(lat, lon, code))
+            for mcc in (208, 234, 425):
+                self.assertEqual(geocoder.in_region_mcc(lat, lon, mcc),
+                                 GEOCODER.in_region_mcc(lat, lon, mcc))
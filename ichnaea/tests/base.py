@@ -118,8 +118,8 @@ GB_MCC = 234
 GB_MNC = 30
 
 
-def _make_db(uri=SQLURI):
-    return configure_db(uri)
+def _make_db(uri=SQLURI, local_infile=False):
+    return configure_db(uri, local_infile=local_infile)
 
 
 def _make_redis(uri=REDIS_URI):
@@ -298,6 +298,8 @@ class DBTestCase(LogTestCase):
 
     default_session = 'db_rw_session'
     track_connection_events = False
+    # allow LOAD DATA LOCAL INFILE on the read-write connections
+    local_infile = False
 
     @contextmanager
     def db_call_checker(self):
@@ -393,7 +395,7 @@ class DBTestCase(LogTestCase):
     @classmethod
     def setUpClass(cls):
         super(DBTestCase, cls).setUpClass()
-        cls.db_rw = _make_db()
+        cls.db_rw = _make_db(local_infile=cls.local_infile)
         cls.db_ro = _make_db()
 
     @classmethod
@@ -563,6 +565,7 @@ class CeleryTestCase(ConnectionTestCase):
             celery_app, TEST_CONFIG,
             _db_rw=cls.db_rw,
             _geoip_db=cls.geoip_db,
+            _http_session=cls.http_session,
             _raven_client=cls.raven_client,
             _redis_client=cls.redis_client,
             _stats_client=cls.stats_client)
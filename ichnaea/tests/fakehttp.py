@@ -0,0 +1,80 @@
+"""
+A local HTTP server recording all POST requests sent to it, used to
+test uploads over real, pooled connections.
+"""
+
+from contextlib import contextmanager
+import threading
+
+from six.moves.BaseHTTPServer import (
+    BaseHTTPRequestHandler,
+    HTTPServer,
+)
+from six.moves.socketserver import ThreadingMixIn
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    # allow keep-alive connections
+    protocol_version = 'HTTP/1.1'
+    # send headers and body in one packet
+    wbufsize = -1
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+
+        server = self.server
+        with server.lock:
+            server.requests.append({
+                'path': self.path,
+                'headers': dict(self.headers.items()),
+                'body': body,
+                'client': self.client_address,
+            })
+            status = 200
+            if server.statuses:
+                status = server.statuses.pop(0)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StubHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.statuses = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s' % self.server_address[1]
+
+
+@contextmanager
+def stub_http_server():
+    """
+    Run a :class:`ichnaea.tests.fakehttp.StubServer` in a background
+    thread. Responses use the status codes from its `statuses` list
+    in order and 200 afterwards.
+    """
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
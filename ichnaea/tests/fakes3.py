@@ -0,0 +1,137 @@
+"""
+An in-memory stand-in for the parts of the boto Amazon S3 API
+used by :mod:`ichnaea.s3`.
+"""
+
+from contextlib import contextmanager
+import hashlib
+import threading
+
+import boto
+import mock
+
+from ichnaea import s3
+
+
+class FakeKey(object):
+
+    def __init__(self, bucket, name):
+        self.bucket = bucket
+        self.name = name
+        self.key = name
+        self.data = None
+        self.headers = None
+        self.reduced_redundancy = False
+
+    @property
+    def size(self):
+        return len(self.data)
+
+    @property
+    def etag(self):
+        return '"%s"' % hashlib.md5(self.data).hexdigest()
+
+    def close(self):
+        pass
+
+    def set_contents_from_string(self, data, headers=None,
+                                 reduced_redundancy=False):
+        if not isinstance(data, bytes):
+            data = data.encode('utf-8')
+        self.data = data
+        self.headers = headers
+        self.reduced_redundancy = reduced_redundancy
+        self.bucket.keys[self.name] = self
+
+    def set_contents_from_filename(self, filename, headers=None,
+                                   reduced_redundancy=False):
+        with open(filename, 'rb') as fd:
+            self.set_contents_from_string(
+                fd.read(), headers=headers,
+                reduced_redundancy=reduced_redundancy)
+
+
+class FakeMultiPartUpload(object):
+
+    def __init__(self, bucket, key_name, headers=None,
+                 reduced_redundancy=False):
+        self.bucket = bucket
+        self.key_name = key_name
+        self.headers = headers
+        self.reduced_redundancy = reduced_redundancy
+        self.parts = {}
+        self.completed = False
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def upload_part_from_file(self, fp, part_num):
+        data = fp.read()
+        with self._lock:
+            self.parts[part_num] = data
+
+    def complete_upload(self):
+        key = self.bucket.new_key(self.key_name)
+        key.set_contents_from_string(
+            b''.join([self.parts[num] for num in sorted(self.parts)]),
+            headers=self.headers,
+            reduced_redundancy=self.reduced_redundancy)
+        self.completed = True
+
+    def cancel_upload(self):
+        self.cancelled = True
+
+
+class FakeBucket(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.keys = {}
+        self.multipart_uploads = []
+
+    def new_key(self, key_name):
+        return FakeKey(self, key_name)
+
+    def get_key(self, key_name):
+        return self.keys.get(key_name, None)
+
+    def list(self, prefix=''):
+        return [key for name, key in sorted(self.keys.items())
+                if name.startswith(prefix)]
+
+    def delete_keys(self, keys):
+        for key in keys:
+            self.keys.pop(getattr(key, 'name', key), None)
+
+    def initiate_multipart_upload(self, key_name, headers=None,
+                                  reduced_redundancy=False):
+        upload = FakeMultiPartUpload(
+            self, key_name, headers=headers,
+            reduced_redundancy=reduced_redundancy)
+        self.multipart_uploads.append(upload)
+        return upload
+
+
+class FakeS3Connection(object):
+
+    def __init__(self):
+        self.buckets = {}
+
+    def get_bucket(self, bucketname, validate=True):
+        if bucketname not in self.buckets:
+            self.buckets[bucketname] = FakeBucket(bucketname)
+        return self.buckets[bucketname]
+
+
+@contextmanager
+def mock_s3():
+    """
+    Replace all Amazon S3 connections with a
+    :class:`ichnaea.tests.fakes3.FakeS3Connection`.
+    """
+    conn = FakeS3Connection()
+    s3._CONNECTIONS.clear()
+    try:
+        with mock.patch.object(boto, 'connect_s3', lambda: conn):
+            yield conn
+    finally:
+        s3._CONNECTIONS.clear()
@@ -6,7 +6,10 @@ from ichnaea.geocalc import (
     distance,
     latitude_add,
     longitude_add,
+    max_distance,
+    min_distance,
     random_points,
+    random_points_array,
 )
 from ichnaea import constants
 from ichnaea.tests.base import TestCase
@@ -78,6 +81,23 @@ class TestDistance(TestCase):
             distance(None, '0.1', 1, 1.1)
 
 
+class TestMinMaxDistance(TestCase):
+
+    points = numpy.array(
+        [(1.0, 1.0), (1.0, 1.1), (2.0, 1.0)], dtype=numpy.double)
+
+    def test_max_distance(self):
+        self.assertAlmostEqual(
+            max_distance(1.0, 1.0, self.points),
+            distance(1.0, 1.0, 2.0, 1.0), 4)
+
+    def test_min_distance(self):
+        self.assertAlmostEqual(
+            min_distance(1.0, 1.2, self.points),
+            distance(1.0, 1.2, 1.0, 1.1), 4)
+        self.assertEqual(min_distance(1.0, 1.0, self.points), 0.0)
+
+
 class TestLatitudeAdd(TestCase):
 
     def test_returns_min_lat(self):
@@ -136,3 +156,26 @@ class TestRandomPoints(TestCase):
     def test_large(self):
         random_points(90000, 180000, 1)
         random_points(-90000, -180000, 1)
+
+
+class TestRandomPointsArray(TestCase):
+
+    def test_empty(self):
+        empty = numpy.zeros(0, dtype=numpy.int64)
+        lats, lons = random_points_array(empty, empty, empty)
+        self.assertEqual(len(lats), 0)
+        self.assertEqual(len(lons), 0)
+
+    def test_same_points(self):
+        grids = [(0, 0, 20), (10123, -170234, 1), (10124, -170234, 4),
+                 (-90000, -180000, 0), (90000, 180000, -10)]
+        expected = []
+        for lat, lon, num in grids:
+            expected.extend(random_points(lat, lon, num))
+
+        grids = numpy.array(grids, dtype=numpy.int64)
+        lats, lons = random_points_array(
+            grids[:, 0], grids[:, 1], grids[:, 2])
+        self.assertEqual(len(lats), len(expected))
+        self.assertEqual(
+            ['%.6f,%.6f\n' % point for point in zip(lats, lons)], expected)
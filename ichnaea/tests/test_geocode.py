@@ -1,6 +1,14 @@
-from ichnaea.geocode import GEOCODER
+import os.path
+
+from ichnaea.geocode import (
+    Geocoder,
+    GEOCODER,
+    RegionCache,
+    write_cache,
+)
 from ichnaea.models.constants import ALL_VALID_MCCS
 from ichnaea.tests.base import TestCase
+from ichnaea import util
 
 
 class TestGeocoder(TestCase):
@@ -45,6 +53,12 @@ class TestGeocoder(TestCase):
         self.assertEqual(func(31.522, 34.455, 425), 'XW')
         self.assertEqual(func(0.0, 0.0, 234), None)
 
+    def test_region_for_box(self):
+        func = GEOCODER.region_for_box
+        self.assertEqual(func(51.0, -1.0, 52.0, 0.0), (True, 'GB'))
+        self.assertEqual(func(-1.0, -1.0, 1.0, 1.0), (True, None))
+        self.assertEqual(func(46.0, 6.0, 47.0, 7.0), (False, None))
+
     def test_region_for_code(self):
         func = GEOCODER.region_for_code
         self.assertEqual(func('GB').code, 'GB')
@@ -62,15 +76,80 @@ class TestGeocoder(TestCase):
             self.assertTrue(GEOCODER.region_max_radius(invalid) is None)
 
 
+class TestGeocoderCache(TestCase):
+
+    def test_lazy(self):
+        geocoder = Geocoder(cache_file=None, raster_file=None)
+        self.assertEqual(geocoder.valid_regions, GEOCODER.valid_regions)
+        self.assertEqual(len(geocoder._shapes), 0)
+        self.assertEqual(len(geocoder._buffered_shapes), 0)
+        self.assertEqual(geocoder.region(51.5142, -0.0931), 'GB')
+        self.assertTrue(len(geocoder._buffered_shapes) > 0)
+        self.assertFalse('US' in geocoder._buffered_shapes)
+
+    def test_cache_file(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'regions_cache.bin')
+            write_cache(path)
+            geocoder = Geocoder(cache_file=path, raster_file=None)
+
+        self.assertEqual(geocoder.valid_regions, GEOCODER.valid_regions)
+        self.assertEqual(geocoder.region_max_radius('US'), 2971000.0)
+        for lat, lon in ((0.0, 0.0), (31.522, 34.455), (46.2130, 6.1290),
+                         (51.5142, -0.0931), (60.1, 20.0)):
+            self.assertEqual(geocoder.region(lat, lon),
+                             GEOCODER.region(lat, lon))
+            self.assertEqual(geocoder.any_region(lat, lon),
+                             GEOCODER.any_region(lat, lon))
+
+
+class TestGeocoderMany(TestCase):
+
+    positions = [
+        (-60.0, 11.0), (0.0, 0.0), (36.4173, 18.728), (48.3, -7.0),
+        (31.522, 34.455), (42.83256, 20.34221), (42.4255, 3.3584),
+        (46.2130, 6.1290), (46.5743, 6.3532), (48.8656, 13.6781),
+        (49.7089, 6.0741), (51.5142, -0.0931), (60.1, 20.0),
+        (90.0, 0.0),
+    ]
+
+    def setUp(self):
+        self.lats = [lat for lat, lon in self.positions]
+        self.lons = [lon for lat, lon in self.positions]
+
+    def test_regions(self):
+        self.assertEqual(GEOCODER.regions(self.lats, self.lons),
+                         [GEOCODER.region(lat, lon)
+                          for lat, lon in self.positions])
+
+    def test_any_region_many(self):
+        self.assertEqual(list(GEOCODER.any_region_many(self.lats, self.lons)),
+                         [GEOCODER.any_region(lat, lon)
+                          for lat, lon in self.positions])
+
+    def test_region_for_cell_many(self):
+        for mcc in (208, 228, 234, 425):
+            self.assertEqual(
+                GEOCODER.region_for_cell_many(
+                    self.lats, self.lons, [mcc] * len(self.lats)),
+                [GEOCODER.region_for_cell(lat, lon, mcc)
+                 for lat, lon in self.positions])
+
+    def test_empty(self):
+        self.assertEqual(GEOCODER.regions([], []), [])
+        self.assertEqual(list(GEOCODER.any_region_many([], [])), [])
+        self.assertEqual(GEOCODER.region_for_cell_many([], [], []), [])
+
+
 class TestRegionsForMcc(TestCase):
 
     def test_no_match(self):
-        self.assertEqual(GEOCODER.regions_for_mcc(None), [])
-        self.assertEqual(GEOCODER.regions_for_mcc(None, metadata=True), [])
-        self.assertEqual(GEOCODER.regions_for_mcc(1), [])
-        self.assertEqual(GEOCODER.regions_for_mcc(1, metadata=True), [])
-        self.assertEqual(GEOCODER.regions_for_mcc(''), [])
-        self.assertEqual(GEOCODER.regions_for_mcc('1', metadata=True), [])
+        self.assertEqual(GEOCODER.regions_for_mcc(None), ())
+        self.assertEqual(GEOCODER.regions_for_mcc(None, metadata=True), ())
+        self.assertEqual(GEOCODER.regions_for_mcc(1), ())
+        self.assertEqual(GEOCODER.regions_for_mcc(1, metadata=True), ())
+        self.assertEqual(GEOCODER.regions_for_mcc(''), ())
+        self.assertEqual(GEOCODER.regions_for_mcc('1', metadata=True), ())
 
     def test_single(self):
         regions = GEOCODER.regions_for_mcc(262)
@@ -84,6 +163,15 @@ class TestRegionsForMcc(TestCase):
         regions = GEOCODER.regions_for_mcc(311, metadata=True)
         self.assertEqual(set([r.code for r in regions]), set(['GU', 'US']))
 
+    def test_cached(self):
+        regions = GEOCODER.regions_for_mcc(311)
+        self.assertTrue(isinstance(regions, tuple))
+        self.assertTrue(GEOCODER.regions_for_mcc('311') is regions)
+        regions = GEOCODER.regions_for_mcc(311, metadata=True)
+        self.assertTrue(isinstance(regions, tuple))
+        self.assertTrue(GEOCODER.regions_for_mcc(311, metadata=True)[0]
+                        is GEOCODER.region_for_code(regions[0].code))
+
     def test_filtered(self):
         # AX / Aland Islands is not in the GENC list
         regions = GEOCODER.regions_for_mcc(244)
@@ -94,3 +182,55 @@ class TestRegionsForMcc(TestCase):
             regions = set(GEOCODER.regions_for_mcc(mcc))
             self.assertNotEqual(regions, set())
             self.assertEqual(regions - GEOCODER._valid_regions, set())
+
+
+class TestRegionCache(TestCase):
+
+    positions = [
+        (-60.0, 11.0), (0.0, 0.0), (36.4173, 18.728), (48.3, -7.0),
+        (31.522, 34.455), (42.83256, 20.34221), (42.4255, 3.3584),
+        (46.2130, 6.1290), (46.5743, 6.3532), (48.8656, 13.6781),
+        (49.7089, 6.0741), (51.5142, -0.0931), (60.1, 20.0),
+    ]
+
+    def setUp(self):
+        self.cache = RegionCache(GEOCODER)
+
+    def test_region(self):
+        for lat, lon in self.positions:
+            self.assertEqual(self.cache.region(lat, lon),
+                             GEOCODER.region(lat, lon))
+        # repeated lookups return the same result
+        for lat, lon in self.positions:
+            self.assertEqual(self.cache.region(lat, lon),
+                             GEOCODER.region(lat, lon))
+
+    def test_in_region(self):
+        for lat, lon in self.positions:
+            for code in ('CH', 'FR', 'GB', 'XW'):
+                self.assertEqual(self.cache.in_region(lat, lon, code),
+                                 GEOCODER.in_region(lat, lon, code))
+
+    def test_region_for_cell(self):
+        for lat, lon in self.positions:
+            for mcc in (208, 228, 234, 425):
+                self.assertEqual(
+                    self.cache.region_for_cell(lat, lon, mcc),
+                    GEOCODER.region_for_cell(lat, lon, mcc))
+
+    def test_interior(self):
+        self.assertEqual(self.cache.region(51.5142, -0.0931), 'GB')
+        self.assertEqual(self.cache._interior[51 + 90, -1 + 180],
+                         self.cache._code_values['GB'])
+        self.assertEqual(self.cache.region(0.0, 0.0), None)
+        self.assertEqual(self.cache._interior[90, 180],
+                         RegionCache.NO_REGION)
+
+    def test_border(self):
+        self.assertEqual(self.cache.region(46.2130, 6.1290), 'FR')
+        self.assertEqual(self.cache._interior[46 + 90, 6 + 180],
+                         RegionCache.AMBIGUOUS)
+
+    def test_invalid(self):
+        self.assertEqual(self.cache.region(90.0, 0.0), None)
+        self.assertFalse(self.cache.in_region(0.0, 0.0, 'XX'))
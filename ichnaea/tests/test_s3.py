@@ -0,0 +1,94 @@
+import os
+
+from ichnaea.s3 import (
+    connect_s3,
+    S3Bucket,
+)
+from ichnaea.tests.base import TestCase
+from ichnaea.tests.fakes3 import mock_s3
+from ichnaea import util
+
+
+class TestS3Bucket(TestCase):
+
+    def test_connection_reuse(self):
+        with mock_s3() as conn:
+            self.assertTrue(connect_s3() is conn)
+            self.assertTrue(connect_s3() is connect_s3())
+
+    def test_upload_string(self):
+        with mock_s3() as conn:
+            S3Bucket('bucket').upload_string(
+                'key', b'data', headers={'Content-Type': 'text/plain'},
+                reduced_redundancy=True)
+
+        bucket = conn.get_bucket('bucket')
+        self.assertEqual(bucket.multipart_uploads, [])
+        key = bucket.get_key('key')
+        self.assertEqual(key.data, b'data')
+        self.assertEqual(key.headers, {'Content-Type': 'text/plain'})
+        self.assertTrue(key.reduced_redundancy)
+
+    def test_stream_multipart(self):
+        with mock_s3() as conn:
+            s3_bucket = S3Bucket('bucket', part_size=10, concurrency=2)
+            with s3_bucket.open_upload('key') as upload:
+                for i in range(25):
+                    upload.write(('%03d' % i).encode('ascii'))
+            self.assertEqual(upload.tell(), 75)
+
+        bucket = conn.get_bucket('bucket')
+        multipart = bucket.multipart_uploads[0]
+        self.assertTrue(multipart.completed)
+        self.assertEqual(len(multipart.parts), 7)
+        self.assertEqual(
+            bucket.get_key('key').data,
+            ''.join(['%03d' % i for i in range(25)]).encode('ascii'))
+
+    def test_stream_abort(self):
+        with mock_s3() as conn:
+            s3_bucket = S3Bucket('bucket', part_size=10)
+            try:
+                with s3_bucket.open_upload('key') as upload:
+                    upload.write(b'a' * 25)
+                    raise ValueError('failed')
+            except ValueError:
+                pass
+
+        bucket = conn.get_bucket('bucket')
+        self.assertTrue(bucket.multipart_uploads[0].cancelled)
+        self.assertEqual(bucket.get_key('key'), None)
+
+    def test_stream_gzip(self):
+        with mock_s3() as conn:
+            s3_bucket = S3Bucket('bucket', part_size=100)
+            with s3_bucket.open_upload('key.gz') as upload:
+                with util.gzip_open('key', 'w',
+                                    fileobj=upload) as gzip_wrapper:
+                    with gzip_wrapper as gzip_file:
+                        for i in range(1000):
+                            gzip_file.write(u'line %s\n' % i)
+
+        data = conn.get_bucket('bucket').get_key('key.gz').data
+        self.assertEqual(util.decode_gzip(data, encoding='utf-8'),
+                         u''.join([u'line %s\n' % i for i in range(1000)]))
+
+    def test_upload_file(self):
+        with util.selfdestruct_tempdir() as temp_dir:
+            path = os.path.join(temp_dir, 'file')
+            with open(path, 'wb') as fd:
+                fd.write(b'0123456789' * 5 + b'end')
+
+            with mock_s3() as conn:
+                s3_bucket = S3Bucket('bucket', part_size=100)
+                s3_bucket.upload_file('small', path)
+                s3_bucket.part_size = 20
+                s3_bucket.upload_file('large', path)
+
+        bucket = conn.get_bucket('bucket')
+        self.assertEqual(len(bucket.multipart_uploads), 1)
+        self.assertEqual(len(bucket.multipart_uploads[0].parts), 3)
+        self.assertEqual(bucket.get_key('small').data,
+                         b'0123456789' * 5 + b'end')
+        self.assertEqual(bucket.get_key('large').data,
+                         b'0123456789' * 5 + b'end')
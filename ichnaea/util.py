@@ -40,15 +40,23 @@ else:  # pragma: no cover
 
 
 @contextmanager
-def gzip_open(filename, mode, compresslevel=6):  # pragma: no cover
+def gzip_open(filename, mode, compresslevel=6,
+              fileobj=None):  # pragma: no cover
     """Open a gzip file with an API consistent across Python 2/3.
 
     :param mode: Either `r` or `w` for read or write access.
+    :param fileobj: An optional binary file object used instead of
+                    opening the file at `filename`.
     """
     # open with either mode r or w
     if six.PY2:
-        with GzipFile(filename, mode,
-                      compresslevel=compresslevel) as gzip_file:
+        with GzipFile(filename, mode, compresslevel=compresslevel,
+                      fileobj=fileobj) as gzip_file:
+            yield gzip_file
+    elif fileobj is not None:
+        with gzip.open(fileobj, mode=mode + 't',
+                       compresslevel=compresslevel,
+                       encoding='utf-8') as gzip_file:
             yield gzip_file
     else:
         with open(filename, mode + 'b') as fd:
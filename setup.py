@@ -59,7 +59,9 @@ setup(
             'location_initdb=ichnaea.scripts.initdb:console_entry',
             'location_load=ichnaea.scripts.load:console_entry',
             'location_map=ichnaea.scripts.datamap:console_entry',
+            'location_region_cache=ichnaea.scripts.region_cache:console_entry',
             'location_region_json=ichnaea.scripts.region_json:console_entry',
+            'location_region_raster=ichnaea.scripts.region_raster:console_entry',
         ],
     },
 )